@@ -3,11 +3,13 @@ from litestar import Request, WebSocket
 from app.api.utils.auth import Authentication
 from app.common.exception_handlers import ErrorCode, RequestError, SocketError
 from app.core.config import settings
+from app.db.routers import use_primary
 from app.db.models.accounts import User
 
 
 async def get_user(token, socket: Optional[WebSocket] = None):
-    user = await Authentication.decodeAuthorization(token)
+    with use_primary():  # Tokens are rotated on login, a replica may lag behind
+        user = await Authentication.decodeAuthorization(token)
     if not user:
         err_msg = "Auth Token is Invalid or Expired"
         if not socket:
@@ -52,6 +52,7 @@ feed_router = Router(
     tags=["Feed"],
     dependencies={
         "user": Provide(get_current_user),
+        "client": Provide(get_current_user_or_guest),
     },
 )
 
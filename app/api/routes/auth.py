@@ -1,5 +1,4 @@
-from litestar import Controller, get, post, Response
-from litestar.background_tasks import BackgroundTask
+from litestar import Controller, get, post
 
 from app.api.schemas.auth import (
     RegisterUserSchema,
@@ -12,9 +11,9 @@ from app.api.schemas.auth import (
     TokensResponseSchema,
 )
 from app.common.exception_handlers import ErrorCode, RequestError
+from app.common.jobs import enqueue_job
 from app.api.schemas.base import ResponseSchema
 
-from app.api.utils.emails import send_email
 from app.core.security import get_password_hash, verify_password
 from app.api.utils.auth import Authentication
 from app.db.models.accounts import Otp, User
@@ -22,6 +21,7 @@ from app.db.models.accounts import Otp, User
 
 class RegisterView(Controller):
     path = "/register"
+    opt = {"rate_limit": "auth"}
 
     @post(
         summary="Register a new user",
@@ -41,16 +41,15 @@ class RegisterView(Controller):
         # Create user
         user = await User.create_user(data.model_dump())
 
-        return Response(
-            RegisterResponseSchema(
-                message="Registration successful", data={"email": user.email}
-            ),
-            background=BackgroundTask(send_email, user, type="activate"),
+        await enqueue_job("send_email", {"user_id": str(user.id), "type": "activate"})
+        return RegisterResponseSchema(
+            message="Registration successful", data={"email": user.email}
         )
 
 
 class VerifyEmailView(Controller):
     path = "/verify-email"
+    opt = {"rate_limit": "auth"}
 
     @post(
         summary="Verify a user's email",
@@ -87,14 +86,15 @@ class VerifyEmailView(Controller):
         user_by_email.is_email_verified = True
         await user_by_email.save()
         await otp.delete()
-        return Response(
-            ResponseSchema(message="Account verification successful"),
-            background=BackgroundTask(send_email, user_by_email, type="welcome"),
+        await enqueue_job(
+            "send_email", {"user_id": str(user_by_email.id), "type": "welcome"}
         )
+        return ResponseSchema(message="Account verification successful")
 
 
 class ResendVerificationEmailView(Controller):
     path = "/resend-verification-email"
+    opt = {"rate_limit": "auth"}
 
     @post(
         summary="Resend Verification Email",
@@ -112,14 +112,15 @@ class ResendVerificationEmailView(Controller):
         if user_by_email.is_email_verified:
             return ResponseSchema(message="Email already verified")
 
-        return Response(
-            ResponseSchema(message="Verification email sent"),
-            background=BackgroundTask(send_email, user_by_email, type="activate"),
+        await enqueue_job(
+            "send_email", {"user_id": str(user_by_email.id), "type": "activate"}
         )
+        return ResponseSchema(message="Verification email sent")
 
 
 class SendPasswordResetOtpView(Controller):
     path = "/send-password-reset-otp"
+    opt = {"rate_limit": "auth"}
 
     @post(
         summary="Send Password Reset Otp",
@@ -134,14 +135,15 @@ class SendPasswordResetOtpView(Controller):
                 err_msg="Incorrect Email",
                 status_code=404,
             )
-        return Response(
-            ResponseSchema(message="Password otp sent"),
-            background=BackgroundTask(send_email, user_by_email, type="reset"),
+        await enqueue_job(
+            "send_email", {"user_id": str(user_by_email.id), "type": "reset"}
         )
+        return ResponseSchema(message="Password otp sent")
 
 
 class SetNewPasswordView(Controller):
     path = "/set-new-password"
+    opt = {"rate_limit": "auth"}
 
     @post(
         summary="Set New Password",
@@ -174,14 +176,15 @@ class SetNewPasswordView(Controller):
 
         user_by_email.password = get_password_hash(password)
         await user_by_email.save()
-        return Response(
-            ResponseSchema(message="Password reset successful"),
-            background=BackgroundTask(send_email, user_by_email, type="reset-success"),
+        await enqueue_job(
+            "send_email", {"user_id": str(user_by_email.id), "type": "reset-success"}
         )
+        return ResponseSchema(message="Password reset successful")
 
 
 class LoginView(Controller):
     path = "/login"
+    opt = {"rate_limit": "auth", "load_class": "critical"}
 
     @post(
         summary="Login a user",
@@ -222,6 +225,7 @@ class LoginView(Controller):
 
 class RefreshTokensView(Controller):
     path = "/refresh"
+    opt = {"load_class": "critical"}
 
     @post(
         summary="Refresh tokens",
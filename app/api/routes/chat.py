@@ -1,7 +1,11 @@
+from typing import Annotated, Optional
 from uuid import UUID
 
 from litestar import Controller, Request, delete, get, patch, post, put
+from litestar.params import Parameter
+from tortoise.transactions import in_transaction
 from app.api.routes.utils import (
+    check_chat_membership,
     create_file,
     get_chat_object,
     get_chats_queryset,
@@ -11,18 +15,24 @@ from app.api.routes.utils import (
     usernames_to_add_and_remove_validations,
 )
 from app.api.schemas.chat import (
-    ChatResponseSchema,
-    ChatsResponseSchema,
     GroupChatCreateSchema,
     GroupChatInputResponseSchema,
     GroupChatInputSchema,
     MessageCreateResponseSchema,
     MessageCreateSchema,
+    MessageSearchResponseSchema,
     MessageUpdateSchema,
 )
+from app.api.schemas.structs import ChatResponseStruct, ChatsResponseStruct
 from app.api.sockets.chat import send_message_deletion_in_socket
 from app.api.utils.file_processors import ALLOWED_FILE_TYPES
-from app.api.utils.paginators import Paginator
+from app.api.utils.paginators import (
+    Paginator,
+    cursor_datetime,
+    cursor_uuid,
+    decode_cursor,
+    encode_cursor,
+)
 from app.api.utils.tools import set_dict_attr
 from app.common.exception_handlers import ErrorCode
 
@@ -31,6 +41,7 @@ from app.api.schemas.base import ResponseSchema
 from app.common.exception_handlers import RequestError
 from app.db.models.accounts import User
 from app.db.models.chat import Chat, Message
+from app.db.search import search_messages
 from tortoise.expressions import Q
 
 paginator = Paginator()
@@ -43,14 +54,15 @@ class ChatsView(Controller):
             This endpoint retrieves a paginated list of the current user chats
             Only chats with type "GROUP" have name, image and description.
         """,
+        opt={"read_replica": True, "load_class": "heavy"},
     )
     async def retrieve_user_chats(
         self, user: User, page: int = 1
-    ) -> ChatsResponseSchema:
+    ) -> ChatsResponseStruct:
         chats = await get_chats_queryset(user)
         paginator.page_size = 200
         paginated_data = await paginator.paginate_queryset(chats, page)
-        return ChatsResponseSchema(message="Chats fetched", data=paginated_data)
+        return ChatsResponseStruct.from_page("Chats fetched", paginated_data)
 
     @post(
         "",
@@ -64,6 +76,7 @@ class ChatsView(Controller):
             ALLOWED FILE TYPES: {", ".join(ALLOWED_FILE_TYPES)}
         """,
         status_code=201,
+        opt={"load_class": "critical"},
     )
     async def send_message(
         self, data: MessageCreateSchema, user: User
@@ -107,9 +120,11 @@ class ChatsView(Controller):
             await chat.users.add(recipient_user)
         else:
             # Get the chat with chat id and check if the current user is the owner or the recipient
-            chat = await Chat.filter(
-                Q(owner_id=user.id) | Q(users__id=user.id)
-            ).get_or_none(id=chat_id)
+            chat = (
+                await Chat.filter(Q(owner_id=user.id) | Q(users__id=user.id))
+                .distinct()
+                .get_or_none(id=chat_id)
+            )
             if not chat:
                 raise RequestError(
                     err_code=ErrorCode.NON_EXISTENT,
@@ -132,10 +147,11 @@ class ChatsView(Controller):
         description="""
             This endpoint retrieves all messages in a chat.
         """,
+        opt={"load_class": "heavy"},
     )
     async def retrieve_messages(
         self, chat_id: UUID, user: User, page: int = 1
-    ) -> ChatResponseSchema:
+    ) -> ChatResponseStruct:
         chat = await get_chat_object(user, chat_id)
         paginator.page_size = 400
         paginated_data = await paginator.paginate_queryset(
@@ -147,7 +163,50 @@ class ChatsView(Controller):
         # Set latest message
         chat.latest_message = paginated_data["items"][:1]
         data = {"chat": chat, "messages": paginated_data, "recipients": chat.users}
-        return ChatResponseSchema(message="Messages fetched", data=data)
+        return ChatResponseStruct.from_data("Messages fetched", data)
+
+    @get(
+        "/{chat_id:uuid}/search",
+        summary="Search messages in a Chat",
+        description="""
+            This endpoint retrieves the messages of a chat containing all the words of q,
+            newest first, each with a snippet where the matches are wrapped in <mark> tags.
+            Use next_cursor from a response as cursor to get older results.
+        """,
+        opt={"load_class": "heavy"},
+    )
+    async def search_chat_messages(
+        self,
+        chat_id: UUID,
+        user: User,
+        q: Annotated[str, Parameter(min_length=1, max_length=200)],
+        cursor: Optional[str] = None,
+        limit: Annotated[int, Parameter(ge=1, le=50)] = 20,
+    ) -> MessageSearchResponseSchema:
+        await check_chat_membership(user, chat_id)
+        after = None
+        if cursor:
+            after = tuple(decode_cursor(cursor, cursor_datetime, cursor_uuid))
+        hits = await search_messages(Message._choose_db(), chat_id, q, limit + 1, after)
+        page = hits[:limit]
+        next_cursor = None
+        if len(hits) > limit:
+            id, created_at, _ = page[-1]
+            next_cursor = encode_cursor(created_at.isoformat(), id)
+
+        messages = await Message.filter(
+            id__in=[id for id, _, _ in page]
+        ).select_related("sender", "sender__avatar")
+        messages = {str(message.id): message for message in messages}
+        results = []
+        for id, _, snippet in page:
+            if id in messages:  # Unless deleted since the search
+                messages[id].search_snippet = snippet
+                results.append(messages[id])
+        return MessageSearchResponseSchema(
+            message="Messages found",
+            data={"results": results, "next_cursor": next_cursor},
+        )
 
     @patch(
         "/{chat_id:uuid}",
@@ -269,16 +328,17 @@ class MessagesView(Controller):
         chat_id = chat.id
         messages_count = await chat.messages.all().count()
 
-        # Send socket message
-        await send_message_deletion_in_socket(
-            is_secured(request), request.headers["host"], chat_id, message_id
-        )
+        async with in_transaction("default"):
+            # Send socket message
+            await send_message_deletion_in_socket(
+                is_secured(request), request.headers["host"], chat_id, message_id
+            )
 
-        # Delete message and chat if its the last message in the dm being deleted
-        if messages_count == 1 and chat.ctype == "DM":
-            await chat.delete()  # Message deletes if chat gets deleted (CASCADE)
-        else:
-            await message.delete()
+            # Delete message and chat if its the last message in the dm being deleted
+            if messages_count == 1 and chat.ctype == "DM":
+                await chat.delete()  # Message deletes if chat gets deleted (CASCADE)
+            else:
+                await message.delete()
         return ResponseSchema(message="Message deleted")
 
 
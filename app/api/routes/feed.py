@@ -1,15 +1,22 @@
-from typing import Annotated, Optional
+from typing import Annotated, Optional, Union
 from uuid import UUID
 
 from litestar import Controller, delete, get, post, put, Request
 from litestar.params import Parameter
+from tortoise.transactions import in_transaction
 from app.api.routes.utils import (
+    delete_reaction,
     get_comment_object,
+    get_expanded_post,
     get_post_object,
     get_reaction_focus_object,
     get_reactions_queryset,
     get_reply_object,
+    get_search_results,
     is_secured,
+    set_my_reactions,
+    upsert_reaction,
+    upsert_reaction_notification,
 )
 from app.api.schemas.feed import (
     CommentInputSchema,
@@ -17,17 +24,25 @@ from app.api.schemas.feed import (
     CommentWithRepliesResponseSchema,
     CommentsResponseSchema,
     PostInputResponseSchema,
+    PostDetailResponseSchema,
     PostInputSchema,
     PostResponseSchema,
-    PostsResponseSchema,
     ReactionInputSchema,
     ReactionResponseSchema,
     ReactionsResponseSchema,
     ReplyResponseSchema,
+    SearchResponseSchema,
 )
+from app.api.schemas.structs import PostsResponseStruct
 from app.api.utils.file_processors import ALLOWED_IMAGE_TYPES
 from app.api.utils.notification import send_notification_in_socket
-from app.api.utils.paginators import Paginator
+from app.api.utils.paginators import (
+    Paginator,
+    cursor_number,
+    cursor_string,
+    decode_cursor,
+    encode_cursor,
+)
 from app.api.utils.tools import set_dict_attr
 from app.common.exception_handlers import ErrorCode
 
@@ -36,8 +51,15 @@ from app.api.schemas.base import ResponseSchema
 from app.common.exception_handlers import RequestError
 from app.db.models.accounts import User
 from app.db.models.base import File
-from app.db.models.feed import Comment, Post, Reaction, Reply
+from app.db.models.feed import (
+    Comment,
+    Post,
+    Reaction,
+    ReactionType,
+    Reply,
+)
 from app.db.models.profiles import Notification
+from app.db.search import SEARCH_TABLES, search_feed
 from tortoise.functions import Count
 
 paginator = Paginator()
@@ -48,19 +70,24 @@ class PostsView(Controller):
 
     @get(
         summary="Retrieve Latest Posts",
-        description="This endpoint retrieves a paginated response of latest posts",
+        description="""
+            This endpoint retrieves a paginated response of latest posts.
+            my_reaction is the authenticated user's reaction to each post, null for guests.
+        """,
+        opt={"read_replica": True, "load_class": "heavy"},
     )
-    async def retrieve_posts(self, page: int = 1) -> PostsResponseSchema:
+    async def retrieve_posts(
+        self, client: Optional[User], page: int = 1
+    ) -> PostsResponseStruct:
         posts = (
             Post.all()
-            .annotate(
-                reactions_count=Count("reactions"), comments_count=Count("comments")
-            )
+            .annotate(comments_count=Count("comments"))
             .prefetch_related("author", "author__avatar", "image")
             .order_by("-created_at")
         )
         paginated_data = await paginator.paginate_queryset(posts, page)
-        return PostsResponseSchema(message="Posts fetched", data=paginated_data)
+        await set_my_reactions(client, POST=paginated_data["items"])
+        return PostsResponseStruct.from_page("Posts fetched", paginated_data)
 
     @post(
         summary="Create Post",
@@ -89,11 +116,30 @@ class PostsView(Controller):
     @get(
         "/{slug:str}",
         summary="Retrieve Single Post",
-        description="This endpoint retrieves a single post",
+        description="""
+            This endpoint retrieves a single post.
+            With expand=true, the post also comes with its first comments and the first
+            replies of each of them, as set by comments_limit and replies_limit.
+        """,
+        opt={"read_replica": True},
     )
-    async def retrieve_post(self, slug: str) -> PostResponseSchema:
-        post = await get_post_object(slug, "detailed")
-        return PostResponseSchema(message="Post Detail fetched", data=post)
+    async def retrieve_post(
+        self,
+        slug: str,
+        client: Optional[User],
+        expand: bool = False,
+        comments_limit: Annotated[int, Parameter(ge=1, le=50)] = 10,
+        replies_limit: Annotated[int, Parameter(ge=1, le=20)] = 3,
+    ) -> Union[PostResponseSchema, PostDetailResponseSchema]:
+        if not expand:
+            post = await get_post_object(slug, "detailed")
+            return PostResponseSchema(message="Post Detail fetched", data=post)
+
+        post = await get_expanded_post(slug, comments_limit, replies_limit)
+        comments = post.preview_comments
+        replies = [reply for comment in comments for reply in comment.preview_replies]
+        await set_my_reactions(client, POST=[post], COMMENT=comments, REPLY=replies)
+        return PostDetailResponseSchema(message="Post Detail fetched", data=post)
 
     @put(
         "/{slug:str}",
@@ -159,6 +205,7 @@ class ReactionsView(Controller):
         description="""
             This endpoint retrieves paginated responses of reactions of post, comment, reply.
         """,
+        opt={"read_replica": True},
     )
     async def retrieve_reactions(
         self,
@@ -194,39 +241,27 @@ class ReactionsView(Controller):
     ) -> ReactionResponseSchema:
         obj = await get_reaction_focus_object(focus, slug)
 
-        data = data.model_dump()
-        data["user"] = user
-        rtype = data.pop("rtype").value
+        rtype = ReactionType[data.rtype.value]
         obj_field = focus.lower()  # Focus object field (e.g post, comment, reply)
-        data[obj_field] = obj
 
-        reaction = await Reaction.get_or_none(**data).select_related(
-            "user", "user__avatar"
-        )
-        if reaction:
-            reaction.rtype = rtype
-            await reaction.save()
-        else:
-            data["rtype"] = rtype
-            reaction = await Reaction.create(**data)
-
-        # Create and Send Notification
-        if (
-            obj.author_id != user.id
-        ):  # Send notification only when it's not the user reacting to his data
-            ndata = {obj_field: obj}
-            notification, created = await Notification.get_or_create(
-                sender=user, ntype="REACTION", **ndata
-            )
-            if created:
-                await notification.receivers.add(obj.author)
+        # The notification event only goes out if the reaction is saved
+        async with in_transaction("default"):
+            reaction = await upsert_reaction(user, focus, obj, rtype)
 
-                # Send to websocket
-                await send_notification_in_socket(
-                    is_secured(request),
-                    request.headers["host"],
-                    notification,
+            # Create and Send Notification
+            if (
+                obj.author_id != user.id
+            ):  # Send notification only when it's not the user reacting to his data
+                notification = await upsert_reaction_notification(
+                    user, obj_field, obj, obj.author_id
                 )
+                if notification:
+                    # Send to websocket
+                    await send_notification_in_socket(
+                        is_secured(request),
+                        request.headers["host"],
+                        notification,
+                    )
         return ReactionResponseSchema(message="Reaction created", data=reaction)
 
     @delete(
@@ -240,9 +275,7 @@ class ReactionsView(Controller):
     async def remove_reaction(
         self, request: Request, id: UUID, user: User
     ) -> ResponseSchema:
-        reaction = await Reaction.get_or_none(id=id).select_related(
-            "post", "comment", "reply"
-        )
+        reaction = await Reaction.get_or_none(id=id)
         if not reaction:
             raise RequestError(
                 err_code=ErrorCode.NON_EXISTENT,
@@ -257,26 +290,26 @@ class ReactionsView(Controller):
             )
 
         # Remove Reaction Notification
-        targeted_obj = reaction.targeted_obj
-        targeted_field = f"{targeted_obj.__class__.__name__.lower()}_id"  # (post_id, comment_id or reply_id)
+        targeted_field = f"{reaction.target_type.name.lower()}_id"  # (post_id, comment_id or reply_id)
         data = {
             "sender": user,
             "ntype": "REACTION",
-            targeted_field: targeted_obj.id,
+            targeted_field: reaction.target_id,
         }
 
-        notification = await Notification.get_or_none(**data)
-        if notification:
-            # Send to websocket and delete notification
-            await send_notification_in_socket(
-                is_secured(request),
-                request.headers["host"],
-                notification,
-                status="DELETED",
-            )
-            await notification.delete()
+        async with in_transaction("default"):
+            notification = await Notification.get_or_none(**data)
+            if notification:
+                # Send to websocket and delete notification
+                await send_notification_in_socket(
+                    is_secured(request),
+                    request.headers["host"],
+                    notification,
+                    status="DELETED",
+                )
+                await notification.delete()
 
-        await reaction.delete()
+            await delete_reaction(reaction)
         return ResponseSchema(message="Reaction deleted")
 
 
@@ -292,15 +325,17 @@ class CommentsView(Controller):
         description="""
             This endpoint retrieves comments of a particular post.
         """,
+        opt={"read_replica": True, "load_class": "heavy"},
     )
     async def retrieve_comments(
-        self, slug: str, page: int = 1
+        self, slug: str, client: Optional[User], page: int = 1
     ) -> CommentsResponseSchema:
         post = await get_post_object(slug)
         comments = Comment.filter(post_id=post.id).select_related(
             "author", "author__avatar"
         )
         paginated_data = await paginator.paginate_queryset(comments, page)
+        await set_my_reactions(client, COMMENT=paginated_data["items"])
         return CommentsResponseSchema(message="Comments Fetched", data=paginated_data)
 
     @post(
@@ -315,21 +350,22 @@ class CommentsView(Controller):
         self, request: Request, slug: str, data: CommentInputSchema, user: User
     ) -> CommentResponseSchema:
         post = await get_post_object(slug, "detailed")
-        comment = await Comment.create(post=post, author=user, text=data.text)
-
-        # Create and Send Notification
-        if user.id != post.author_id:
-            notification = await Notification.create(
-                sender=user,
-                ntype="COMMENT",
-                comment=comment,
-                receiver_ids=[post.author],
-            )
-            await notification.receivers.add(post.author)
-            # Send to websocket
-            await send_notification_in_socket(
-                is_secured(request), request.headers["host"], notification
-            )
+        async with in_transaction("default"):
+            comment = await Comment.create(post=post, author=user, text=data.text)
+
+            # Create and Send Notification
+            if user.id != post.author_id:
+                notification = await Notification.create(
+                    sender=user,
+                    ntype="COMMENT",
+                    comment=comment,
+                    receiver_ids=[post.author],
+                )
+                await notification.receivers.add(post.author)
+                # Send to websocket
+                await send_notification_in_socket(
+                    is_secured(request), request.headers["host"], notification
+                )
         return CommentResponseSchema(message="Comment Created", data=comment)
 
 
@@ -342,15 +378,18 @@ class CommentView(Controller):
         description="""
             This endpoint retrieves a comment with replies.
         """,
+        opt={"read_replica": True},
     )
     async def retrieve_comment_with_replies(
-        self, slug: str, page: int = 1
+        self, slug: str, client: Optional[User], page: int = 1
     ) -> CommentWithRepliesResponseSchema:
         comment = await get_comment_object(slug)
         replies = Reply.filter(comment=comment).select_related(
             "author", "author__avatar"
         )
         paginated_data = await paginator.paginate_queryset(replies, page)
+        # The comment's and its replies' in the same query
+        await set_my_reactions(client, COMMENT=[comment], REPLY=paginated_data["items"])
         data = {"comment": comment, "replies": paginated_data}
         return CommentWithRepliesResponseSchema(
             message="Comment and Replies Fetched", data=data
@@ -368,20 +407,21 @@ class CommentView(Controller):
         self, request: Request, slug: str, data: CommentInputSchema, user: User
     ) -> ReplyResponseSchema:
         comment = await get_comment_object(slug)
-        reply = await Reply.create(author=user, comment=comment, text=data.text)
-
-        # Create and Send Notification
-        if user.id != comment.author_id:
-            notification = await Notification.create(
-                sender=user,
-                ntype="REPLY",
-                reply=reply,
-            )
-            await notification.receivers.add(comment.author)
-            # Send to websocket
-            await send_notification_in_socket(
-                is_secured(request), request.headers["host"], notification
-            )
+        async with in_transaction("default"):
+            reply = await Reply.create(author=user, comment=comment, text=data.text)
+
+            # Create and Send Notification
+            if user.id != comment.author_id:
+                notification = await Notification.create(
+                    sender=user,
+                    ntype="REPLY",
+                    reply=reply,
+                )
+                await notification.receivers.add(comment.author)
+                # Send to websocket
+                await send_notification_in_socket(
+                    is_secured(request), request.headers["host"], notification
+                )
         return ReplyResponseSchema(message="Reply Created", data=reply)
 
     @put(
@@ -424,22 +464,23 @@ class CommentView(Controller):
                 status_code=401,
             )
 
-        # Remove Comment Notification
-        notification = await Notification.get_or_none(
-            sender=user,
-            ntype="COMMENT",
-            comment=comment,
-        )
-        if notification:
-            # Send to websocket and delete notification
-            await send_notification_in_socket(
-                is_secured(request),
-                request.headers["host"],
-                notification,
-                status="DELETED",
+        async with in_transaction("default"):
+            # Remove Comment Notification
+            notification = await Notification.get_or_none(
+                sender=user,
+                ntype="COMMENT",
+                comment=comment,
             )
+            if notification:
+                # Send to websocket and delete notification
+                await send_notification_in_socket(
+                    is_secured(request),
+                    request.headers["host"],
+                    notification,
+                    status="DELETED",
+                )
 
-        await comment.delete()  # deletes notification alongside (CASCADE)
+            await comment.delete()  # deletes notification alongside (CASCADE)
         return ResponseSchema(message="Comment Deleted")
 
 
@@ -452,6 +493,7 @@ class ReplyView(Controller):
         description="""
             This endpoint retrieves a reply.
         """,
+        opt={"read_replica": True},
     )
     async def retrieve_reply(self, slug: str) -> ReplyResponseSchema:
         reply = await get_reply_object(slug)
@@ -497,21 +539,74 @@ class ReplyView(Controller):
                 status_code=401,
             )
 
-        # Remove Reply Notification
-        notification = await Notification.get_or_none(
-            sender=user, ntype="REPLY", reply=reply
-        )
-        if notification:
-            # Send to websocket and delete notification
-            await send_notification_in_socket(
-                is_secured(request),
-                request.headers["host"],
-                notification,
-                status="DELETED",
+        async with in_transaction("default"):
+            # Remove Reply Notification
+            notification = await Notification.get_or_none(
+                sender=user, ntype="REPLY", reply=reply
             )
+            if notification:
+                # Send to websocket and delete notification
+                await send_notification_in_socket(
+                    is_secured(request),
+                    request.headers["host"],
+                    notification,
+                    status="DELETED",
+                )
 
-        await reply.delete()  # deletes notification alongside (CASCADE)
+            await reply.delete()  # deletes notification alongside (CASCADE)
         return ResponseSchema(message="Reply Deleted")
 
 
-feed_handlers = [PostsView, ReactionsView, CommentsView, CommentView, ReplyView]
+# SEARCH
+
+
+class SearchView(Controller):
+    path = "/search"
+
+    @get(
+        summary="Search Posts, Comments and Replies",
+        description="""
+            This endpoint retrieves posts, comments and replies matching all the words of q,
+            best matches first. Use kind (POST, COMMENT or REPLY) to search only one of them,
+            and next_cursor from a response as cursor to get the following results.
+        """,
+        opt={"read_replica": True, "load_class": "heavy"},
+    )
+    async def search(
+        self,
+        q: Annotated[str, Parameter(min_length=1, max_length=200)],
+        kind: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: Annotated[int, Parameter(ge=1, le=50)] = 20,
+    ) -> SearchResponseSchema:
+        tables = SEARCH_TABLES
+        if kind:
+            if not kind.lower() in SEARCH_TABLES:
+                raise RequestError(
+                    err_code=ErrorCode.INVALID_VALUE,
+                    err_msg="Invalid 'kind' value",
+                )
+            tables = [kind.lower()]
+        after = decode_cursor(cursor, cursor_number, cursor_string) if cursor else None
+        # On the routed connection, so searches use the replica like the other reads
+        hits = await search_feed(Post._choose_db(), q, tables, limit + 1, after)
+        page = hits[:limit]
+        next_cursor = None
+        if len(hits) > limit:
+            _, id, rank = page[-1]
+            next_cursor = encode_cursor(rank, id)
+        results = await get_search_results(page)
+        return SearchResponseSchema(
+            message="Search results fetched",
+            data={"results": results, "next_cursor": next_cursor},
+        )
+
+
+feed_handlers = [
+    PostsView,
+    ReactionsView,
+    CommentsView,
+    CommentView,
+    ReplyView,
+    SearchView,
+]
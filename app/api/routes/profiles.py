@@ -1,5 +1,6 @@
-from typing import Optional
+from typing import Annotated, Optional
 from litestar import Controller, Response, get, post, put, patch
+from litestar.params import Parameter
 from app.api.routes.utils import (
     get_notifications_queryset,
     get_requestee_and_friend_obj,
@@ -11,14 +12,15 @@ from app.api.schemas.profiles import (
     AcceptFriendRequestSchema,
     CitiesResponseSchema,
     DeleteUserSchema,
-    NotificationsResponseSchema,
     ProfileResponseSchema,
     ProfileUpdateResponseSchema,
     ProfileUpdateSchema,
     ProfilesResponseSchema,
+    ProfilesSearchResponseSchema,
     ReadNotificationSchema,
     SendFriendRequestSchema,
 )
+from app.api.schemas.structs import NotificationsResponseStruct
 from app.api.utils.file_processors import ALLOWED_IMAGE_TYPES
 from app.api.utils.paginators import Paginator
 from app.api.utils.tools import set_dict_attr
@@ -28,6 +30,7 @@ import re
 
 from app.db.models.base import File
 from app.db.models.profiles import Friend, Notification
+from app.db.search import search_users
 
 paginator = Paginator()
 
@@ -65,6 +68,7 @@ class RetrieveUsersView(Controller):
     @get(
         summary="Retrieve Users",
         description="This endpoint retrieves a paginated list of users",
+        opt={"read_replica": True, "deadline": 5, "load_class": "heavy"},
     )
     async def retrieve_users(
         self, client: Optional[User], page: int = 1
@@ -73,6 +77,33 @@ class RetrieveUsersView(Controller):
         paginated_data = await paginator.paginate_queryset(users, page)
         return ProfilesResponseSchema(message="Users fetched", data=paginated_data)
 
+    @get(
+        "/search",
+        summary="Search Users",
+        description="""
+            This endpoint retrieves the users whose first name, last name or username starts
+            with q, then those whose names are close to it, best matches first.
+        """,
+        opt={"read_replica": True},
+    )
+    async def search_profiles(
+        self,
+        client: Optional[User],
+        q: Annotated[str, Parameter(min_length=2, max_length=100)],
+        limit: Annotated[int, Parameter(ge=1, le=50)] = 10,
+    ) -> ProfilesSearchResponseSchema:
+        # On the routed connection, so searches use the replica like the other reads
+        ids = await search_users(
+            User._choose_db(), q, limit, exclude=client.id if client else None
+        )
+        users = {
+            str(user.id): user
+            for user in await User.filter(id__in=ids).select_related("avatar", "city")
+        }
+        return ProfilesSearchResponseSchema(
+            message="Users fetched", data=[users[id] for id in ids if id in users]
+        )
+
 
 class RetrieveCitiesView(Controller):
     path = "/cities"
@@ -80,6 +111,7 @@ class RetrieveCitiesView(Controller):
     @get(
         summary="Retrieve Cities based on query params",
         description="This endpoint retrieves the first 10 cities that matches the query params",
+        opt={"read_replica": True},
     )
     async def retrieve_cities(self, name: Optional[str]) -> CitiesResponseSchema:
         cities = []
@@ -103,6 +135,7 @@ class UserProfileView(Controller):
         "/{username:str}",
         summary="Retrieve user's profile",
         description="This endpoint retrieves a particular user profile",
+        opt={"read_replica": True},
     )
     async def retrieve_user_profile(self, username: str) -> ProfileResponseSchema:
         user = await User.get_or_none(username=username).select_related(
@@ -188,6 +221,7 @@ class FriendsView(Controller):
     @get(
         summary="Retrieve Friends",
         description="This endpoint retrieves friends of a user",
+        opt={"load_class": "heavy"},
     )
     async def retrieve_friends(
         self, user: User, page: int = 1
@@ -323,16 +357,17 @@ class NotificationsView(Controller):
                 - Use comment slug to navigate to the comment.
                 - Use reply slug to navigate to the reply.
         """,
+        opt={"read_replica": True, "load_class": "heavy"},
     )
     async def retrieve_user_notifications(
         self, user: User, page: int = 1
-    ) -> NotificationsResponseSchema:
+    ) -> NotificationsResponseStruct:
         notifications = get_notifications_queryset(user)
 
         # Return paginated data and set is_read to every item
         paginated_data = await paginator.paginate_queryset(notifications, page)
-        return NotificationsResponseSchema(
-            message="Notifications fetched", data=paginated_data
+        return NotificationsResponseStruct.from_page(
+            "Notifications fetched", paginated_data
         )
 
     @post(
@@ -341,6 +376,7 @@ class NotificationsView(Controller):
             This endpoint reads a notification
         """,
         status_code=200,
+        opt={"deadline": 5},
     )
     async def read_notification(
         self, data: ReadNotificationSchema, user: User
@@ -1,13 +1,24 @@
-from typing import Literal
+from typing import Literal, Optional
+import uuid
 
 from litestar import Request
 from app.common.exception_handlers import ErrorCode, RequestError
 from app.db.models.accounts import User
 from app.db.models.base import File
 from app.db.models.chat import Chat, Message
-from app.db.models.feed import Comment, Post, Reaction, Reply
+from app.db.models.feed import (
+    Comment,
+    Post,
+    REACTION_COUNT_FIELDS,
+    Reaction,
+    ReactionTarget,
+    ReactionType,
+    Reply,
+)
 from app.db.models.profiles import Friend, Notification
-from tortoise.expressions import Q
+from tortoise import timezone
+from tortoise.connection import connections
+from tortoise.expressions import F, Q, RawSQL
 from tortoise.query_utils import Prefetch
 from tortoise.functions import Count
 
@@ -88,6 +99,7 @@ async def get_chat_object(user, chat_id):
         await Chat.filter(Q(owner=user) | Q(users__id=user.id))
         .select_related("owner", "owner__avatar", "image")
         .prefetch_related("users", "users__avatar")
+        .distinct()
         .get_or_none(id=chat_id)
     )
     if not chat:
@@ -99,6 +111,21 @@ async def get_chat_object(user, chat_id):
     return chat
 
 
+async def check_chat_membership(user, chat_id):
+    # get_chat_object's access check, without loading the chat
+    is_member = (
+        await Chat.filter(Q(owner=user) | Q(users__id=user.id), id=chat_id)
+        .distinct()
+        .exists()
+    )
+    if not is_member:
+        raise RequestError(
+            err_code=ErrorCode.NON_EXISTENT,
+            err_msg="User has no chat with that ID",
+            status_code=404,
+        )
+
+
 async def get_message_object(message_id, user):
     message = await Message.get_or_none(id=message_id, sender=user).select_related(
         "sender", "chat", "sender__avatar", "file"
@@ -170,6 +197,92 @@ async def get_post_object(slug, object_type: Literal["simple", "detailed"] = "si
     return post
 
 
+def prefixed_columns(model, alias):
+    # Selects every column of `model` as "<alias>__<column>", for from_prefixed_row()
+    return ", ".join(
+        f'"{alias}"."{column}" AS "{alias}__{column}"'
+        for column in model._meta.db_fields
+    )
+
+
+def from_prefixed_row(model, alias, row):
+    values = {column: row[f"{alias}__{column}"] for column in model._meta.db_fields}
+    return model._init_from_db(**values)
+
+
+async def get_expanded_post(slug, comments_limit: int, replies_limit: int):
+    """
+    The post with its first `comments_limit` comments (as `preview_comments`) and the
+    first `replies_limit` replies of each (as `preview_replies`), oldest first, in three
+    queries whatever the number of comments. The replies are ranked per comment with
+    ROW_NUMBER() so the limit applies to each comment rather than to the whole page.
+    """
+    # Counted in subqueries: with the joins, an aggregate would need every joined column
+    # in the GROUP BY on Postgres
+    post = (
+        await Post.annotate(
+            comments_count=RawSQL(
+                '(SELECT COUNT(*) FROM "comment" WHERE "comment"."post_id" = "post"."id")'
+            )
+        )
+        .select_related("author", "author__avatar", "image")
+        .get_or_none(slug=slug)
+    )
+    if not post:
+        raise RequestError(
+            err_code=ErrorCode.NON_EXISTENT,
+            err_msg="Post does not exist",
+            status_code=404,
+        )
+    comments = (
+        await Comment.filter(post_id=post.id)
+        .annotate(
+            replies_count=RawSQL(
+                '(SELECT COUNT(*) FROM "reply" WHERE "reply"."comment_id" = "comment"."id")'
+            )
+        )
+        .select_related("author", "author__avatar")
+        .order_by("created_at", "id")
+        .limit(comments_limit)
+    )
+    post.preview_comments = comments
+    if not comments:
+        return post
+
+    # Same connection as the queries above, the replica included
+    conn = Reply._choose_db()
+    params = sql_placeholders(conn, len(comments) + 1)
+    rows = await conn.execute_query_dict(
+        f"""
+        SELECT {prefixed_columns(Reply, "reply")}, {prefixed_columns(User, "author")},
+            {prefixed_columns(File, "avatar")}
+        FROM (
+            SELECT "reply".*, ROW_NUMBER() OVER (
+                PARTITION BY "reply"."comment_id" ORDER BY "reply"."created_at", "reply"."id"
+            ) AS "position"
+            FROM "reply" WHERE "reply"."comment_id" IN ({", ".join(params[:-1])})
+        ) AS "reply"
+        JOIN "user" AS "author" ON "author"."id" = "reply"."author_id"
+        LEFT JOIN "file" AS "avatar" ON "avatar"."id" = "author"."avatar_id"
+        WHERE "reply"."position" <= {params[-1]}
+        ORDER BY "reply"."position"
+        """,
+        [str(comment.id) for comment in comments] + [replies_limit],
+    )
+    replies = {comment.id: [] for comment in comments}
+    for row in rows:
+        reply = from_prefixed_row(Reply, "reply", row)
+        author = from_prefixed_row(User, "author", row)
+        author.avatar = (
+            from_prefixed_row(File, "avatar", row) if row["avatar__id"] else None
+        )
+        reply.author = author
+        replies[reply.comment_id].append(reply)
+    for comment in comments:
+        comment.preview_replies = replies[comment.id]
+    return post
+
+
 reaction_focus = {"POST": Post, "COMMENT": Comment, "REPLY": Reply}
 
 
@@ -183,12 +296,28 @@ async def validate_reaction_focus(focus):
     return reaction_focus[focus]
 
 
+async def get_search_results(hits):
+    # The posts, comments and replies of `hits` in the same order, one query per kind.
+    # Anything deleted since the search is left out.
+    ids = {}
+    for kind, id, _ in hits:
+        ids.setdefault(kind, []).append(id)
+    objects = {}
+    for kind, kind_ids in ids.items():
+        for obj in (
+            await reaction_focus[kind]
+            .filter(id__in=kind_ids)
+            .select_related("author", "author__avatar")
+        ):
+            obj.search_kind = kind
+            objects[str(obj.id)] = obj
+    return [objects[id] for _, id, _ in hits if id in objects]
+
+
 async def get_reaction_focus_object(focus, slug):
     focus_model = await validate_reaction_focus(focus)
-    related = ["author"]  # Related object to preload
-    if focus_model == Comment:
-        related.append("post")  # Also preload post object for comment
-    obj = await focus_model.get_or_none(slug=slug).select_related(*related)
+    # Callers only need the ids, so no joins
+    obj = await focus_model.get_or_none(slug=slug).only("id", "author_id")
     if not obj:
         raise RequestError(
             err_code=ErrorCode.NON_EXISTENT,
@@ -200,19 +329,191 @@ async def get_reaction_focus_object(focus, slug):
 
 async def get_reactions_queryset(focus, slug, rtype=None):
     focus_obj = await get_reaction_focus_object(focus, slug)
-    focus_obj_field = f"{focus.lower()}_id"  # Field to filter reactions by (e.g post_id, comment_id, reply_id)
-    filter = {focus_obj_field: focus_obj.id}
+    filter = {"target_type": ReactionTarget[focus], "target_id": focus_obj.id}
     if rtype:
-        filter["rtype"] = rtype  # Filter by reaction type if the query param is present
+        # Filter by reaction type if the query param is present
+        if not rtype in ReactionType.__members__:
+            raise RequestError(
+                err_code=ErrorCode.INVALID_VALUE,
+                err_msg="Invalid 'reaction_type' value",
+            )
+        filter["rtype"] = ReactionType[rtype]
     reactions = Reaction.filter(**filter).select_related("user", "user__avatar")
     return reactions
 
 
+def sql_placeholders(conn, count):
+    if conn.capabilities.dialect == "postgres":
+        return [f"${i}" for i in range(1, count + 1)]
+    return ["?"] * count
+
+
+async def set_my_reactions(client: Optional[User], **items_by_target: list) -> None:
+    # Sets `my_reaction` (the client's reaction type or None) on a page of posts, comments
+    # or replies, passed by target type (e.g. POST=posts, REPLY=replies), with a single
+    # query whatever their number or kind. Each id is only matched with its own target
+    # type, so a row of another table sharing the id can't leak its reaction.
+    my_reactions = {}
+    targets = {
+        ReactionTarget[focus]: [item.id for item in items]
+        for focus, items in items_by_target.items()
+        if items
+    }
+    if client and targets:
+        condition = Q(
+            *[
+                Q(target_type=target_type, target_id__in=ids)
+                for target_type, ids in targets.items()
+            ],
+            join_type=Q.OR,
+        )
+        rows = await Reaction.filter(condition, user_id=client.id).values_list(
+            "target_type", "target_id", "rtype"
+        )
+        my_reactions = {
+            (target_type, target_id): rtype.name
+            for target_type, target_id, rtype in rows
+        }
+    for focus, items in items_by_target.items():
+        target_type = ReactionTarget[focus]
+        for item in items:
+            item.my_reaction = my_reactions.get((target_type, item.id))
+
+
+async def update_reaction_counts(
+    target_type: ReactionTarget,
+    target_id,
+    added: Optional[ReactionType] = None,
+    removed: Optional[ReactionType] = None,
+):
+    # One UPDATE relative to the stored values, so concurrent reactions don't overwrite
+    # each other's counts
+    changes = {}
+    if added:
+        field = REACTION_COUNT_FIELDS[added]
+        changes[field] = F(field) + 1
+    if removed:
+        field = REACTION_COUNT_FIELDS[removed]
+        changes[field] = F(field) - 1
+    await reaction_focus[target_type.name].filter(id=target_id).update(**changes)
+
+
+async def upsert_reaction(user, focus, obj, rtype: ReactionType) -> Reaction:
+    # Creates the reaction or changes its type, and moves the target's counters along.
+    # Must run in a transaction. A single upsert on the (user, target_type, target_id)
+    # unique constraint, followed by at most one counters update. On Postgres the
+    # previous type comes from a CTE, which reads the statement's snapshot, and `xmax`
+    # tells an insert from an update. SQLite evaluates RETURNING once the row changed,
+    # but serializes writers, so there the previous type is read beforehand.
+    conn = connections.get("default")
+    now = timezone.now()
+    target_type = ReactionTarget[focus]
+    params = sql_placeholders(conn, 7)
+    previous_cte = returning = ""
+    previous = None
+    if conn.capabilities.dialect == "postgres":
+        previous_cte = f"""
+        WITH "previous" AS (
+            SELECT "rtype" FROM "reaction"
+            WHERE "user_id" = {params[3]} AND "target_type" = {params[5]}
+                AND "target_id" = {params[6]}
+        )"""
+        returning = (
+            ', (SELECT "rtype" FROM "previous") AS "previous", "xmax" = 0 AS "inserted"'
+        )
+    else:
+        previous = (
+            await Reaction.filter(
+                user_id=user.id, target_type=target_type, target_id=obj.id
+            )
+            .first()
+            .values_list("rtype", flat=True)
+        )
+    rows = await conn.execute_query_dict(
+        f"""{previous_cte}
+        INSERT INTO "reaction" ("id", "created_at", "updated_at", "user_id", "rtype",
+            "target_type", "target_id")
+        VALUES ({", ".join(params)})
+        ON CONFLICT ("user_id", "target_type", "target_id") DO UPDATE SET
+            "rtype" = EXCLUDED."rtype",
+            "updated_at" = CASE WHEN "reaction"."rtype" = EXCLUDED."rtype"
+                THEN "reaction"."updated_at" ELSE EXCLUDED."updated_at" END
+        RETURNING "id"{returning}
+        """,
+        [
+            str(uuid.uuid4()),
+            now,
+            now,
+            str(user.id),
+            rtype.value,
+            target_type.value,
+            str(obj.id),
+        ],
+    )
+    row = rows[0]
+    if "inserted" in row and not row["inserted"] and row["previous"] is not None:
+        previous = ReactionType(row["previous"])
+    if previous != rtype:
+        await update_reaction_counts(target_type, obj.id, added=rtype, removed=previous)
+    return Reaction(
+        id=row["id"],
+        user=user,
+        rtype=rtype,
+        target_type=target_type,
+        target_id=obj.id,
+    )
+
+
+async def delete_reaction(reaction: Reaction) -> None:
+    # Must run in a transaction. The deleted row tells which counter to take down, in case
+    # its type changed since it was read.
+    conn = connections.get("default")
+    rows = await conn.execute_query_dict(
+        f'DELETE FROM "reaction" WHERE "id" = {sql_placeholders(conn, 1)[0]} '
+        'RETURNING "rtype"',
+        [str(reaction.id)],
+    )
+    if rows:
+        await update_reaction_counts(
+            reaction.target_type,
+            reaction.target_id,
+            removed=ReactionType(rows[0]["rtype"]),
+        )
+
+
+async def upsert_reaction_notification(
+    user, obj_field, obj, receiver_id
+) -> Optional[Notification]:
+    # Returns the notification only when it is new, an existing one is left as is
+    conn = connections.get("default")
+    now = timezone.now()
+    params = sql_placeholders(conn, 6)
+    rows = await conn.execute_query_dict(
+        f"""
+        INSERT INTO "notification"
+            ("id", "created_at", "updated_at", "sender_id", "ntype", "{obj_field}_id")
+        VALUES ({", ".join(params)})
+        ON CONFLICT ("sender_id", "ntype", "{obj_field}_id") DO NOTHING
+        RETURNING "id"
+        """,
+        [str(uuid.uuid4()), now, now, str(user.id), "REACTION", str(obj.id)],
+    )
+    if not rows:
+        return None
+    notification_id = rows[0]["id"]
+    await conn.execute_query(
+        'INSERT INTO "notification_user" ("notification_id", "user_id") '
+        f"VALUES ({', '.join(sql_placeholders(conn, 2))})",
+        [str(notification_id), str(receiver_id)],
+    )
+    return Notification(
+        id=notification_id, sender=user, ntype="REACTION", **{obj_field: obj}
+    )
+
+
 async def get_comment_object(slug):
     comment = (
-        await Comment.annotate(
-            replies_count=Count("replies"), reactions_count=Count("reactions")
-        )
+        await Comment.annotate(replies_count=Count("replies"))
         .get_or_none(slug=slug)
         .prefetch_related("author", "author__avatar", "post")
     )
@@ -239,10 +540,8 @@ async def get_reply_object(slug):
 
 
 async def get_reply_object(slug):
-    reply = (
-        await Reply.annotate(reactions_count=Count("reactions"))
-        .get_or_none(slug=slug)
-        .prefetch_related("author", "author__avatar")
+    reply = await Reply.get_or_none(slug=slug).prefetch_related(
+        "author", "author__avatar"
     )
     if not reply:
         raise RequestError(
@@ -28,6 +28,10 @@ class PaginatedResponseDataSchema(BaseModel):
     last_page: int
 
 
+class CursorPaginatedResponseDataSchema(BaseModel):
+    next_cursor: Optional[str] = None
+
+
 class UserDataSchema(BaseModel):
     name: str = Field(..., alias="full_name")
     username: str
@@ -2,6 +2,7 @@ from typing import Any, Dict, List, Optional
 from pydantic import Field, computed_field, validator
 from app.api.schemas.base import (
     BaseModel,
+    CursorPaginatedResponseDataSchema,
     PaginatedResponseDataSchema,
     ResponseSchema,
     UserDataSchema,
@@ -176,3 +177,22 @@ class GroupChatInputResponseDataSchema(GroupChatSchema):
 
 class GroupChatInputResponseSchema(ResponseSchema):
     data: GroupChatInputResponseDataSchema
+
+
+class MessageSearchResultSchema(BaseModel):
+    id: UUID
+    sender: UserDataSchema
+    snippet: str = Field(
+        ...,
+        example="... see you <mark>tomorrow</mark> at the ...",
+        alias="search_snippet",
+    )
+    created_at: datetime
+
+
+class MessageSearchResponseDataSchema(CursorPaginatedResponseDataSchema):
+    results: List[MessageSearchResultSchema]
+
+
+class MessageSearchResponseSchema(ResponseSchema):
+    data: MessageSearchResponseDataSchema
@@ -1,9 +1,10 @@
 from uuid import UUID
 from pydantic import Field, computed_field, validator
 
-from app.db.models.feed import ReactionChoices
+from app.db.models.feed import ReactionChoices, ReactionType
 from .base import (
     BaseModel,
+    CursorPaginatedResponseDataSchema,
     ResponseSchema,
     UserDataSchema,
     PaginatedResponseDataSchema,
@@ -19,6 +20,8 @@ class PostSchema(BaseModel):
     text: str
     slug: str = Field(..., example="john-doe-d10dde64-a242-4ed0-bd75-4c759644b3a6")
     reactions_count: int = 0
+    reactions_breakdown: Dict[str, int] = {}
+    my_reaction: Optional[str] = None
     comments_count: int = 0
     image: Optional[str] = Field(..., example="https://img.url", alias="get_image")
     created_at: datetime
@@ -71,6 +74,11 @@ class ReactionSchema(BaseModel):
     user: UserDataSchema
     rtype: str = "LIKE"
 
+    @validator("rtype", pre=True)
+    def resolve_rtype(cls, v):
+        # Stored as a ReactionType, shown by name
+        return v.name if isinstance(v, ReactionType) else v
+
 
 class ReactionInputSchema(BaseModel):
     rtype: ReactionChoices
@@ -96,6 +104,8 @@ class ReplySchema(BaseModel):
     slug: str
     text: str
     reactions_count: int = 0
+    reactions_breakdown: Dict[str, int] = {}
+    my_reaction: Optional[str] = None
 
 
 class CommentSchema(ReplySchema):
@@ -133,3 +143,32 @@ class CommentWithRepliesResponseSchema(ResponseSchema):
 
 class ReplyResponseSchema(ResponseSchema):
     data: ReplySchema
+
+
+class CommentPreviewSchema(CommentSchema):
+    replies: List[ReplySchema] = Field([], alias="preview_replies")
+
+
+class PostDetailSchema(PostSchema):
+    comments: List[CommentPreviewSchema] = Field([], alias="preview_comments")
+
+
+class PostDetailResponseSchema(ResponseSchema):
+    data: PostDetailSchema
+
+
+# SEARCH
+class SearchResultSchema(BaseModel):
+    kind: str = Field(..., example="POST", alias="search_kind")
+    author: UserDataSchema
+    slug: str
+    text: str
+    created_at: datetime
+
+
+class SearchResponseDataSchema(CursorPaginatedResponseDataSchema):
+    results: List[SearchResultSchema]
+
+
+class SearchResponseSchema(ResponseSchema):
+    data: SearchResponseDataSchema
@@ -69,6 +69,10 @@ class ProfilesResponseSchema(ResponseSchema):
     data: ProfilesResponseDataSchema
 
 
+class ProfilesSearchResponseSchema(ResponseSchema):
+    data: List[ProfileSchema]
+
+
 class ProfileResponseSchema(ResponseSchema):
     data: ProfileSchema
 
@@ -0,0 +1,232 @@
+"""
+msgspec mirrors of the heaviest list response schemas. They are built straight from the
+loaded ORM objects, skipping pydantic validation, and keep the field names and order of
+the pydantic schemas so the JSON output stays byte-identical.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from msgspec import Struct
+
+
+def enum_value(value):
+    # CharEnumField values are enums when loaded from the db but plain strings right after create
+    return getattr(value, "value", value)
+
+
+class ResponseStruct(Struct, kw_only=True):
+    status: str = "success"
+    message: str
+
+
+class PaginatedResponseDataStruct(Struct, kw_only=True):
+    per_page: int
+    current_page: int
+    last_page: int
+
+
+class UserDataStruct(Struct):
+    name: str
+    username: str
+    avatar: Optional[str]
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(name=user.full_name, username=user.username, avatar=user.get_avatar)
+
+
+# FEED
+class PostStruct(Struct):
+    author: UserDataStruct
+    text: str
+    slug: str
+    reactions_count: int
+    reactions_breakdown: Dict[str, int]
+    my_reaction: Optional[str]
+    comments_count: int
+    image: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_post(cls, post):
+        return cls(
+            author=UserDataStruct.from_user(post.author),
+            text=post.text,
+            slug=post.slug,
+            reactions_count=post.reactions_count,
+            reactions_breakdown=post.reactions_breakdown,
+            my_reaction=getattr(post, "my_reaction", None),
+            comments_count=getattr(post, "comments_count", 0),
+            image=post.get_image,
+            created_at=post.created_at,
+            updated_at=post.updated_at,
+        )
+
+
+class PostsResponseDataStruct(PaginatedResponseDataStruct, kw_only=True):
+    posts: List[PostStruct]
+
+
+class PostsResponseStruct(ResponseStruct, kw_only=True):
+    data: PostsResponseDataStruct
+
+    @classmethod
+    def from_page(cls, message, paginated_data):
+        items = paginated_data.pop("items")
+        data = PostsResponseDataStruct(
+            **paginated_data, posts=[PostStruct.from_post(post) for post in items]
+        )
+        return cls(message=message, data=data)
+
+
+# NOTIFICATIONS
+class NotificationStruct(Struct):
+    id: UUID
+    sender: Optional[UserDataStruct]
+    ntype: str
+    message: str
+    post_slug: Optional[str]
+    comment_slug: Optional[str]
+    reply_slug: Optional[str]
+    is_read: bool
+
+    @classmethod
+    def from_notification(cls, notification):
+        sender = notification.sender
+        return cls(
+            id=notification.id,
+            sender=UserDataStruct.from_user(sender) if sender else None,
+            ntype=enum_value(notification.ntype),
+            message=notification.message,
+            post_slug=notification.post_slug,
+            comment_slug=notification.comment_slug,
+            reply_slug=notification.reply_slug,
+            is_read=notification.is_read,
+        )
+
+
+class NotificationsResponseDataStruct(PaginatedResponseDataStruct, kw_only=True):
+    notifications: List[NotificationStruct]
+
+
+class NotificationsResponseStruct(ResponseStruct, kw_only=True):
+    data: NotificationsResponseDataStruct
+
+    @classmethod
+    def from_page(cls, message, paginated_data):
+        items = paginated_data.pop("items")
+        data = NotificationsResponseDataStruct(
+            **paginated_data,
+            notifications=[NotificationStruct.from_notification(n) for n in items],
+        )
+        return cls(message=message, data=data)
+
+
+# CHATS
+class LatestMessageStruct(Struct):
+    sender: UserDataStruct
+    text: Optional[str]
+    file: Optional[str]
+
+
+class ChatStruct(Struct):
+    id: UUID
+    name: Optional[str]
+    owner: UserDataStruct
+    ctype: str
+    description: Optional[str]
+    image: Optional[str]
+    latest_message: Optional[LatestMessageStruct]
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_chat(cls, chat):
+        latest_message = None
+        if chat.latest_message:
+            message = chat.latest_message[0]
+            latest_message = LatestMessageStruct(
+                sender=UserDataStruct.from_user(message.sender),
+                text=message.text,
+                file=message.get_file,
+            )
+        return cls(
+            id=chat.id,
+            name=chat.name,
+            owner=UserDataStruct.from_user(chat.owner),
+            ctype=enum_value(chat.ctype),
+            description=chat.description,
+            image=chat.get_image,
+            latest_message=latest_message,
+            created_at=chat.created_at,
+            updated_at=chat.updated_at,
+        )
+
+
+class ChatsResponseDataStruct(PaginatedResponseDataStruct, kw_only=True):
+    chats: List[ChatStruct]
+
+
+class ChatsResponseStruct(ResponseStruct, kw_only=True):
+    data: ChatsResponseDataStruct
+
+    @classmethod
+    def from_page(cls, message, paginated_data):
+        items = paginated_data.pop("items")
+        data = ChatsResponseDataStruct(
+            **paginated_data, chats=[ChatStruct.from_chat(chat) for chat in items]
+        )
+        return cls(message=message, data=data)
+
+
+class MessageStruct(Struct):
+    id: UUID
+    chat_id: UUID
+    sender: UserDataStruct
+    text: Optional[str]
+    file: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_message(cls, message):
+        return cls(
+            id=message.id,
+            chat_id=message.chat_id,
+            sender=UserDataStruct.from_user(message.sender),
+            text=message.text,
+            file=message.get_file,
+            created_at=message.created_at,
+            updated_at=message.updated_at,
+        )
+
+
+class MessagesResponseDataStruct(PaginatedResponseDataStruct, kw_only=True):
+    items: List[MessageStruct]
+
+
+class MessagesStruct(Struct):
+    chat: ChatStruct
+    messages: MessagesResponseDataStruct
+    users: List[UserDataStruct]
+
+
+class ChatResponseStruct(ResponseStruct, kw_only=True):
+    data: MessagesStruct
+
+    @classmethod
+    def from_data(cls, message, data: Dict):
+        paginated_data = data["messages"]
+        items = paginated_data.pop("items")
+        messages = MessagesResponseDataStruct(
+            **paginated_data, items=[MessageStruct.from_message(m) for m in items]
+        )
+        data = MessagesStruct(
+            chat=ChatStruct.from_chat(data["chat"]),
+            messages=messages,
+            users=[UserDataStruct.from_user(user) for user in data["recipients"]],
+        )
+        return cls(message=message, data=data)
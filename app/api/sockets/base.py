@@ -4,6 +4,7 @@ from litestar.handlers import WebsocketListener
 from litestar import WebSocket
 
 from app.common.exception_handlers import ErrorCode, SocketError
+from app.common.metrics import websocket_connections
 from app.db.models.accounts import User
 
 
@@ -15,12 +16,14 @@ class BaseSocketConnectionHandler(WebsocketListener):
             await self.send_error_data(socket, user.err_msg, user.err_type, user.code)
         if isinstance(user, User):
             self.active_connections.append(socket)
+            websocket_connections.inc(type(self).__name__)
             socket.scope["user"] = user
 
     async def on_disconnect(self, socket: WebSocket):
         connections = self.active_connections
         if socket in connections:
             connections.remove(socket)
+            websocket_connections.dec(type(self).__name__)
 
     async def on_receive(self, socket: WebSocket, data: str):
         try:
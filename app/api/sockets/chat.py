@@ -1,13 +1,20 @@
-import json
-import os
-from typing import Any, Literal
+from collections import defaultdict
+import time
+from typing import Any, List, Literal
 from uuid import UUID
 from litestar import WebSocket
 from pydantic import BaseModel
-import websockets
 from app.api.schemas.chat import MessageSchema
 from app.api.sockets.base import BaseSocketConnectionHandler
 from app.common.exception_handlers import ErrorCode
+from app.common.metrics import websocket_fanout_duration, websocket_fanout_recipients
+from app.common.outbox import (
+    deliver_by_host,
+    outbox_handler,
+    push_to_socket,
+    record_event,
+)
+from app.common.tracing import start_span
 from app.core.config import settings
 from app.db.models.accounts import User
 from app.db.models.chat import Chat, Message
@@ -36,7 +43,7 @@ class ChatSocketHandler(BaseSocketConnectionHandler):
             await self.send_error_data(socket, "Invalid ID", "invalid_input", 4004)
 
         if (
-            chat and user not in (await chat.users.all()) and user_id != chat.owner_id
+            chat and user not in chat.users and user_id != chat.owner_id
         ):  # If chat but user is not a member
             await self.send_error_data(
                 socket, "You're not a member of this chat", "invalid_member", 4001
@@ -96,36 +103,61 @@ class ChatSocketHandler(BaseSocketConnectionHandler):
                 exclude={"id", "chat", "created_at", "updated_at"}
             )
 
-        for connection in self.active_connections:
-            # Only true receivers should access the data
-            if connection.scope["group_name"] == socket.scope["group_name"]:
-                user = connection.scope["user"]
-                obj_user = connection.scope.get("obj_user")
-                if obj_user:
-                    # Ensure that reading messages from a user id can only be done by the owner
-                    if user == obj_user:
+        start, recipients = time.perf_counter(), 0
+        with start_span(
+            "websocket.fanout",
+            handler="ChatSocketHandler",
+            chat_id=socket.path_params.get("id"),
+            status=status,
+        ) as span:
+            for connection in self.active_connections:
+                # Only true receivers should access the data
+                if connection.scope["group_name"] == socket.scope["group_name"]:
+                    user = connection.scope["user"]
+                    obj_user = connection.scope.get("obj_user")
+                    if obj_user:
+                        # Ensure that reading messages from a user id can only be done by the owner
+                        if user == obj_user:
+                            await connection.send_json(message_data)
+                            recipients += 1
+                    else:
                         await connection.send_json(message_data)
-                else:
-                    await connection.send_json(message_data)
+                        recipients += 1
+            if span:
+                span.set_attribute("fanout_size", recipients)
+        websocket_fanout_duration.observe(
+            time.perf_counter() - start, "ChatSocketHandler"
+        )
+        websocket_fanout_recipients.inc("ChatSocketHandler", amount=recipients)
         return "Sent"
 
 
-# Send message deletion details in websocket
+# Send message deletion details in websocket, once the surrounding transaction commits
 async def send_message_deletion_in_socket(
     secured: bool, host: str, chat_id: UUID, message_id: UUID
 ):
-    if os.environ.get("ENVIRONMENT") == "testing":
-        return
-    websocket_scheme = "wss://" if secured else "ws://"
-    uri = f"{websocket_scheme}{host}/api/v5/ws/chats/{chat_id}"
-    chat_data = {
-        "id": str(message_id),
-        "status": "DELETED",
-    }
-    headers = [
-        ("Authorization", settings.SOCKET_SECRET),
-    ]
-    async with websockets.connect(uri, extra_headers=headers) as websocket:
-        # Send the message to the WebSocket server
-        await websocket.send(json.dumps(chat_data))
-        await websocket.close()
+    await record_event(
+        "chat",
+        {
+            "secured": secured,
+            "host": host,
+            "chat_id": str(chat_id),
+            "id": str(message_id),
+            "status": "DELETED",
+        },
+    )
+
+
+@outbox_handler("chat")
+async def deliver_chat_events(events: List[dict]):
+    async def deliver(secured, host, host_events):
+        by_chat = defaultdict(list)
+        for event in host_events:
+            payload = event["payload"]
+            by_chat[payload["chat_id"]].append(
+                {"id": payload["id"], "status": payload["status"]}
+            )
+        for chat_id, messages in by_chat.items():
+            await push_to_socket(secured, host, f"/api/v5/ws/chats/{chat_id}", messages)
+
+    return await deliver_by_host(events, deliver)
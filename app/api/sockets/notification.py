@@ -1,9 +1,12 @@
 from typing import Any, Literal
+import time
 from uuid import UUID
 from litestar import WebSocket
 from pydantic import BaseModel
 from app.api.sockets.base import BaseSocketConnectionHandler
 from app.common.exception_handlers import ErrorCode
+from app.common.metrics import websocket_fanout_duration, websocket_fanout_recipients
+from app.common.tracing import start_span
 from app.db.models.profiles import Notification
 
 
@@ -26,12 +29,26 @@ class NotificationSocketHandler(BaseSocketConnectionHandler):
                 socket, "Invalid Notification data", ErrorCode.INVALID_ENTRY
             )
 
-        for connection in self.active_connections:
-            user = connection.scope["user"]
-            user_is_among_receivers = await Notification.filter(
-                receivers__id=user.id, id=data["id"]
-            )
-            if user_is_among_receivers:
-                # Only true receivers should access the data
-                await connection.send_json(data)
+        start, recipients = time.perf_counter(), 0
+        with start_span(
+            "websocket.fanout",
+            handler="NotificationSocketHandler",
+            notification_id=data["id"],
+            connections=len(self.active_connections),
+        ) as span:
+            for connection in self.active_connections:
+                user = connection.scope["user"]
+                user_is_among_receivers = await Notification.filter(
+                    receivers__id=user.id, id=data["id"]
+                )
+                if user_is_among_receivers:
+                    # Only true receivers should access the data
+                    await connection.send_json(data)
+                    recipients += 1
+            if span:
+                span.set_attribute("fanout_size", recipients)
+        websocket_fanout_duration.observe(
+            time.perf_counter() - start, "NotificationSocketHandler"
+        )
+        websocket_fanout_recipients.inc("NotificationSocketHandler", amount=recipients)
         return "Sent"
@@ -1,5 +1,5 @@
 from litestar.testing import AsyncTestClient
-from app.db.config import TORTOISE_ORM
+from app.db.config import TORTOISE_ORM, generate_schemas
 from app.db.models.accounts import City, Country, Region, User
 from tortoise import Tortoise
 from tortoise.connection import connections
@@ -7,8 +7,16 @@ from tortoise.connection import connections
 from app.api.utils.auth import Authentication
 import pytest, asyncio, os
 from app.db.models.chat import Chat, Message
-from app.db.models.feed import Comment, Post, Reaction, Reply
+from app.db.models.feed import (
+    Comment,
+    Post,
+    Reaction,
+    ReactionTarget,
+    ReactionType,
+    Reply,
+)
 from app.db.models.profiles import Friend
+from app.api.routes.utils import update_reaction_counts
 from app.main import app
 
 os.environ["ENVIRONMENT"] = "testing"
@@ -33,7 +41,7 @@ async def db_conf():
 @pytest.fixture()
 async def setup_db(db_conf):
     await Tortoise.init(config=db_conf)
-    await Tortoise.generate_schemas()
+    await generate_schemas()
     yield
     await connections.close_all()
     await Tortoise._drop_databases()
@@ -198,7 +206,13 @@ async def post(verified_user):
 async def reaction(post):
     # Create Reaction
     author = post.author
-    reaction = await Reaction.create(rtype="LIKE", user=author, post=post)
+    reaction = await Reaction.create(
+        rtype=ReactionType.LIKE,
+        user=author,
+        target_type=ReactionTarget.POST,
+        target_id=post.id,
+    )
+    await update_reaction_counts(ReactionTarget.POST, post.id, added=ReactionType.LIKE)
     return reaction
 
 
@@ -207,7 +221,6 @@ async def comment(post):
     # Create Comment
     author = post.author
     comment = await Comment.create(text="Just a comment", author=author, post=post)
-    comment.reactions_count = 0
     comment.replies_count = 0
     return comment
 
@@ -217,8 +230,16 @@ async def reply(comment):
     # Create Reply
     author = comment.author
     reply = await Reply.create(text="Simple reply", author=author, comment=comment)
-    reply.reactions_count = 0
     return reply
 
 
 # -------------------------------------------------------------------------------
+
+
+# QUERY FIXTURES
+@pytest.fixture
+def assert_max_queries():
+    """Usage: `with assert_max_queries(5): await client.get(...)`"""
+    from app.common.queries import assert_max_queries
+
+    return assert_max_queries
@@ -1,6 +1,8 @@
 from app.api.utils.auth import Authentication
 from app.common.exception_handlers import ErrorCode
+from app.common.ratelimit import build_rate_limiter, client_identity
 from app.db.models.accounts import Otp, User
+from app.db.models.general import Job
 
 BASE_URL_PATH = "/api/v5/auth"
 
@@ -25,6 +27,9 @@ async def test_register_user(client):
         "message": "Registration successful",
         "data": {"email": user_in["email"]},
     }
+    # The activation email is sent by a job worker
+    job = await Job.get(name="send_email")
+    assert job.payload["type"] == "activate"
 
     # Verify that a user with the same email cannot be registered again
     response = await client.post(f"{BASE_URL_PATH}/register", json=user_in)
@@ -276,3 +281,40 @@ async def test_logout(authorized_client):
         "code": ErrorCode.INVALID_TOKEN,
         "message": "Auth Token is Invalid or Expired",
     }
+
+
+async def test_login_rate_limit(client, mocker):
+    mocker.patch("app.common.ratelimit.settings.RATE_LIMIT_AUTH", "3/minute")
+    client.app.state.rate_limiter = build_rate_limiter()
+    login_data = {"email": "nobody@example.com", "password": "wrongpassword"}
+    for _ in range(3):
+        response = await client.post(f"{BASE_URL_PATH}/login", json=login_data)
+        assert response.status_code == 401
+
+    response = await client.post(f"{BASE_URL_PATH}/login", json=login_data)
+    assert response.status_code == 429
+    assert response.json() == {
+        "status": "failure",
+        "code": ErrorCode.TOO_MANY_REQUESTS,
+        "message": "Too many requests. Try again later",
+    }
+    assert int(response.headers["retry-after"]) > 0
+
+    # Other route classes have their own buckets
+    response = await client.get("/api/v5/general/site-detail")
+    assert response.status_code == 200
+
+
+async def test_rate_limit_client_ip(mocker):
+    mocker.patch("app.common.ratelimit.settings.TRUSTED_PROXIES", ["10.0.0.0/8"])
+    forwarded = [(b"x-forwarded-for", b"6.6.6.6, 1.2.3.4, 10.0.0.2")]
+
+    # Behind our proxies, the client is the last address they didn't add
+    scope = {"client": ("10.0.0.1", 4000), "headers": forwarded}
+    assert await client_identity(scope) == "ip:1.2.3.4"
+    scope = {"client": ("10.0.0.1", 4000), "headers": [(b"x-real-ip", b"1.2.3.4")]}
+    assert await client_identity(scope) == "ip:1.2.3.4"
+
+    # Anyone else's proxy headers are ignored
+    scope = {"client": ("8.8.8.8", 4000), "headers": forwarded}
+    assert await client_identity(scope) == "ip:8.8.8.8"
@@ -1,5 +1,11 @@
 import uuid
+import msgspec
+from app.api.routes.utils import get_chat_object, get_chats_queryset
+from app.api.schemas.chat import ChatResponseSchema, ChatsResponseSchema
+from app.api.utils.paginators import Paginator, encode_cursor
 from app.common.exception_handlers import ErrorCode
+from app.db.models.chat import Chat, Message
+from app.db.models.general import OutboxEvent
 
 BASE_URL_PATH = "/api/v5/chats"
 
@@ -13,6 +19,47 @@ async def test_retrieve_chats(authorized_client, chat):
     assert len(resp["data"]["chats"]) > 0
 
 
+async def test_retrieve_chats_matches_pydantic_output(
+    authorized_client, message, verified_user
+):
+    # The msgspec fast path must encode exactly what the pydantic schema used to
+    response = await authorized_client.get(BASE_URL_PATH)
+    assert response.status_code == 200
+
+    chats = await get_chats_queryset(verified_user)
+    paginated_data = await Paginator(200).paginate_queryset(chats, 1)
+    expected = ChatsResponseSchema(message="Chats fetched", data=paginated_data)
+    assert response.content == msgspec.json.encode(expected.model_dump(mode="json"))
+
+
+async def test_retrieve_messages_matches_pydantic_output(
+    authorized_client, message, verified_user
+):
+    # The msgspec fast path must encode exactly what the pydantic schema used to
+    response = await authorized_client.get(f"{BASE_URL_PATH}/{message.chat_id}")
+    assert response.status_code == 200
+
+    chat = await get_chat_object(verified_user, message.chat_id)
+    paginated_data = await Paginator(400).paginate_queryset(
+        chat.messages.all()
+        .select_related("sender", "sender__avatar", "file")
+        .order_by("-created_at"),
+        1,
+    )
+    chat.latest_message = paginated_data["items"][:1]
+    data = {"chat": chat, "messages": paginated_data, "recipients": chat.users}
+    expected = ChatResponseSchema(message="Messages fetched", data=data)
+    assert response.content == msgspec.json.encode(expected.model_dump(mode="json"))
+
+
+async def test_retrieve_messages_query_count(
+    authorized_client, message, assert_max_queries
+):
+    with assert_max_queries(5):  # Includes the rate limit bucket
+        response = await authorized_client.get(f"{BASE_URL_PATH}/{message.chat_id}")
+    assert response.status_code == 200
+
+
 async def test_send_message(authorized_client, chat, mocker):
     message_data = {"chat_id": str(uuid.uuid4()), "text": "JESUS is KING"}
     # Verify the requests fails with invalid chat id
@@ -106,6 +153,56 @@ async def test_retrieve_chat_messages(
     }
 
 
+async def test_search_chat_messages(
+    authorized_client, chat, verified_user, another_verified_user
+):
+    url = f"{BASE_URL_PATH}/{chat.id}/search"
+    first = await Message.create(
+        chat=chat, sender=verified_user, text="Dinner at <b>Mama's</b> tonight?"
+    )
+    second = await Message.create(
+        chat=chat, sender=another_verified_user, text="Dinner sounds good"
+    )
+    other_chat = await Chat.create(ctype="DM", owner=another_verified_user)
+    await Message.create(chat=other_chat, sender=another_verified_user, text="Dinner")
+
+    # Only this chat's messages, newest first, with escaped highlighted snippets
+    response = await authorized_client.get(url, params={"q": "dinner", "limit": 1})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert [result["id"] for result in data["results"]] == [str(second.id)]
+    assert data["results"][0]["snippet"] == "<mark>Dinner</mark> sounds good"
+    response = await authorized_client.get(
+        url, params={"q": "dinner", "limit": 1, "cursor": data["next_cursor"]}
+    )
+    data = response.json()["data"]
+    assert [result["id"] for result in data["results"]] == [str(first.id)]
+    assert "&lt;b&gt;Mama&#x27;s&lt;/b&gt;" in data["results"][0]["snippet"]
+    assert data["next_cursor"] is None
+    cursor = encode_cursor(str(first.created_at), "not-an-id")
+    response = await authorized_client.get(
+        url, params={"q": "dinner", "cursor": cursor}
+    )
+    assert response.status_code == 400
+
+    # The index follows updates and deletions
+    response = await authorized_client.put(
+        f"{BASE_URL_PATH}/messages/{first.id}", json={"text": "Lunch instead"}
+    )
+    assert response.status_code == 200
+    await second.delete()
+    response = await authorized_client.get(url, params={"q": "dinner"})
+    assert response.json()["data"]["results"] == []
+    response = await authorized_client.get(url, params={"q": "lunch"})
+    assert len(response.json()["data"]["results"]) == 1
+
+    # Chats the user isn't part of can't be searched
+    response = await authorized_client.get(
+        f"{BASE_URL_PATH}/{other_chat.id}/search", params={"q": "dinner"}
+    )
+    assert response.status_code == 404
+
+
 async def test_update_group_chat(authorized_client, group_chat, another_verified_user):
     chat_data = {
         "name": "Updated Group chat name",
@@ -223,6 +320,10 @@ async def test_delete_message(authorized_client, message):
         "status": "success",
         "message": "Message deleted",
     }
+    # The deletion reaches the chat socket through the outbox
+    event = await OutboxEvent.get(topic="chat")
+    assert event.payload["id"] == str(message.id)
+    assert event.payload["status"] == "DELETED"
 
 
 async def test_create_group_chat(authorized_client, another_verified_user, mocker):
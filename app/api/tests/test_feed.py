@@ -1,7 +1,21 @@
+from app.api.schemas.feed import PostsResponseSchema
+from app.api.utils.paginators import Paginator, encode_cursor
 from app.common.exception_handlers import ErrorCode
-import uuid
+from app.db.models.feed import (
+    Comment,
+    Post,
+    Reaction,
+    ReactionTarget,
+    ReactionType,
+    Reply,
+)
+from app.db.models.general import OutboxEvent
+from app.db.models.profiles import Notification
+from tortoise.functions import Count
+import msgspec, uuid
 
 BASE_URL_PATH = "/api/v5/feed"
+NO_REACTIONS = {rtype.name: 0 for rtype in ReactionType}
 
 
 async def test_retrieve_posts(client, post, mocker):
@@ -20,6 +34,8 @@ async def test_retrieve_posts(client, post, mocker):
                     "text": post.text,
                     "slug": post.slug,
                     "reactions_count": mocker.ANY,
+                    "reactions_breakdown": mocker.ANY,
+                    "my_reaction": None,
                     "comments_count": mocker.ANY,
                     "image": None,
                     "created_at": mocker.ANY,
@@ -30,6 +46,32 @@ async def test_retrieve_posts(client, post, mocker):
     }
 
 
+async def test_retrieve_posts_matches_pydantic_output(client, reaction, comment):
+    # The msgspec fast path must encode exactly what the pydantic schema used to
+    response = await client.get(f"{BASE_URL_PATH}/posts")
+    assert response.status_code == 200
+
+    posts = (
+        Post.all()
+        .annotate(comments_count=Count("comments"))
+        .prefetch_related("author", "author__avatar", "image")
+        .order_by("-created_at")
+    )
+    paginated_data = await Paginator().paginate_queryset(posts, 1)
+    expected = PostsResponseSchema(message="Posts fetched", data=paginated_data)
+    assert response.content == msgspec.json.encode(expected.model_dump(mode="json"))
+
+
+async def test_retrieve_posts_query_count(client, verified_user, assert_max_queries):
+    # Query count must not grow with the number of posts on the page
+    for i in range(10):
+        await Post.create(author=verified_user, text=f"Post {i}")
+    with assert_max_queries(3):  # Includes the rate limit bucket
+        response = await client.get(f"{BASE_URL_PATH}/posts")
+    assert response.status_code == 200
+    assert len(response.json()["data"]["posts"]) == 10
+
+
 async def test_create_post(authorized_client, mocker):
     post_dict = {"text": "My new Post"}
     response = await authorized_client.post(f"{BASE_URL_PATH}/posts", json=post_dict)
@@ -42,6 +84,8 @@ async def test_create_post(authorized_client, mocker):
             "text": post_dict["text"],
             "slug": mocker.ANY,
             "reactions_count": 0,
+            "reactions_breakdown": NO_REACTIONS,
+            "my_reaction": None,
             "comments_count": 0,
             "created_at": mocker.ANY,
             "updated_at": mocker.ANY,
@@ -71,6 +115,8 @@ async def test_retrieve_post(client, post, mocker):
             "text": post.text,
             "slug": post.slug,
             "reactions_count": mocker.ANY,
+            "reactions_breakdown": mocker.ANY,
+            "my_reaction": None,
             "comments_count": mocker.ANY,
             "image": None,
             "created_at": mocker.ANY,
@@ -79,6 +125,39 @@ async def test_retrieve_post(client, post, mocker):
     }
 
 
+async def test_retrieve_expanded_post(
+    client, post, verified_user, another_verified_user, assert_max_queries
+):
+    # The first comments and the first replies of each, whatever their number
+    comments = []
+    for i in range(4):
+        comment = await Comment.create(post=post, author=verified_user, text=f"C{i}")
+        comments.append(comment)
+        for j in range(i + 1):
+            await Reply.create(
+                comment=comment, author=another_verified_user, text=f"C{i}R{j}"
+            )
+
+    url = f"{BASE_URL_PATH}/posts/{post.slug}"
+    params = {"expand": "true", "comments_limit": 3, "replies_limit": 2}
+    with assert_max_queries(4):  # The rate limit bucket and the three reads
+        response = await client.get(url, params=params)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["comments_count"] == 4
+    assert [comment["text"] for comment in data["comments"]] == ["C0", "C1", "C2"]
+    assert [comment["replies_count"] for comment in data["comments"]] == [1, 2, 3]
+    assert [
+        [reply["text"] for reply in comment["replies"]] for comment in data["comments"]
+    ] == [["C0R0"], ["C1R0", "C1R1"], ["C2R0", "C2R1"]]
+    assert data["comments"][0]["replies"][0]["author"]["username"] == (
+        another_verified_user.username
+    )
+
+    response = await client.get(url, params={**params, "replies_limit": 0})
+    assert response.status_code == 422
+
+
 async def test_update_post(
     authorized_client, another_verified_user_tokens, post, mocker
 ):
@@ -121,6 +200,8 @@ async def test_update_post(
             "text": post_dict["text"],
             "slug": mocker.ANY,
             "reactions_count": 0,
+            "reactions_breakdown": NO_REACTIONS,
+            "my_reaction": None,
             "comments_count": 0,
             "created_at": mocker.ANY,
             "updated_at": mocker.ANY,
@@ -148,9 +229,53 @@ async def test_delete_post(authorized_client, post):
     }
 
 
-async def test_retrieve_reactions(client, reaction):
+async def test_my_reaction_on_lists(
+    authorized_client, verified_user, post, comment, reply, assert_max_queries
+):
+    # A page resolves the client's reactions in one query, and guests get none
+    for target_type, target in (
+        (ReactionTarget.POST, post),
+        (ReactionTarget.COMMENT, comment),
+        (ReactionTarget.REPLY, reply),
+    ):
+        await Reaction.create(
+            user=verified_user,
+            rtype=ReactionType.HAHA,
+            target_type=target_type,
+            target_id=target.id,
+        )
+    for i in range(5):
+        other_post = await Post.create(author=verified_user, text=f"Post {i}")
+    # A reaction is only matched with targets of its own type, whatever their id
+    await Reaction.create(
+        user=verified_user,
+        rtype=ReactionType.SAD,
+        target_type=ReactionTarget.REPLY,
+        target_id=other_post.id,
+    )
+
+    with assert_max_queries(5):  # The guest's 3, auth and the reactions
+        response = await authorized_client.get(f"{BASE_URL_PATH}/posts")
+    posts = response.json()["data"]["posts"]
+    assert [p["my_reaction"] for p in posts if p["slug"] == post.slug] == ["HAHA"]
+    assert sum(p["my_reaction"] is not None for p in posts) == 1
+
+    response = await authorized_client.get(
+        f"{BASE_URL_PATH}/posts/{post.slug}/comments"
+    )
+    assert response.json()["data"]["comments"][0]["my_reaction"] == "HAHA"
+    response = await authorized_client.get(f"{BASE_URL_PATH}/comments/{comment.slug}")
+    data = response.json()["data"]
+    assert data["comment"]["my_reaction"] == "HAHA"
+    assert data["replies"]["items"][0]["my_reaction"] == "HAHA"
+
+    del authorized_client.headers["authorization"]
+    response = await authorized_client.get(f"{BASE_URL_PATH}/posts")
+    assert all(p["my_reaction"] is None for p in response.json()["data"]["posts"])
+
+
+async def test_retrieve_reactions(client, reaction, post):
     author = reaction.user
-    post = reaction.post
     # Test for invalid focus_value
     response = await client.get(f"{BASE_URL_PATH}/reactions/invalid_focus/{post.slug}")
     assert response.status_code == 404
@@ -187,13 +312,49 @@ async def test_retrieve_reactions(client, reaction):
                         "username": author.username,
                         "avatar": author.get_avatar,
                     },
-                    "rtype": reaction.rtype,
+                    "rtype": reaction.rtype.name,
                 }
             ],
         },
     }
 
 
+async def test_retrieve_reactions_by_target_and_type(
+    client, verified_user, another_verified_user, post, comment
+):
+    # Targets of different kinds never see each other's reactions
+    for user, rtype in (
+        (verified_user, ReactionType.LIKE),
+        (another_verified_user, ReactionType.SAD),
+    ):
+        await Reaction.create(
+            user=user,
+            rtype=rtype,
+            target_type=ReactionTarget.COMMENT,
+            target_id=comment.id,
+        )
+    await Reaction.create(
+        user=verified_user,
+        rtype=ReactionType.SAD,
+        target_type=ReactionTarget.POST,
+        target_id=post.id,
+    )
+
+    url = f"{BASE_URL_PATH}/reactions/COMMENT/{comment.slug}"
+    response = await client.get(url)
+    assert len(response.json()["data"]["reactions"]) == 2
+    response = await client.get(url, params={"reaction_type": "SAD"})
+    reactions = response.json()["data"]["reactions"]
+    assert [r["user"]["username"] for r in reactions] == [
+        another_verified_user.username
+    ]
+    assert reactions[0]["rtype"] == "SAD"
+
+    response = await client.get(url, params={"reaction_type": "MEH"})
+    assert response.status_code == 400
+    assert response.json()["code"] == ErrorCode.INVALID_VALUE
+
+
 async def test_create_reaction(authorized_client, post, mocker):
     user = post.author
     reaction_dict = {"rtype": "LOVE"}
@@ -216,6 +377,34 @@ async def test_create_reaction(authorized_client, post, mocker):
     }
 
 
+async def test_repeated_reactions_upsert(
+    another_authorized_client, another_verified_user, post, assert_max_queries
+):
+    # Another user's reactions notify the author once, however often they change
+    url = f"{BASE_URL_PATH}/reactions/POST/{post.slug}"
+    response = await another_authorized_client.post(url, json={"rtype": "LIKE"})
+    assert response.status_code == 201
+    reaction_id = response.json()["data"]["id"]
+
+    # Auth, rate limit, focus object, the previous type, the reaction upsert, counters,
+    # and the notification upsert
+    with assert_max_queries(7):
+        response = await another_authorized_client.post(url, json={"rtype": "WOW"})
+    assert response.status_code == 201
+    assert response.json()["data"]["id"] == reaction_id
+
+    reactions = await Reaction.filter(target_id=post.id).values_list("rtype", flat=True)
+    assert reactions == [ReactionType.WOW]
+    await post.refresh_from_db()
+    assert post.reactions_breakdown == {**NO_REACTIONS, "WOW": 1}
+    notifications = await Notification.filter(
+        sender=another_verified_user, post=post
+    ).prefetch_related("receivers")
+    assert len(notifications) == 1
+    assert [user.id for user in notifications[0].receivers] == [post.author_id]
+    assert await OutboxEvent.filter(topic="notification").count() == 1
+
+
 async def test_delete_reaction(authorized_client, reaction):
     # Test for invalid reaction id
     response = await authorized_client.delete(
@@ -235,6 +424,8 @@ async def test_delete_reaction(authorized_client, reaction):
         "status": "success",
         "message": "Reaction deleted",
     }
+    post = await Post.get(id=reaction.target_id)
+    assert post.reactions_count == 0
     # You can test for other error responses yourself
 
 
@@ -271,6 +462,8 @@ async def test_retrieve_comments(client, comment):
                     "slug": comment.slug,
                     "text": comment.text,
                     "reactions_count": comment.reactions_count,
+                    "reactions_breakdown": comment.reactions_breakdown,
+                    "my_reaction": None,
                     "replies_count": comment.replies_count,
                 }
             ],
@@ -298,6 +491,8 @@ async def test_create_comment(authorized_client, post, mocker):
             "slug": mocker.ANY,
             "text": comment_data["text"],
             "reactions_count": 0,
+            "reactions_breakdown": NO_REACTIONS,
+            "my_reaction": None,
             "replies_count": 0,
         },
     }
@@ -333,6 +528,8 @@ async def test_retrieve_comment_with_replies(client, reply):
                 "slug": comment.slug,
                 "text": comment.text,
                 "reactions_count": comment.reactions_count,
+                "reactions_breakdown": comment.reactions_breakdown,
+                "my_reaction": None,
                 "replies_count": 1,
             },
             "replies": {
@@ -349,6 +546,8 @@ async def test_retrieve_comment_with_replies(client, reply):
                         "slug": reply.slug,
                         "text": reply.text,
                         "reactions_count": 0,
+                        "reactions_breakdown": NO_REACTIONS,
+                        "my_reaction": None,
                     }
                 ],
             },
@@ -376,6 +575,8 @@ async def test_create_reply(authorized_client, comment, mocker):
             "slug": mocker.ANY,
             "text": reply_data["text"],
             "reactions_count": 0,
+            "reactions_breakdown": NO_REACTIONS,
+            "my_reaction": None,
         },
     }
     # You can test for other error responses yourself
@@ -401,6 +602,8 @@ async def test_update_comment(authorized_client, comment, mocker):
             "slug": mocker.ANY,
             "text": comment_data["text"],
             "reactions_count": 0,
+            "reactions_breakdown": NO_REACTIONS,
+            "my_reaction": None,
             "replies_count": mocker.ANY,
         },
     }
@@ -446,6 +649,8 @@ async def test_retrieve_reply(client, reply):
             "slug": reply.slug,
             "text": reply.text,
             "reactions_count": 0,
+            "reactions_breakdown": NO_REACTIONS,
+            "my_reaction": None,
         },
     }
 
@@ -470,6 +675,8 @@ async def test_update_reply(authorized_client, reply, mocker):
             "slug": mocker.ANY,
             "text": reply_data["text"],
             "reactions_count": 0,
+            "reactions_breakdown": NO_REACTIONS,
+            "my_reaction": None,
         },
     }
     # You can test for other error responses yourself
@@ -483,3 +690,49 @@ async def test_delete_reply(authorized_client, reply):
         "message": "Reply Deleted",
     }
     # You can test for other error responses yourself
+
+
+async def test_search_feed(client, post, comment, reply, assert_max_queries):
+    # Ranked across kinds, kept in sync with writes, paginated with a cursor
+    post.text = "Gardening tips: tomatoes love sun"
+    await post.save()
+    comment.text = "My tomatoes never ripen"
+    await comment.save()
+    reply.text = "Try planting tomatoes earlier, tomatoes need a long season"
+    await reply.save()
+    await Post.create(author=post.author, text="Nothing about vegetables")
+
+    url = f"{BASE_URL_PATH}/search"
+    with assert_max_queries(5):  # Rate limit bucket, the search and a query per kind
+        response = await client.get(url, params={"q": "tomato"})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert {result["kind"] for result in data["results"]} == {
+        "POST",
+        "COMMENT",
+        "REPLY",
+    }
+    assert data["results"][0]["slug"] == reply.slug  # Mentions it twice
+    assert data["next_cursor"] is None
+
+    response = await client.get(url, params={"q": "tomatoes", "limit": 2})
+    first_page = response.json()["data"]
+    response = await client.get(
+        url, params={"q": "tomatoes", "limit": 2, "cursor": first_page["next_cursor"]}
+    )
+    second_page = response.json()["data"]
+    slugs = [r["slug"] for r in first_page["results"] + second_page["results"]]
+    assert sorted(slugs) == sorted([post.slug, comment.slug, reply.slug])
+    assert second_page["next_cursor"] is None
+
+    response = await client.get(url, params={"q": "tomatoes", "kind": "COMMENT"})
+    assert [r["slug"] for r in response.json()["data"]["results"]] == [comment.slug]
+
+    await reply.delete()
+    response = await client.get(url, params={"q": "season"})
+    assert response.json()["data"]["results"] == []
+
+    for cursor in ("nope", encode_cursor("x", {}), encode_cursor(float("nan"), "x")):
+        response = await client.get(url, params={"q": "tomatoes", "cursor": cursor})
+        assert response.status_code == 400
+        assert response.json()["code"] == ErrorCode.INVALID_PAGE
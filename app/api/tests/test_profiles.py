@@ -1,4 +1,8 @@
 import uuid
+import msgspec
+from app.api.routes.utils import get_notifications_queryset
+from app.api.schemas.profiles import NotificationsResponseSchema
+from app.api.utils.paginators import Paginator
 from app.common.exception_handlers import ErrorCode
 from app.db.models.accounts import User
 from app.db.models.profiles import Notification
@@ -64,6 +68,40 @@ async def test_retrieve_profile(client, verified_user, mocker):
     }
 
 
+async def test_search_profiles(authorized_client, verified_user, another_verified_user):
+    async def usernames(q):
+        response = await authorized_client.get(f"{BASE_URL_PATH}/search?q={q}")
+        assert response.status_code == 200
+        assert response.json()["message"] == "Users fetched"
+        return [user["username"] for user in response.json()["data"]]
+
+    tester = await User.create_user(
+        {
+            "first_name": "Tester",
+            "last_name": "Third",
+            "email": "tester@example.com",
+            "password": "testerpassword",
+        }
+    )
+
+    # Prefix matches come first, then users with close enough names. The searcher
+    # (verified_user) is left out
+    assert await usernames("test") == [
+        tester.username,
+        another_verified_user.username,
+    ]
+    assert await usernames("tird") == [tester.username]
+    assert await usernames("nobody") == []
+
+    # Renamed users are found by their new name
+    tester.first_name = "Renamed"
+    await tester.save()
+    assert await usernames("renam") == [tester.username]
+
+    response = await authorized_client.get(f"{BASE_URL_PATH}/search?q=t")
+    assert response.status_code == 422
+
+
 async def test_update_profile(authorized_client, verified_user, mocker):
     user_data = {
         "first_name": "TestUpdated",
@@ -240,6 +278,31 @@ async def test_retrieve_notifications(authorized_client, verified_user):
     }
 
 
+async def test_retrieve_notifications_matches_pydantic_output(
+    authorized_client, verified_user, another_verified_user, post
+):
+    # The msgspec fast path must encode exactly what the pydantic schema used to
+    admin = await Notification.create(ntype="ADMIN", text="A new update is coming!")
+    reaction = await Notification.create(
+        ntype="REACTION", sender=another_verified_user, post=post
+    )
+    for notification in (admin, reaction):
+        await notification.receivers.add(verified_user)
+    await admin.read_by.add(verified_user)
+
+    response = await authorized_client.get(f"{BASE_URL_PATH}/notifications")
+    assert response.status_code == 200
+
+    paginator = Paginator(response.json()["data"]["per_page"])
+    paginated_data = await paginator.paginate_queryset(
+        get_notifications_queryset(verified_user), 1
+    )
+    expected = NotificationsResponseSchema(
+        message="Notifications fetched", data=paginated_data
+    )
+    assert response.content == msgspec.json.encode(expected.model_dump(mode="json"))
+
+
 async def test_read_notification(authorized_client, verified_user):
     notification = await Notification.create(
         ntype="ADMIN", text="A new update is coming!"
@@ -2,9 +2,10 @@ from jinja2 import Environment, PackageLoader
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-from app.db.models.accounts import Otp
+from app.common.jobs import job
+from app.db.models.accounts import Otp, User
 from app.core.config import settings
-import os, smtplib
+import asyncio, os, smtplib
 
 env = Environment(loader=PackageLoader("app", "templates"))
 
@@ -58,14 +59,24 @@ async def send_email(user, type):
     message["Subject"] = subject
     message.attach(MIMEText(html, "html"))
 
-    # Send email
-    try:
-        with smtplib.SMTP_SSL(
-            host=settings.MAIL_SENDER_HOST, port=settings.MAIL_SENDER_PORT
-        ) as server:
-            server.login(settings.MAIL_SENDER_EMAIL, settings.MAIL_SENDER_PASSWORD)
-            server.sendmail(
-                settings.MAIL_SENDER_EMAIL, message["To"], message.as_string()
-            )
-    except Exception as e:
-        print(f"Email Error - {e}")
+    # Send email. smtplib blocks, so it runs in a thread to keep the worker's loop free.
+    # Failures propagate, for the job to be retried
+    await asyncio.to_thread(smtp_send, message)
+
+
+def smtp_send(message):
+    # wait_for() can't stop the thread, the socket timeout does
+    with smtplib.SMTP_SSL(
+        host=settings.MAIL_SENDER_HOST,
+        port=settings.MAIL_SENDER_PORT,
+        timeout=settings.JOB_TIMEOUT_SECONDS,
+    ) as server:
+        server.login(settings.MAIL_SENDER_EMAIL, settings.MAIL_SENDER_PASSWORD)
+        server.sendmail(settings.MAIL_SENDER_EMAIL, message["To"], message.as_string())
+
+
+@job("send_email")
+async def send_email_job(user_id: str, type: str):
+    user = await User.get_or_none(id=user_id)
+    if user:
+        await send_email(user, type)
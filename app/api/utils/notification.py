@@ -1,6 +1,11 @@
-from app.core.config import settings
 from app.api.schemas.profiles import NotificationSchema
-import websockets, json, os
+from app.common.outbox import (
+    deliver_by_host,
+    outbox_handler,
+    push_to_socket,
+    record_event,
+)
+from typing import List
 
 
 def get_notification_message(obj):
@@ -20,27 +25,54 @@ def get_notification_message(obj):
     return message
 
 
-# Send notification in websocket
+# Send notification in websocket, once the surrounding transaction commits
 async def send_notification_in_socket(
     secured: bool, host: str, notification: object, status: str = "CREATED"
 ):
-    if os.environ.get("ENVIRONMENT") == "testing":
-        return
-    websocket_scheme = "wss://" if secured else "ws://"
-    uri = f"{websocket_scheme}{host}/api/v5/ws/notifications"
-    notification_data = {
-        "id": str(notification.id),
-        "status": status,
-        "ntype": notification.ntype.value,
-    }
-    if status == "CREATED":
-        notification_data = notification_data | NotificationSchema.model_validate(
-            notification
-        ).model_dump(exclude={"id", "ntype"})
-    headers = [
-        ("Authorization", settings.SOCKET_SECRET),
+    await record_event(
+        "notification",
+        {
+            "secured": secured,
+            "host": host,
+            "id": str(notification.id),
+            "ntype": notification.ntype.value,
+            "status": status,
+        },
+    )
+
+
+@outbox_handler("notification")
+async def deliver_notifications(events: List[dict]):
+    from app.db.models.profiles import Notification
+
+    # The notifications that were created are rendered with a single query
+    created_ids = [
+        event["payload"]["id"]
+        for event in events
+        if event["payload"]["status"] == "CREATED"
     ]
-    async with websockets.connect(uri, extra_headers=headers) as websocket:
-        # Send a notification to the WebSocket server
-        await websocket.send(json.dumps(notification_data))
-        await websocket.close()
+    notifications = {}
+    if created_ids:
+        notifications = {
+            str(notification.id): notification
+            for notification in await Notification.filter(
+                id__in=created_ids
+            ).select_related("sender", "sender__avatar", "post", "comment", "reply")
+        }
+
+    async def deliver(secured, host, host_events):
+        messages = []
+        for event in host_events:
+            payload = event["payload"]
+            data = {key: payload[key] for key in ("id", "status", "ntype")}
+            if payload["status"] == "CREATED":
+                notification = notifications.get(payload["id"])
+                if not notification:
+                    continue  # Deleted since
+                data = data | NotificationSchema.model_validate(
+                    notification
+                ).model_dump(exclude={"id", "ntype"})
+            messages.append(data)
+        await push_to_socket(secured, host, "/api/v5/ws/notifications", messages)
+
+    return await deliver_by_host(events, deliver)
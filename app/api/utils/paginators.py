@@ -1,5 +1,8 @@
 from app.common.exception_handlers import ErrorCode, RequestError
-import math
+from datetime import datetime
+from typing import Any, Callable
+from uuid import UUID
+import base64, json, math
 
 
 class Paginator(object):
@@ -34,3 +37,47 @@ class Paginator(object):
             "current_page": current_page,
             "last_page": last_page,
         }
+
+
+def encode_cursor(*values) -> str:
+    # Opaque to clients: the sort key of the last item of a page
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def cursor_number(value) -> float:
+    # json.loads() also reads NaN and Infinity
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(value)
+    if not math.isfinite(value):
+        raise ValueError(value)
+    return float(value)
+
+
+def cursor_string(value) -> str:
+    if not isinstance(value, str):
+        raise TypeError(value)
+    return value
+
+
+def decode_cursor(cursor: str, *parsers: Callable[[Any], Any]) -> list:
+    # Each value of the cursor goes through its parser, which raises TypeError or
+    # ValueError on anything else. Values end up as query parameters, so a tampered
+    # cursor must be a 400 rather than a database error.
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError(values)
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (TypeError, ValueError):
+        raise RequestError(
+            err_code=ErrorCode.INVALID_PAGE, err_msg="Invalid cursor", status_code=400
+        )
+
+
+def cursor_datetime(value) -> datetime:
+    return datetime.fromisoformat(cursor_string(value))
+
+
+def cursor_uuid(value) -> str:
+    # Compared with uuid columns, which Postgres won't do with just any string
+    return str(UUID(cursor_string(value)))
@@ -0,0 +1,33 @@
+from datetime import timedelta
+import time
+
+from tortoise import timezone
+from tortoise.expressions import Subquery
+
+from app.core.config import settings
+from app.common.jobs import job
+from app.common.ratelimit import PERIODS, DatabaseBuckets
+from app.db.models.accounts import Otp
+from app.db.models.feed import Comment, Post, Reaction, ReactionTarget, Reply
+from app.db.models.general import Job, JobStatus
+
+
+@job("cleanup", every=settings.JOB_CLEANUP_INTERVAL_SECONDS)
+async def cleanup() -> None:
+    # Buckets untouched for a day have long refilled
+    await DatabaseBuckets().prune(PERIODS["day"])
+    expired = timezone.now() - timedelta(seconds=settings.EMAIL_OTP_EXPIRE_SECONDS)
+    await Otp.filter(updated_at__lt=expired).delete()
+    await Job.filter(
+        status=JobStatus.DEAD,
+        run_at__lt=time.time() - settings.JOB_DEAD_RETENTION_DAYS * PERIODS["day"],
+    ).delete()
+    # Reactions aren't foreign keys to their target, so deleting one leaves them behind
+    for target, model in (
+        (ReactionTarget.POST, Post),
+        (ReactionTarget.COMMENT, Comment),
+        (ReactionTarget.REPLY, Reply),
+    ):
+        await Reaction.filter(target_type=target).exclude(
+            target_id__in=Subquery(model.all().values("id"))
+        ).delete()
@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Tuple
+import asyncio, logging
+
+from asyncpg.connection import Connection
+from litestar.middleware import AbstractMiddleware
+from litestar.types import Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.common.exception_handlers import DeadlineExceededError
+from app.common.metrics import Counter, route_template
+
+logger = logging.getLogger(__name__)
+
+deadlines_exceeded = Counter(
+    "http_deadlines_exceeded_total",
+    "Requests cancelled because they ran past their deadline",
+    ["route"],
+)
+
+# (loop time the request must be done by, its deadline in seconds, route) while it runs
+_request_deadline: ContextVar[Optional[Tuple[float, float, str]]] = ContextVar(
+    "request_deadline", default=None
+)
+
+
+def deadline_exceeded(route: str, seconds: float, what: str) -> None:
+    deadlines_exceeded.inc(route)
+    logger.warning(f"{what} {route} ran past its {seconds}s deadline")
+
+
+@contextmanager
+def statement_budget(timeout: Optional[float]):
+    # Yields the timeout of a statement: what is left of the request's deadline, unless
+    # the caller asked for less
+    deadline = _request_deadline.get()
+    remaining = None
+    if deadline:
+        remaining = max(deadline[0] - asyncio.get_running_loop().time(), 0.001)
+    if remaining is None or (timeout is not None and timeout < remaining):
+        yield timeout
+        return
+    at, seconds, route = deadline
+    try:
+        yield remaining
+    except TimeoutError:
+        deadline_exceeded(route, seconds, "Query of")
+        raise DeadlineExceededError(seconds) from None
+
+
+class DeadlineConnectionMixin:
+    """
+    Gives each statement what is left of the request's deadline as its asyncpg timeout.
+    When it runs out asyncpg sends the server a cancel request, so the query stops there
+    too instead of running on for the pool-wide statement_timeout.
+    """
+
+    async def execute(self, query, *args, timeout=None):
+        with statement_budget(timeout) as timeout:
+            return await super().execute(query, *args, timeout=timeout)
+
+    async def executemany(self, command, args, *, timeout=None):
+        with statement_budget(timeout) as timeout:
+            return await super().executemany(command, args, timeout=timeout)
+
+    async def fetch(self, query, *args, timeout=None, **kwargs):
+        with statement_budget(timeout) as timeout:
+            return await super().fetch(query, *args, timeout=timeout, **kwargs)
+
+    async def fetchrow(self, query, *args, timeout=None, **kwargs):
+        with statement_budget(timeout) as timeout:
+            return await super().fetchrow(query, *args, timeout=timeout, **kwargs)
+
+
+class DeadlineConnection(DeadlineConnectionMixin, Connection):
+    # The connection class of the Postgres pools, see app.db.config
+    pass
+
+
+class DeadlineMiddleware(AbstractMiddleware):
+    """
+    Cancels a request that runs past its deadline: REQUEST_DEADLINE_SECONDS, or the
+    handler's own opt={"deadline": seconds}. On Postgres each statement also gets the
+    time left as its timeout (DeadlineConnection), so the server stops a query when the
+    request's budget runs out. Sync handlers run in a thread and can't be interrupted.
+    """
+
+    scopes = {"http"}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        seconds = scope["route_handler"].opt.get(
+            "deadline", settings.REQUEST_DEADLINE_SECONDS
+        )
+        if not seconds:
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        route = route_template(scope)
+        timeout = asyncio.timeout(seconds)
+        token = _request_deadline.set(
+            (asyncio.get_running_loop().time() + seconds, seconds, route)
+        )
+        try:
+            async with timeout:
+                await self.app(scope, receive, send_wrapper)
+        except TimeoutError:
+            if not timeout.expired():
+                raise  # Some other timeout, e.g. asyncpg's command_timeout
+            deadline_exceeded(route, seconds, scope["method"])
+            if response_started:
+                return  # Too late for an error response, the client sees a cut body
+            raise DeadlineExceededError(seconds)
+        finally:
+            _request_deadline.reset(token)
@@ -27,6 +27,9 @@ class ErrorCode:
     NOT_ALLOWED = "not_allowed"
     INVALID_DATA_TYPE = "invalid_data_type"
     BAD_REQUEST = "bad_request"
+    TOO_MANY_REQUESTS = "too_many_requests"
+    DEADLINE_EXCEEDED = "deadline_exceeded"
+    SERVICE_UNAVAILABLE = "service_unavailable"
 
 
 class Error(Exception):
@@ -42,16 +45,28 @@ class RequestError(Error):
         err_msg: str,
         status_code: int = 400,
         data: dict = None,
+        headers: dict = None,
         *args: object,
     ) -> None:
         self.status_code = HTTPStatus(status_code)
         self.err_code = err_code
         self.err_msg = err_msg
         self.data = data
+        self.headers = headers
 
         super().__init__(*args)
 
 
+class DeadlineExceededError(RequestError):
+    def __init__(self, deadline: float) -> None:
+        super().__init__(
+            err_code=ErrorCode.DEADLINE_EXCEEDED,
+            err_msg="The request took too long to process. Try again later",
+            status_code=504,
+            data={"deadline_seconds": deadline},
+        )
+
+
 class SocketError:
     def __init__(
         self,
@@ -74,7 +89,7 @@ def request_error_handler(_: Request, exc: RequestError):
     }
     if exc.data:
         err_dict["data"] = exc.data
-    return Response(status_code=exc.status_code, content=err_dict)
+    return Response(status_code=exc.status_code, content=err_dict, headers=exc.headers)
 
 
 def http_exception_handler(_: Request, exc: HTTPException) -> Response:
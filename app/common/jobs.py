@@ -0,0 +1,243 @@
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import asyncio, importlib, json, logging, os, socket, time, traceback
+
+from litestar import Litestar
+from tortoise.connection import connections
+
+from app.core.config import settings
+from app.common.metrics import Counter, Gauge, Histogram
+from app.db.models.general import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+# Modules that register job handlers, imported by every worker
+JOB_MODULES = [
+    "app.api.utils.emails",
+    "app.common.cleanup",
+]
+
+JobHandler = Callable[..., Awaitable[None]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+PERIODIC_JOBS: Dict[str, float] = {}  # Job name -> interval in seconds
+
+jobs_processed = Counter(
+    "jobs_processed_total", "Jobs run by the workers, by outcome", ["job", "outcome"]
+)
+jobs_running = Gauge("jobs_running", "Jobs being run by this worker", ["job"])
+job_duration = Histogram("job_duration_seconds", "Job run time", ["job"])
+job_lag = Histogram(
+    "job_lag_seconds",
+    "Time between a job being due and a worker claiming it",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+
+
+def job(name: str, every: Optional[float] = None):
+    """
+    Registers a job handler. The payload given to enqueue_job() is passed as keyword
+    arguments, so it must be JSON serializable. With `every`, the job is periodic: workers
+    keep exactly one instance of it scheduled.
+    """
+
+    def decorator(handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[name] = handler
+        if every:
+            PERIODIC_JOBS[name] = every
+        return handler
+
+    return decorator
+
+
+async def enqueue_job(
+    name: str,
+    payload: Optional[dict] = None,
+    delay: float = 0,
+    max_attempts: Optional[int] = None,
+) -> Job:
+    # A single insert, so requests don't wait on the side effect itself
+    return await Job.create(
+        name=name,
+        payload=payload or {},
+        run_at=time.time() + delay,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    # Exponential backoff: 10s, 20s, 40s... capped
+    return min(
+        settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_SECONDS,
+    )
+
+
+def load_job_modules() -> None:
+    for module in JOB_MODULES:
+        importlib.import_module(module)
+
+
+class JobWorker:
+    """
+    Claims due jobs from the job table and runs up to `concurrency` of them at a time.
+
+    On Postgres jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+    workers can poll the table without blocking each other or claiming the same job. SQLite
+    has no row locks, but it runs each write statement under a database wide lock, so the
+    claiming UPDATE is atomic there too. A job whose worker died is claimed again once
+    its lock is older than JOB_LOCK_TIMEOUT_SECONDS.
+
+    Failed jobs are retried with exponential backoff. Out of attempts, they are kept with
+    status "dead" and their last error (the dead-letter queue) until the cleanup job
+    removes them.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float) -> None:
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.tasks: Set[asyncio.Task] = set()
+        self.stopping = asyncio.Event()
+
+    async def run(self) -> None:
+        await self.schedule_periodic_jobs()
+        logger.info(f"Job worker {self.name} started ({self.concurrency} slots)")
+        while not self.stopping.is_set():
+            free = self.concurrency - len(self.tasks)
+            claimed = await self.claim(free) if free else []
+            for row in claimed:
+                task = asyncio.create_task(self.execute(row))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+            if len(claimed) < free or not free:
+                await self.wait()
+        if self.tasks:
+            await asyncio.wait(self.tasks, timeout=settings.JOB_TIMEOUT_SECONDS)
+
+    async def wait(self) -> None:
+        # Until the next poll, a free slot when all are busy, or stop()
+        waiters = [asyncio.create_task(self.stopping.wait()), *self.tasks]
+        timeout = self.poll_interval if len(self.tasks) < self.concurrency else None
+        await asyncio.wait(
+            waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+        waiters[0].cancel()
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    async def schedule_periodic_jobs(self) -> None:
+        for name in PERIODIC_JOBS:
+            await Job.get_or_create(
+                key=name,
+                defaults={
+                    "name": name,
+                    "run_at": time.time(),
+                    "max_attempts": settings.JOB_MAX_ATTEMPTS,
+                },
+            )
+
+    async def claim(self, limit: int) -> List[dict]:
+        conn = connections.get("default")
+        if conn.capabilities.dialect == "postgres":
+            params, lock = [f"${i}" for i in range(1, 5)], "FOR UPDATE SKIP LOCKED"
+        else:
+            params, lock = [f"?{i}" for i in range(1, 5)], ""
+        now_p, worker_p, stale_p, limit_p = params
+        now = time.time()
+        rows = await conn.execute_query_dict(
+            f"""
+            UPDATE "job" SET
+                "status" = 'running',
+                "locked_at" = {now_p},
+                "locked_by" = {worker_p},
+                "attempts" = "attempts" + 1
+            WHERE "id" IN (
+                SELECT "id" FROM "job"
+                WHERE ("status" = 'pending' AND "run_at" <= {now_p})
+                    OR ("status" = 'running' AND "locked_at" < {stale_p})
+                ORDER BY "run_at"
+                LIMIT {limit_p}
+                {lock}
+            )
+            RETURNING "id", "name", "payload", "attempts", "max_attempts", "run_at", "key"
+            """,
+            [now, self.name, now - settings.JOB_LOCK_TIMEOUT_SECONDS, limit],
+        )
+        for row in rows:
+            if isinstance(row["payload"], str):
+                row["payload"] = json.loads(row["payload"])
+            job_lag.observe(max(now - row["run_at"], 0))
+        return rows
+
+    async def execute(self, row: dict) -> None:
+        name = row["name"]
+        handler = JOB_HANDLERS.get(name)
+        jobs_running.inc(name)
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job {name}")
+            await asyncio.wait_for(
+                handler(**row["payload"]), settings.JOB_TIMEOUT_SECONDS
+            )
+        except Exception:
+            await self.failed(row, traceback.format_exc())
+        else:
+            await self.succeeded(row)
+        finally:
+            jobs_running.dec(name)
+            job_duration.observe(time.perf_counter() - start, name)
+
+    async def succeeded(self, row: dict) -> None:
+        jobs_processed.inc(row["name"], "succeeded")
+        if row["key"] in PERIODIC_JOBS:
+            await self.reschedule(row, PERIODIC_JOBS[row["key"]])
+        else:
+            await Job.filter(id=row["id"]).delete()
+
+    async def failed(self, row: dict, error: str) -> None:
+        name = row["name"]
+        if row["attempts"] < row["max_attempts"]:
+            jobs_processed.inc(name, "retried")
+            logger.warning(f'Job {name} ({row["id"]}) failed, will retry: {error}')
+            await Job.filter(id=row["id"]).update(
+                status=JobStatus.PENDING,
+                run_at=time.time() + retry_delay(row["attempts"]),
+                last_error=error,
+            )
+            return
+
+        jobs_processed.inc(name, "dead")
+        logger.error(f'Job {name} ({row["id"]}) is out of attempts: {error}')
+        if row["key"] in PERIODIC_JOBS:
+            # Periodic jobs are never dropped, they wait for their next run
+            await self.reschedule(row, PERIODIC_JOBS[row["key"]], error)
+        else:
+            await Job.filter(id=row["id"]).update(
+                status=JobStatus.DEAD, last_error=error
+            )
+
+    async def reschedule(
+        self, row: dict, interval: float, error: Optional[str] = None
+    ) -> None:
+        await Job.filter(id=row["id"]).update(
+            status=JobStatus.PENDING,
+            run_at=time.time() + interval,
+            attempts=0,
+            last_error=error,
+        )
+
+
+@asynccontextmanager
+async def job_worker_lifespan(app: Litestar):
+    # Development only: production runs the workers on their own (python -m app.worker)
+    if not settings.JOB_WORKER_IN_PROCESS:
+        yield
+        return
+    load_job_modules()
+    worker = JobWorker(settings.JOB_CONCURRENCY, settings.JOB_POLL_INTERVAL)
+    task = asyncio.create_task(worker.run())
+    yield
+    worker.stop()
+    await task
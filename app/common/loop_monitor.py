@@ -0,0 +1,170 @@
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+import asyncio, logging, os, sys, threading, time, traceback
+
+from litestar import Litestar, Request, get
+
+from app.core.config import PROJECT_DIR, settings
+from app.common.exception_handlers import ErrorCode, RequestError
+from app.common.metrics import Counter, Histogram
+from app.common.profiling import is_admin
+
+logger = logging.getLogger(__name__)
+
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke up a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+# Only written by the sampling thread
+event_loop_blocked_samples = Counter(
+    "event_loop_blocked_samples_total",
+    "Samples that caught the event loop blocked, by call site",
+    ["site"],
+)
+
+
+class LoopLagMonitor:
+    """
+    Measures event loop lag with a task that sleeps for `interval` and checks how late it
+    wakes up. A sampling thread watches the task's heartbeat and, while the loop is stuck
+    for longer than `threshold`, records the stack of the loop thread so the blocking
+    call site shows up in event_loop_blocked_samples_total and top_offenders().
+    """
+
+    def __init__(self, interval: float, threshold: float, keep_stacks: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self.keep_stacks = keep_stacks
+        self.heartbeat = time.perf_counter()
+        self.offenders: Dict[str, dict] = {}
+        self.last_site: Optional[str] = None
+        self.loop_thread_id: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+    async def start(self) -> None:
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.perf_counter()
+        self.stopped.clear()
+        self.task = asyncio.create_task(self.measure())
+        self.thread = threading.Thread(
+            target=self.sample, name="loop-lag-sampler", daemon=True
+        )
+        self.thread.start()
+
+    async def stop(self) -> None:
+        self.stopped.set()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.thread.join()
+
+    async def measure(self) -> None:
+        while True:
+            start = time.perf_counter()
+            self.heartbeat = start
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - start - self.interval, 0)
+            event_loop_lag.observe(lag)
+            if lag > self.threshold:
+                logger.warning(
+                    f"Event loop was blocked for {lag * 1000:.0f}ms at {self.last_site}"
+                )
+                self.last_site = None
+
+    def sample(self) -> None:
+        # Runs in its own thread, so it keeps going while the loop is blocked
+        while not self.stopped.wait(self.interval / 2):
+            blocked_for = time.perf_counter() - self.heartbeat - self.interval
+            if blocked_for > self.threshold:
+                self.capture(blocked_for)
+
+    def capture(self, blocked_for: float) -> None:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        site = call_site(stack)
+        offender = self.offenders.setdefault(
+            site, {"site": site, "samples": 0, "max_blocked_ms": 0.0, "stack": []}
+        )
+        offender["samples"] += 1
+        offender["max_blocked_ms"] = max(offender["max_blocked_ms"], blocked_for * 1000)
+        offender["stack"] = traceback.format_list(stack[-self.keep_stacks :])
+        event_loop_blocked_samples.inc(site)
+        self.last_site = site
+
+    def top_offenders(self, limit: int = 10) -> List[dict]:
+        offenders = sorted(
+            list(self.offenders.values()), key=lambda o: o["samples"], reverse=True
+        )
+        return offenders[:limit]
+
+
+def call_site(stack: traceback.StackSummary) -> str:
+    # The innermost frame in our own code (the line that made the blocking call),
+    # followed by the innermost frame overall (where the time is actually spent)
+    own_frames = [frame for frame in stack if is_own_code(frame.filename)]
+    innermost = stack[-1]
+    site = describe_frame(innermost)
+    if own_frames and own_frames[-1] is not innermost:
+        site = f"{describe_frame(own_frames[-1])} -> {site}"
+    return site
+
+
+def is_own_code(filename: str) -> bool:
+    return filename.startswith(str(PROJECT_DIR)) and "site-packages" not in filename
+
+
+def describe_frame(frame: traceback.FrameSummary) -> str:
+    filename = frame.filename
+    if is_own_code(filename):
+        filename = os.path.relpath(filename, PROJECT_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{frame.lineno} {frame.name}"
+
+
+monitor = LoopLagMonitor(
+    interval=settings.LOOP_LAG_INTERVAL_MS / 1000,
+    threshold=settings.LOOP_LAG_THRESHOLD_MS / 1000,
+)
+
+
+@get(
+    "/debug/event-loop",
+    include_in_schema=False,
+    opt={"rate_limit": "exempt", "load_class": "exempt"},
+)
+async def loop_offenders_handler(request: Request, limit: int = 10) -> dict:
+    # Admins only, since the stacks expose the code
+    if not await is_admin(request.scope):
+        raise RequestError(
+            err_code=ErrorCode.UNAUTHORIZED_USER,
+            err_msg="Only admins can view the event loop offenders",
+            status_code=403,
+        )
+    return {
+        "status": "success",
+        "message": "Event loop offenders fetched",
+        "data": {
+            "enabled": settings.LOOP_LAG_MONITOR_ENABLED,
+            "threshold_ms": monitor.threshold * 1000,
+            "offenders": monitor.top_offenders(limit),
+        },
+    }
+
+
+@asynccontextmanager
+async def loop_monitor_lifespan(app: Litestar):
+    if not settings.LOOP_LAG_MONITOR_ENABLED:
+        yield
+        return
+    await monitor.start()
+    logger.info("Started event loop lag monitor")
+    yield
+    await monitor.stop()
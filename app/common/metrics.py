@@ -0,0 +1,334 @@
+from bisect import bisect_left
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import asyncio, logging, time
+
+from litestar import Request, Response, get
+from litestar.middleware import AbstractMiddleware
+from litestar.types import Message, Receive, Scope, Send
+from tortoise.backends.base.client import ConnectionWrapper, PoolConnectionWrapper
+from tortoise.connection import connections
+
+from app.core.config import settings
+from app.common.queries import query_listeners
+
+logger = logging.getLogger(__name__)
+
+# Metrics are plain dicts of numbers updated from the event loop thread only, so recording
+# is a dict lookup and an addition: no locks and no allocation once a label set exists.
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    mtype = "untyped"
+
+    def __init__(self, name: str, description: str, labels: List[str] = []) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        REGISTRY.append(self)
+
+    def format_labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"'
+            for name, value in zip(self.label_names, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.mtype}",
+        ]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    mtype = "counter"
+
+    def __init__(self, name: str, description: str, labels: List[str] = []) -> None:
+        super().__init__(name, description, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{self.format_labels(labels)} {value}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    mtype = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    mtype = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: List[str] = [],
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+        # Per label set: [count per bucket (last one is +Inf)..., sum]
+        self.values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self.values.get(labels)
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, counts in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(
+                    f"{self.name}_bucket{self.format_labels(labels, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{self.format_labels(labels)} {counts[-1]}")
+            lines.append(f"{self.name}_count{self.format_labels(labels)} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY: List[Metric] = []
+# Called right before rendering, to refresh gauges that are cheaper to read than to track
+COLLECTORS: List[Callable[[], Union[None, Awaitable[None]]]] = []
+
+# HTTP
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template, method and status",
+    ["route", "method", "status"],
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ["route"]
+)
+
+# DATABASE
+db_queries = Counter("db_queries_total", "Queries executed")
+db_query_seconds = Counter("db_query_seconds_total", "Time spent executing queries")
+db_pool_connections = Gauge(
+    "db_pool_connections", "Database pool connections by state", ["connection", "state"]
+)
+db_pool_waiting = Gauge(
+    "db_pool_waiting", "Queries waiting for a pool connection", ["connection"]
+)
+db_pool_acquire_duration = Histogram(
+    "db_pool_acquire_seconds",
+    "Time spent waiting for a database connection",
+    ["connection"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+# WEBSOCKETS
+websocket_connections = Gauge(
+    "websocket_connections", "Open websocket connections by handler", ["handler"]
+)
+websocket_fanout_duration = Histogram(
+    "websocket_fanout_seconds",
+    "Time taken to push one event to every recipient socket",
+    ["handler"],
+)
+# JOBS AND OUTBOX. They are processed by app.worker, which serves no metrics, so the API
+# reads their backlog from the tables instead
+jobs_queued = Gauge("jobs_queued", "Due pending, running and dead jobs", ["status"])
+job_oldest_pending_age = Gauge(
+    "job_oldest_pending_age_seconds", "How long the oldest due job has been waiting"
+)
+outbox_backlog = Gauge("outbox_backlog", "Realtime events not delivered yet")
+outbox_oldest_event_age = Gauge(
+    "outbox_oldest_event_age_seconds", "Age of the oldest undelivered realtime event"
+)
+
+websocket_fanout_recipients = Counter(
+    "websocket_fanout_recipients_total",
+    "Messages pushed to sockets by fan-outs",
+    ["handler"],
+)
+
+
+def _record_query(sql: str, duration: float) -> None:
+    db_queries.inc()
+    db_query_seconds.inc(amount=duration)
+
+
+query_listeners.append(_record_query)
+
+
+def collect_pool_stats() -> None:
+    for name in connections.db_config:
+        try:
+            client = connections.get(name)
+        except Exception:
+            continue  # Not initialized yet
+        pool = getattr(client, "_pool", None)
+        if pool is None or not hasattr(pool, "get_size"):
+            continue  # Only asyncpg clients have a pool
+        size, idle = pool.get_size(), pool.get_idle_size()
+        db_pool_connections.set(name, "in_use", value=size - idle)
+        db_pool_connections.set(name, "idle", value=idle)
+        db_pool_connections.set(name, "max", value=pool.get_max_size())
+
+
+COLLECTORS.append(collect_pool_stats)
+
+
+async def collect_queue_stats() -> None:
+    # Two small aggregates, on the primary: the replica may lag behind the queues
+    try:
+        conn = connections.get("default")
+        placeholder = "$1" if conn.capabilities.dialect == "postgres" else "?"
+        now = time.time()
+        jobs = await conn.execute_query_dict(
+            f"""
+            SELECT "status", COUNT(*) AS "count", MIN("run_at") AS "oldest" FROM "job"
+            WHERE "status" IN ('running', 'dead')
+                OR ("status" = 'pending' AND "run_at" <= {placeholder})
+            GROUP BY "status"
+            """,
+            [now],
+        )
+        outbox = await conn.execute_query_dict(
+            'SELECT COUNT(*) AS "count", MIN("created_at") AS "oldest" FROM "outbox_event"'
+        )
+    except Exception:
+        logger.exception("Reading the job and outbox backlog failed")
+        return
+    counts = {row["status"]: row for row in jobs}
+    for status in ("pending", "running", "dead"):
+        jobs_queued.set(status, value=counts.get(status, {}).get("count", 0))
+    oldest = counts.get("pending", {}).get("oldest")
+    job_oldest_pending_age.set(value=now - oldest if oldest else 0)
+    outbox_backlog.set(value=outbox[0]["count"])
+    oldest = outbox[0]["oldest"]
+    outbox_oldest_event_age.set(value=now - oldest if oldest else 0)
+
+
+COLLECTORS.append(collect_queue_stats)
+
+
+def _timed_acquire(acquire):
+    async def __aenter__(self):
+        name = getattr(self.client, "connection_name", "default")
+        db_pool_waiting.inc(name)
+        start = time.perf_counter()
+        try:
+            return await acquire(self)
+        finally:
+            db_pool_acquire_duration.observe(time.perf_counter() - start, name)
+            db_pool_waiting.dec(name)
+
+    __aenter__.__instrumented__ = True
+    return __aenter__
+
+
+def install_pool_metrics() -> None:
+    # Times connection checkouts: the asyncpg pool, and the lock of single-connection
+    # clients such as SQLite
+    for wrapper in (PoolConnectionWrapper, ConnectionWrapper):
+        if not getattr(wrapper.__aenter__, "__instrumented__", False):
+            wrapper.__aenter__ = _timed_acquire(wrapper.__aenter__)
+
+
+async def render_metrics() -> str:
+    for collector in COLLECTORS:
+        result = collector()
+        if asyncio.iscoroutine(result):
+            await result
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# Route templates ("/api/v5/feed/posts/{slug}") keep the label cardinality bounded
+_route_templates: Dict[object, str] = {}
+
+
+def route_template(scope: Scope) -> str:
+    handler = scope.get("route_handler")
+    template = _route_templates.get(handler)
+    if template is None:
+        for route in scope["app"].routes:
+            for route_handler in getattr(route, "route_handlers", []):
+                _route_templates[route_handler] = route.path_format
+        template = _route_templates.setdefault(handler, "unmatched")
+    return template
+
+
+class MetricsMiddleware(AbstractMiddleware):
+    """
+    Records request latency by route template and status, and the requests in flight.
+    """
+
+    scopes = {"http"}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route = route_template(scope)
+        status = 500  # Unless a response starts
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(route)
+            http_request_duration.observe(
+                time.perf_counter() - start, route, scope["method"], str(status)
+            )
+
+
+@get(
+    "/metrics",
+    include_in_schema=False,
+    opt={"rate_limit": "exempt", "load_class": "exempt"},
+    media_type="text/plain; version=0.0.4",
+)
+async def metrics_handler(request: Request) -> Response:
+    token = settings.METRICS_AUTH_TOKEN
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return Response("Unauthorized", status_code=401, media_type="text/plain")
+    return Response(await render_metrics(), media_type="text/plain; version=0.0.4")
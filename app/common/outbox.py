@@ -0,0 +1,230 @@
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+import asyncio, importlib, json, logging, os, time
+
+from litestar import Litestar
+from tortoise.connection import connections
+import websockets
+
+from app.core.config import settings
+from app.common.metrics import Counter, Histogram
+from app.db.models.general import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Modules that register outbox handlers, imported by every dispatcher
+OUTBOX_MODULES = [
+    "app.api.utils.notification",
+    "app.api.sockets.chat",
+]
+
+# Topic -> coroutine delivering a batch of that topic's events (dicts with id, payload...).
+# It returns the ids of the events it couldn't deliver, raising means none were delivered.
+OutboxHandler = Callable[[List[dict]], Awaitable[Optional[Iterable[int]]]]
+OUTBOX_HANDLERS: Dict[str, OutboxHandler] = {}
+
+outbox_events = Counter(
+    "outbox_events_total", "Outbox events by topic and outcome", ["topic", "outcome"]
+)
+outbox_lag = Histogram(
+    "outbox_lag_seconds",
+    "Time between an event being committed and delivered",
+    ["topic"],
+)
+
+
+def outbox_handler(topic: str):
+    def decorator(handler: OutboxHandler) -> OutboxHandler:
+        OUTBOX_HANDLERS[topic] = handler
+        return handler
+
+    return decorator
+
+
+async def record_event(topic: str, payload: dict) -> OutboxEvent:
+    """
+    Records an event to be pushed to the realtime layer. Call it inside the transaction of
+    the change it announces: the event is only delivered if that change commits, and it
+    is delivered even if the process dies right after the commit.
+    """
+    now = time.time()
+    return await OutboxEvent.create(
+        topic=topic, payload=payload, created_at=now, next_attempt_at=now
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    # Exponential backoff: 1s, 2s, 4s... capped, so a socket server restart loses nothing
+    return min(
+        settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.OUTBOX_RETRY_MAX_SECONDS,
+    )
+
+
+async def push_to_socket(secured: bool, host: str, path: str, messages: List[dict]):
+    # One connection for the whole batch rather than one per event
+    if os.environ.get("ENVIRONMENT") == "testing":
+        return
+    websocket_scheme = "wss://" if secured else "ws://"
+    uri = f"{websocket_scheme}{host}{path}"
+    headers = [
+        ("Authorization", settings.SOCKET_SECRET),
+    ]
+    async with websockets.connect(uri, extra_headers=headers) as websocket:
+        for message in messages:
+            await websocket.send(json.dumps(message))
+        await websocket.close()
+
+
+def group_by_host(events: List[dict]) -> Dict[tuple, List[dict]]:
+    # Events carry the scheme and host of the request that caused them
+    groups = defaultdict(list)
+    for event in events:
+        payload = event["payload"]
+        groups[(payload["secured"], payload["host"])].append(event)
+    return groups
+
+
+async def deliver_by_host(
+    events: List[dict],
+    deliver: Callable[[bool, str, List[dict]], Awaitable[None]],
+) -> List[int]:
+    """
+    Calls `deliver(secured, host, events)` for the events of each host and returns the ids
+    of those whose host failed. The host comes from the request's Host header, so one bad
+    host must not hold back the others' events.
+    """
+    failed = []
+    for (secured, host), host_events in group_by_host(events).items():
+        try:
+            await deliver(secured, host, host_events)
+        except Exception:
+            logger.exception(f"Delivering {len(host_events)} events to {host} failed")
+            failed.extend(event["id"] for event in host_events)
+    return failed
+
+
+def load_outbox_modules() -> None:
+    for module in OUTBOX_MODULES:
+        importlib.import_module(module)
+
+
+class OutboxDispatcher:
+    """
+    Drains the outbox in batches of `batch_size`, oldest first, handing each topic's events
+    to its handler in one call.
+
+    Events are claimed with a single UPDATE (with FOR UPDATE SKIP LOCKED on Postgres) that
+    leases them for OUTBOX_LOCK_TIMEOUT_SECONDS, so several dispatchers can run and no
+    transaction is held while the events are delivered. Delivered events are then deleted,
+    and undelivered ones retried with exponential backoff until OUTBOX_MAX_ATTEMPTS. Events
+    of a dispatcher that died are claimed again once their lease is over.
+    """
+
+    def __init__(self, batch_size: int, poll_interval: float) -> None:
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stopping = asyncio.Event()
+
+    async def run(self) -> None:
+        logger.info("Outbox dispatcher started")
+        while not self.stopping.is_set():
+            try:
+                drained = await self.drain()
+            except Exception:
+                logger.exception("Outbox drain failed")
+                drained = 0
+            if drained < self.batch_size:
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), self.poll_interval)
+                except TimeoutError:
+                    pass
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    async def claim(self) -> List[dict]:
+        conn = connections.get("default")
+        if conn.capabilities.dialect == "postgres":
+            params, lock = [f"${i}" for i in range(1, 4)], "FOR UPDATE SKIP LOCKED"
+        else:
+            params, lock = [f"?{i}" for i in range(1, 4)], ""
+        now_p, lease_p, limit_p = params
+        now = time.time()
+        rows = await conn.execute_query_dict(
+            f"""
+            UPDATE "outbox_event" SET
+                "next_attempt_at" = {lease_p},
+                "attempts" = "attempts" + 1
+            WHERE "id" IN (
+                SELECT "id" FROM "outbox_event"
+                WHERE "next_attempt_at" <= {now_p}
+                ORDER BY "id"
+                LIMIT {limit_p}
+                {lock}
+            )
+            RETURNING "id", "topic", "payload", "attempts", "created_at"
+            """,
+            [now, now + settings.OUTBOX_LOCK_TIMEOUT_SECONDS, self.batch_size],
+        )
+        for row in rows:
+            if isinstance(row["payload"], str):
+                row["payload"] = json.loads(row["payload"])
+        # RETURNING doesn't keep the subquery's order
+        return sorted(rows, key=lambda row: row["id"])
+
+    async def drain(self) -> int:
+        # Returns the number of events handled
+        rows = await self.claim()
+        if not rows:
+            return 0
+
+        by_topic = defaultdict(list)
+        for row in rows:
+            by_topic[row["topic"]].append(row)
+
+        done, retries = [], defaultdict(list)
+        for topic, events in by_topic.items():
+            try:
+                handler = OUTBOX_HANDLERS[topic]
+                failed = set(await handler(events) or ())
+            except Exception:
+                logger.exception(f"Delivering {len(events)} {topic} events failed")
+                failed = {event["id"] for event in events}
+            now = time.time()
+            for event in events:
+                if event["id"] not in failed:
+                    outbox_events.inc(topic, "delivered")
+                    outbox_lag.observe(now - event["created_at"], topic)
+                    done.append(event["id"])
+                elif event["attempts"] >= settings.OUTBOX_MAX_ATTEMPTS:
+                    outbox_events.inc(topic, "dropped")
+                    done.append(event["id"])
+                else:
+                    outbox_events.inc(topic, "retried")
+                    retries[event["attempts"]].append(event["id"])
+
+        if done:
+            await OutboxEvent.filter(id__in=done).delete()
+        for attempts, ids in retries.items():
+            await OutboxEvent.filter(id__in=ids).update(
+                next_attempt_at=time.time() + retry_delay(attempts)
+            )
+        return len(rows)
+
+
+@asynccontextmanager
+async def outbox_dispatcher_lifespan(app: Litestar):
+    # Development only, like the in-process job worker
+    if not settings.JOB_WORKER_IN_PROCESS:
+        yield
+        return
+    load_outbox_modules()
+    dispatcher = OutboxDispatcher(
+        settings.OUTBOX_BATCH_SIZE, settings.OUTBOX_POLL_INTERVAL
+    )
+    task = asyncio.create_task(dispatcher.run())
+    yield
+    dispatcher.stop()
+    await task
@@ -0,0 +1,193 @@
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+from urllib.parse import parse_qsl
+import asyncio, cProfile, io, json, logging, os, pstats, time, uuid
+
+from litestar import Response
+from litestar.datastructures import Headers
+from litestar.middleware import AbstractMiddleware
+from litestar.types import Message, Receive, Scope, Send
+
+from app.api.utils.auth import Authentication
+from app.core.config import settings
+from app.common.queries import query_listeners
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "profile"
+
+
+class ProfileSession:
+    def __init__(self) -> None:
+        self.id = uuid.uuid4().hex
+        self.profiler = cProfile.Profile()
+        self.sql_time = 0.0
+        self.sql_queries = 0
+        self.serialization_time = 0.0
+        self.start = 0.0
+        self.total_time = 0.0
+
+    def breakdown(self) -> dict:
+        stats = pstats.Stats(self.profiler)
+        pydantic_time = sum(
+            tottime
+            for (filename, _, name), (_, _, tottime, _, _) in stats.stats.items()
+            if "pydantic" in filename or "pydantic" in name
+        )
+        return {
+            "id": self.id,
+            "total_ms": self.total_time * 1000,
+            "sql_ms": self.sql_time * 1000,
+            "sql_queries": self.sql_queries,
+            "serialization_ms": self.serialization_time * 1000,
+            "pydantic_ms": pydantic_time * 1000,
+            "handler_ms": (self.total_time - self.sql_time - self.serialization_time)
+            * 1000,
+        }
+
+    def top_functions(self, limit: int = 40) -> str:
+        output = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=output)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+
+_session: ContextVar[Optional[ProfileSession]] = ContextVar(
+    "profile_session", default=None
+)
+
+# The SQL and serialization hooks are only installed while a profiled request is running,
+# so requests without the flag don't pay anything for them.
+_active_sessions = 0
+_previous_render = None
+
+
+def _record_query(sql: str, duration: float) -> None:
+    session = _session.get()
+    if session is not None:
+        session.sql_time += duration
+        session.sql_queries += 1
+
+
+def _timed_render(self, *args, **kwargs):
+    session = _session.get()
+    if session is None:
+        return _previous_render(self, *args, **kwargs)
+    start = time.perf_counter()
+    try:
+        return _previous_render(self, *args, **kwargs)
+    finally:
+        session.serialization_time += time.perf_counter() - start
+
+
+def _install_hooks() -> None:
+    global _active_sessions, _previous_render
+    _active_sessions += 1
+    if _active_sessions == 1:
+        query_listeners.append(_record_query)
+        _previous_render = Response.render  # Tracing may have wrapped it already
+        Response.render = _timed_render
+
+
+def _remove_hooks() -> None:
+    global _active_sessions
+    _active_sessions -= 1
+    if _active_sessions == 0:
+        query_listeners.remove(_record_query)
+        Response.render = _previous_render
+
+
+def profiling_requested(scope: Scope) -> bool:
+    query = parse_qsl(scope["query_string"].decode("latin-1"))
+    if (PROFILE_QUERY_PARAM, "1") in query:
+        return True
+    return any(
+        name == PROFILE_HEADER.encode() and value == b"1"
+        for name, value in scope["headers"]
+    )
+
+
+async def is_admin(scope: Scope) -> bool:
+    token = Headers.from_scope(scope).get("authorization")
+    if not token or len(token) < 10:
+        return False
+    user = await Authentication.decodeAuthorization(token)
+    return bool(user and (user.is_staff or user.is_superuser))
+
+
+class ProfilingMiddleware(AbstractMiddleware):
+    """
+    Runs a single request under cProfile when an admin sends `X-Profile: 1` or `?profile=1`.
+
+    The response gets a Server-Timing header (sql, serialize, handler) and an X-Profile-Id.
+    The full profile (.prof, readable with pstats or snakeviz) and a JSON summary with the
+    top functions are written to PROFILES_DIR. cProfile follows the thread, so requests
+    handled concurrently on the same worker show up in the profile too: use it on a quiet
+    instance.
+    """
+
+    scopes = {"http"}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not profiling_requested(scope) or not await is_admin(scope):
+            await self.app(scope, receive, send)
+            return
+        if _active_sessions:
+            # Only one profiler can be attached to the interpreter at a time
+            logger.warning(f'Not profiling {scope["path"]}, a profile is running')
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # The body is rendered by now, so this is where the request ends
+                session.profiler.disable()
+                session.total_time = time.perf_counter() - session.start
+                breakdown = session.breakdown()
+                server_timing = (
+                    f'sql;dur={breakdown["sql_ms"]:.2f}, '
+                    f'serialize;dur={breakdown["serialization_ms"]:.2f}, '
+                    f'pydantic;dur={breakdown["pydantic_ms"]:.2f}, '
+                    f'handler;dur={breakdown["handler_ms"]:.2f}, '
+                    f'total;dur={breakdown["total_ms"]:.2f}'
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", server_timing.encode()),
+                    (b"x-profile-id", session.id.encode()),
+                ]
+            await send(message)
+
+        token = _session.set(session)
+        _install_hooks()
+        session.start = time.perf_counter()
+        session.profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session.profiler.disable()
+            _remove_hooks()
+            _session.reset(token)
+        # Dumping and summarizing the stats is file I/O and CPU work, kept off the loop
+        await asyncio.to_thread(self.store, scope, session)
+
+    def store(self, scope: Scope, session: ProfileSession) -> None:
+        os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+        path = os.path.join(settings.PROFILES_DIR, session.id)
+        session.profiler.dump_stats(f"{path}.prof")
+        summary = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "created_at": datetime.utcnow().isoformat(),
+            **session.breakdown(),
+            "top_functions": session.top_functions(),
+        }
+        with open(f"{path}.json", "w") as file:
+            json.dump(summary, file, indent=2)
+        logger.info(
+            f'Profiled {scope["method"]} {scope["path"]} in {summary["total_ms"]:.1f}ms, '
+            f"saved to {path}.prof"
+        )
@@ -0,0 +1,172 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, List, Optional
+import logging, re, time
+
+from litestar.middleware import AbstractMiddleware
+from litestar.types import Receive, Scope, Send
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+QUERY_METHODS = [
+    "execute_insert",
+    "execute_query",
+    "execute_query_dict",
+    "execute_many",
+    "execute_script",
+]
+
+# Called with (sql, seconds) after every query. Other instrumentation registers here too.
+query_listeners: List[Callable[[str, float], None]] = []
+
+_in_query: ContextVar[bool] = ContextVar("in_query", default=False)
+_request_stats: ContextVar[Optional["QueryStats"]] = ContextVar(
+    "request_query_stats", default=None
+)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\$\d+")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+def query_shape(sql: str) -> str:
+    # Strip literals and placeholders so the same query with different values matches
+    shape = _LITERALS.sub("?", sql)
+    return _IN_LISTS.sub("(...)", shape)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_time: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+    queries: List[str] = field(default_factory=list)
+
+    def add(self, sql: str, duration: float) -> None:
+        self.count += 1
+        self.total_time += duration
+        self.shapes[query_shape(sql)] += 1
+        self.queries.append(sql)
+
+    def repeated(self, threshold: int):
+        # Query shapes issued at least `threshold` times (the usual N+1 signature)
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+def _record_request_query(sql: str, duration: float) -> None:
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.add(sql, duration)
+
+
+def _instrument(method):
+    @wraps(method)
+    async def wrapper(self, query, *args, **kwargs):
+        if _in_query.get():
+            # Some clients call one execute method from another, count it once
+            return await method(self, query, *args, **kwargs)
+        token = _in_query.set(True)
+        start = time.perf_counter()
+        try:
+            return await method(self, query, *args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            _in_query.reset(token)
+            for listener in query_listeners:
+                listener(query, duration)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def _client_classes(cls=BaseDBAsyncClient):
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _client_classes(subclass)
+
+
+def install_query_hooks() -> None:
+    # Wrap the execute methods of every tortoise client (and transaction wrapper) class.
+    # Safe to call more than once.
+    import tortoise.backends.sqlite.client  # noqa: F401
+
+    try:
+        import tortoise.backends.asyncpg.client  # noqa: F401
+    except ImportError:
+        pass
+
+    for cls in set(_client_classes()):
+        for name in QUERY_METHODS:
+            method = cls.__dict__.get(name)
+            if method and not getattr(method, "__instrumented__", False):
+                setattr(cls, name, _instrument(method))
+
+    if _record_request_query not in query_listeners:
+        query_listeners.append(_record_request_query)
+
+
+@contextmanager
+def capture_queries():
+    # Collect every query issued inside the block, whatever request or task runs it
+    stats = QueryStats()
+    query_listeners.append(stats.add)
+    try:
+        yield stats
+    finally:
+        query_listeners.remove(stats.add)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _request_stats.get()
+
+
+class QueryCounterMiddleware(AbstractMiddleware):
+    """
+    Counts the queries and DB time of every request and logs a warning when the request
+    crosses the configured limits or repeats the same query shape (a likely N+1).
+    """
+
+    scopes = {"http"}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_stats.reset(token)
+            self.report(scope, stats)
+
+    def report(self, scope: Scope, stats: QueryStats) -> None:
+        route = f'{scope["method"]} {scope["path"]}'
+        db_time_ms = stats.total_time * 1000
+        if (
+            stats.count > settings.QUERY_COUNT_WARNING_THRESHOLD
+            or db_time_ms > settings.QUERY_TIME_WARNING_MS
+        ):
+            logger.warning(
+                f"{route} ran {stats.count} queries in {db_time_ms:.1f}ms of DB time"
+            )
+        for shape, count in stats.repeated(settings.REPEATED_QUERY_THRESHOLD):
+            logger.warning(f"{route} repeated a query {count} times: {shape}")
+
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    # Test helper: fails when the block issues more than `max_queries` queries
+    with capture_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        listing = "\n".join(f"  {sql}" for sql in stats.queries)
+        raise AssertionError(
+            f"Expected at most {max_queries} queries, {stats.count} were run:\n{listing}"
+        )
@@ -0,0 +1,257 @@
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import ipaddress, math, time
+
+from litestar import Litestar
+from litestar.middleware import AbstractMiddleware
+from litestar.types import Receive, Scope, Send
+from tortoise.connection import connections
+
+from app.api.utils.auth import Authentication
+from app.common.exception_handlers import ErrorCode, RequestError
+from app.core.config import settings
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# (allowed, tokens left)
+TakeResult = Tuple[bool, float]
+
+
+class Limit:
+    # "10/minute": a bucket of 10 tokens refilled at 10 tokens per minute
+    def __init__(self, value: str) -> None:
+        amount, period = value.split("/")
+        self.capacity = int(amount)
+        self.rate = self.capacity / PERIODS[period.strip()]
+
+    def retry_after(self, tokens: float, cost: int = 1) -> float:
+        return max(cost - tokens, 0) / self.rate
+
+
+def route_limits() -> Dict[str, Limit]:
+    # Route classes. Handlers choose one with opt={"rate_limit": "<class>"}, otherwise safe
+    # methods are "read" and the rest "write". "exempt" skips rate limiting.
+    return {
+        "read": Limit(settings.RATE_LIMIT_READ),
+        "write": Limit(settings.RATE_LIMIT_WRITE),
+        "auth": Limit(settings.RATE_LIMIT_AUTH),
+    }
+
+
+class MemoryBuckets:
+    """
+    Token buckets in this process's memory. Used as the store for a single worker, and in
+    front of the shared store as a pre-check.
+    """
+
+    def __init__(self, max_keys: int = 100000) -> None:
+        self.buckets: Dict[str, List[float]] = {}
+        self.max_keys = max_keys
+
+    async def take(self, key: str, limit: Limit, cost: int = 1) -> TakeResult:
+        return self.take_now(key, limit, cost)
+
+    def take_now(self, key: str, limit: Limit, cost: int = 1) -> TakeResult:
+        now = time.time()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self.prune(now)
+            full_after = limit.capacity / limit.rate
+            bucket = self.buckets[key] = [float(limit.capacity), now, full_after]
+        tokens = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        bucket[0], bucket[1] = tokens, now
+        return allowed, tokens
+
+    def prune(self, now: float) -> None:
+        # Buckets that have refilled completely hold no information
+        for key, (_, updated_at, full_after) in list(self.buckets.items()):
+            if now - updated_at >= full_after:
+                del self.buckets[key]
+
+
+class DatabaseBuckets:
+    """
+    Token buckets in the rate_limit_bucket table, shared by every worker. Each take is a
+    single atomic upsert, so concurrent workers can't overspend a bucket.
+    """
+
+    async def take(self, key: str, limit: Limit, cost: int = 1) -> TakeResult:
+        conn = connections.get("default")
+        if conn.capabilities.dialect == "postgres":
+            params, least = [f"${i}" for i in range(1, 7)], "LEAST"
+        else:
+            params, least = [f"?{i}" for i in range(1, 7)], "MIN"
+        key_p, initial_p, now_p, cost_p, capacity_p, rate_p = params
+        refilled = (
+            f'{least}({capacity_p}, "rate_limit_bucket"."tokens" + '
+            f'({now_p} - "rate_limit_bucket"."updated_at") * {rate_p})'
+        )
+        rows = await conn.execute_query_dict(
+            f"""
+            INSERT INTO "rate_limit_bucket" ("key", "tokens", "updated_at", "allowed")
+            VALUES ({key_p}, {initial_p}, {now_p}, TRUE)
+            ON CONFLICT ("key") DO UPDATE SET
+                "tokens" = CASE WHEN {refilled} >= {cost_p}
+                    THEN {refilled} - {cost_p} ELSE {refilled} END,
+                "allowed" = {refilled} >= {cost_p},
+                "updated_at" = {now_p}
+            RETURNING "tokens", "allowed"
+            """,
+            [key, limit.capacity - cost, time.time(), cost, limit.capacity, limit.rate],
+        )
+        return bool(rows[0]["allowed"]), rows[0]["tokens"]
+
+    async def prune(self, older_than: float) -> None:
+        conn = connections.get("default")
+        placeholder = "$1" if conn.capabilities.dialect == "postgres" else "?"
+        await conn.execute_query(
+            f'DELETE FROM "rate_limit_bucket" WHERE "updated_at" < {placeholder}',
+            [time.time() - older_than],
+        )
+
+
+class RateLimiter:
+    def __init__(self, store) -> None:
+        self.store = store
+        self.limits = route_limits()
+        # A key's local bucket only sees this worker's requests, so when it is empty the
+        # shared bucket is empty too. Denials from the shared store are remembered until
+        # the bucket refills. Both reject abusive clients without a query.
+        self.local = MemoryBuckets() if not isinstance(store, MemoryBuckets) else None
+        self.blocked_until: Dict[str, float] = {}
+        self.last_prune = time.time()
+
+    async def check(self, route_class: str, identity: str) -> Tuple[bool, float, Limit]:
+        # Returns (allowed, seconds until the next token if denied, limit)
+        limit = self.limits[route_class]
+        key = f"{route_class}:{identity}"
+        now = time.time()
+        blocked_until = self.blocked_until.get(key)
+        if blocked_until:
+            if blocked_until > now:
+                return False, blocked_until - now, limit
+            del self.blocked_until[key]
+
+        if self.local:
+            allowed, tokens = self.local.take_now(key, limit)
+            if not allowed:
+                return False, limit.retry_after(tokens), limit
+
+        allowed, tokens = await self.store.take(key, limit)
+        if not allowed:
+            retry_after = limit.retry_after(tokens)
+            self.blocked_until[key] = now + retry_after
+            return False, retry_after, limit
+        self.schedule_prune(now)
+        return True, 0, limit
+
+    def schedule_prune(self, now: float) -> None:
+        # The shared table is pruned by the cleanup job (app.common.cleanup)
+        if now - self.last_prune < settings.RATE_LIMIT_PRUNE_SECONDS:
+            return
+        self.last_prune = now
+        if len(self.blocked_until) > 10000:
+            self.blocked_until = {
+                key: until for key, until in self.blocked_until.items() if until > now
+            }
+
+
+def build_rate_limiter() -> RateLimiter:
+    if settings.RATE_LIMIT_STORE == "database":
+        return RateLimiter(DatabaseBuckets())
+    return RateLimiter(MemoryBuckets())
+
+
+@lru_cache
+def trusted_networks(proxies: Tuple[str, ...]) -> List[ipaddress._BaseNetwork]:
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in proxies]
+
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(
+        ip in network for network in trusted_networks(tuple(settings.TRUSTED_PROXIES))
+    )
+
+
+def client_ip(scope: Scope, headers: Dict[bytes, bytes]) -> str:
+    # Proxy headers are only believed when the request comes from one of TRUSTED_PROXIES,
+    # anyone else could send them to get a bucket of their choosing
+    client = scope.get("client")
+    address = client[0] if client else None
+    if not (address and is_trusted_proxy(address)):
+        return address or "unknown"
+    forwarded = [
+        hop.strip()
+        for hop in headers.get(b"x-forwarded-for", b"").decode("latin-1").split(",")
+        if hop.strip()
+    ]
+    # Each proxy appends the address it got the request from, so the client is the last
+    # hop that isn't one of ours. Whatever comes before it was sent by the client.
+    for hop in reversed(forwarded):
+        if not is_trusted_proxy(hop):
+            return hop
+    if forwarded:
+        return forwarded[0]
+    real_ip = headers.get(b"x-real-ip")
+    return real_ip.decode("latin-1").strip() if real_ip else address
+
+
+async def client_identity(scope: Scope) -> str:
+    # Authenticated users are limited per user, everyone else per IP. The token is only
+    # decoded (no query) so that this stays cheap.
+    headers = dict(scope["headers"])
+    token = headers.get(b"authorization", b"").decode("latin-1")
+    if len(token) >= 10:
+        decoded = await Authentication.decode_jwt(token[7:])
+        if decoded and "user_id" in decoded:
+            return f'user:{decoded["user_id"]}'
+    return f"ip:{client_ip(scope, headers)}"
+
+
+class RateLimitMiddleware(AbstractMiddleware):
+    """
+    Token bucket rate limiting per route class and per user or IP.
+    """
+
+    scopes = {"http"}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter: Optional[RateLimiter] = scope["app"].state.get("rate_limiter")
+        route_class = scope["route_handler"].opt.get("rate_limit")
+        if not route_class:
+            route_class = "read" if scope["method"] in SAFE_METHODS else "write"
+        if limiter is None or route_class == "exempt":
+            await self.app(scope, receive, send)
+            return
+
+        identity = await client_identity(scope)
+        allowed, retry_after, limit = await limiter.check(route_class, identity)
+        if not allowed:
+            raise RequestError(
+                err_code=ErrorCode.TOO_MANY_REQUESTS,
+                err_msg="Too many requests. Try again later",
+                status_code=429,
+                headers={
+                    "Retry-After": str(math.ceil(retry_after)),
+                    "RateLimit-Limit": str(limit.capacity),
+                    "RateLimit-Remaining": "0",
+                },
+            )
+        await self.app(scope, receive, send)
+
+
+@asynccontextmanager
+async def rate_limit_lifespan(app: Litestar):
+    if settings.RATE_LIMIT_ENABLED:
+        app.state.rate_limiter = build_rate_limiter()
+    yield
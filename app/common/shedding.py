@@ -0,0 +1,145 @@
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+import asyncio
+
+from litestar import Litestar
+from litestar.middleware import AbstractMiddleware
+from litestar.types import Receive, Scope, Send
+
+from app.common.exception_handlers import ErrorCode, RequestError
+from app.common.metrics import Counter, Gauge, Histogram
+from app.core.config import settings
+
+requests_shed = Counter(
+    "http_requests_shed_total",
+    "Requests rejected with a 503 because their route class was saturated",
+    ["load_class", "reason"],
+)
+load_class_in_flight = Gauge(
+    "http_load_class_in_flight",
+    "Requests holding a concurrency slot, by route class",
+    ["load_class"],
+)
+load_class_queued = Gauge(
+    "http_load_class_queued",
+    "Requests waiting for a concurrency slot, by route class",
+    ["load_class"],
+)
+load_class_wait = Histogram(
+    "http_load_class_wait_seconds",
+    "Time spent waiting for a concurrency slot",
+    ["load_class"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+class ConcurrencyLimit:
+    """
+    At most `limit` requests in flight. Excess requests wait up to `queue_timeout` seconds
+    for a slot, and at most `max_queue` of them wait at once: past that they are rejected
+    right away.
+    """
+
+    def __init__(
+        self, name: str, limit: int, queue_timeout: float, max_queue: int
+    ) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+
+    async def acquire(self) -> Optional[str]:
+        # Returns why the request was shed, or None once it holds a slot
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()  # Doesn't block when a slot is free
+            return None
+        if self.waiting >= self.max_queue:
+            return "queue_full"
+        self.waiting += 1
+        load_class_queued.set(self.name, value=self.waiting)
+        start = asyncio.get_running_loop().time()
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+        except TimeoutError:
+            return "queue_timeout"
+        finally:
+            self.waiting -= 1
+            load_class_queued.set(self.name, value=self.waiting)
+            load_class_wait.observe(
+                asyncio.get_running_loop().time() - start, self.name
+            )
+        return None
+
+    def release(self) -> None:
+        self.semaphore.release()
+
+
+def build_concurrency_limits() -> Dict[str, ConcurrencyLimit]:
+    # Route classes. Handlers choose one with opt={"load_class": "<class>"}, the rest are
+    # "default". Each class has its own slots, so heavy list endpoints filling up never
+    # take capacity from logins, token refreshes or sending messages. "exempt" skips it.
+    return {
+        "critical": ConcurrencyLimit(
+            "critical",
+            settings.CONCURRENCY_CRITICAL,
+            settings.QUEUE_TIMEOUT_CRITICAL_MS / 1000,
+            settings.MAX_QUEUED_REQUESTS,
+        ),
+        "default": ConcurrencyLimit(
+            "default",
+            settings.CONCURRENCY_DEFAULT,
+            settings.QUEUE_TIMEOUT_DEFAULT_MS / 1000,
+            settings.MAX_QUEUED_REQUESTS,
+        ),
+        "heavy": ConcurrencyLimit(
+            "heavy",
+            settings.CONCURRENCY_HEAVY,
+            settings.QUEUE_TIMEOUT_HEAVY_MS / 1000,
+            settings.MAX_QUEUED_REQUESTS,
+        ),
+    }
+
+
+class LoadSheddingMiddleware(AbstractMiddleware):
+    """
+    Caps the requests in flight per route class on this worker. When a class is saturated,
+    requests queue for a short bounded time and then get a fast 503 with Retry-After,
+    instead of every request slowing down together.
+    """
+
+    scopes = {"http"}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limits: Optional[Dict[str, ConcurrencyLimit]] = scope["app"].state.get(
+            "concurrency_limits"
+        )
+        load_class = scope["route_handler"].opt.get("load_class", "default")
+        if limits is None or load_class == "exempt":
+            await self.app(scope, receive, send)
+            return
+
+        limit = limits[load_class]
+        reason = await limit.acquire()
+        if reason:
+            requests_shed.inc(load_class, reason)
+            raise RequestError(
+                err_code=ErrorCode.SERVICE_UNAVAILABLE,
+                err_msg="The server is busy. Try again later",
+                status_code=503,
+                headers={"Retry-After": str(settings.LOAD_SHEDDING_RETRY_AFTER)},
+            )
+        load_class_in_flight.inc(load_class)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            load_class_in_flight.dec(load_class)
+            limit.release()
+
+
+@asynccontextmanager
+async def load_shedding_lifespan(app: Litestar):
+    if settings.LOAD_SHEDDING_ENABLED:
+        app.state.concurrency_limits = build_concurrency_limits()
+    yield
@@ -0,0 +1,222 @@
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+import asyncio, json, logging, os, queue, threading, time, uuid
+
+from litestar import Litestar, Response
+from litestar.middleware import AbstractMiddleware
+from litestar.types import Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.common.metrics import route_template
+from app.common.queries import query_listeners
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start",
+        "end",
+        "attributes",
+        "status",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional["Span"] = None,
+        start: Optional[float] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start = start if start is not None else time.time()
+        self.end: Optional[float] = None
+        self.attributes = attributes or {}
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.time()) - self.start) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class InMemoryExporter:
+    def __init__(self, max_spans: int = 10000) -> None:
+        self.spans: Deque[dict] = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span.to_dict())
+
+    def trace(self, trace_id: str) -> List[dict]:
+        return [span for span in self.spans if span["trace_id"] == trace_id]
+
+
+class JsonlExporter:
+    # One JSON span per line. Spans are buffered and written in batches by a background
+    # thread, so the file I/O stays off the event loop.
+    def __init__(self, path: str, flush_every: int = 100) -> None:
+        self.path = path
+        self.flush_every = flush_every
+        self.buffer: List[str] = []
+        self.lock = threading.Lock()  # Sync handlers run in worker threads
+        self.batches: "queue.Queue[List[str]]" = queue.Queue()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        threading.Thread(
+            target=self.write_batches, name="span-writer", daemon=True
+        ).start()
+
+    def export(self, span: Span) -> None:
+        with self.lock:
+            self.buffer.append(json.dumps(span.to_dict(), default=str))
+            if len(self.buffer) >= self.flush_every:
+                self.batches.put(self.buffer)
+                self.buffer = []
+
+    def flush(self) -> None:
+        # Blocks until everything exported so far is written
+        with self.lock:
+            if self.buffer:
+                self.batches.put(self.buffer)
+                self.buffer = []
+        self.batches.join()
+
+    def write_batches(self) -> None:
+        while True:
+            batch = self.batches.get()
+            try:
+                with open(self.path, "a") as file:
+                    file.write("\n".join(batch) + "\n")
+            except OSError:
+                logger.exception(f"Writing {len(batch)} spans failed")
+            finally:
+                self.batches.task_done()
+
+
+def build_exporter():
+    if settings.TRACING_EXPORTER == "jsonl":
+        return JsonlExporter(settings.TRACING_FILE)
+    if settings.TRACING_EXPORTER == "memory":
+        return InMemoryExporter()
+    return None
+
+
+exporter = build_exporter()
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def start_span(name: str, **attributes):
+    # Yields None when tracing is disabled, so callers must allow for that
+    if exporter is None:
+        yield None
+        return
+    span = Span(name, parent=_current_span.get(), attributes=attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.status = "error"
+        span.set_attribute("error", repr(exc))
+        raise
+    finally:
+        span.end = time.time()
+        _current_span.reset(token)
+        exporter.export(span)
+
+
+def record_span(name: str, duration: float, **attributes) -> None:
+    # For work timed elsewhere that just finished, e.g. a query reported by a listener
+    if exporter is None:
+        return
+    end = time.time()
+    span = Span(
+        name, parent=_current_span.get(), start=end - duration, attributes=attributes
+    )
+    span.end = end
+    exporter.export(span)
+
+
+def _trace_query(sql: str, duration: float) -> None:
+    record_span("db.query", duration, statement=sql[: settings.TRACING_MAX_SQL_LENGTH])
+
+
+_original_render = Response.render
+
+
+def _traced_render(self, *args, **kwargs):
+    with start_span("serialize", media_type=str(self.media_type)):
+        return _original_render(self, *args, **kwargs)
+
+
+def install_tracing() -> None:
+    # Hooks are only added when an exporter is configured
+    if exporter is None or _trace_query in query_listeners:
+        return
+    query_listeners.append(_trace_query)
+    Response.render = _traced_render
+
+
+@asynccontextmanager
+async def tracing_lifespan(app: Litestar):
+    install_tracing()
+    yield
+    if isinstance(exporter, JsonlExporter):
+        await asyncio.to_thread(exporter.flush)
+
+
+class TracingMiddleware(AbstractMiddleware):
+    """
+    Opens the root span of every request: route template, method, path and status.
+    """
+
+    scopes = {"http"}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        route = route_template(scope)
+        with start_span(
+            f'{scope["method"]} {route}',
+            route=route,
+            method=scope["method"],
+            path=scope["path"],
+        ) as span:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
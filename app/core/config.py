@@ -34,6 +34,23 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     TORTOISE_DATABASE_URL: str = None
 
+    # READ REPLICA
+    REPLICA_DATABASE_URL: Optional[str] = None
+    REPLICA_STICKY_SECONDS: int = 5  # Reads stay on primary this long after a write
+
+    # DATABASE POOL (asyncpg only)
+    DB_POOL_MIN_SIZE: int = 5
+    DB_POOL_MAX_SIZE: int = 20
+    DB_POOL_MAX_QUERIES: int = 50000  # Queries before a connection is replaced
+    DB_POOL_MAX_INACTIVE_LIFETIME: float = (
+        300.0  # Seconds before idle connections close
+    )
+    DB_STATEMENT_CACHE_SIZE: int = 100  # Set to 0 behind pgbouncer in transaction mode
+    DB_COMMAND_TIMEOUT: Optional[float] = 30.0
+    DB_CONNECT_TIMEOUT: float = 10.0
+    DB_STATEMENT_TIMEOUT_MS: Optional[int] = 30000  # Server side cap for any statement
+    DB_POOL_WARMUP: bool = True  # Open DB_POOL_MIN_SIZE connections at startup
+
     # FIRST SUPERUSER
     FIRST_SUPERUSER_EMAIL: EmailStr
     FIRST_SUPERUSER_PASSWORD: str
@@ -53,9 +70,78 @@ class Settings(BaseSettings):
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
 
-    @validator("CORS_ALLOWED_ORIGINS", "ALLOWED_HOSTS", pre=True)
+    # QUERY MONITORING
+    QUERY_COUNT_WARNING_THRESHOLD: int = 20
+    QUERY_TIME_WARNING_MS: int = 200
+    REPEATED_QUERY_THRESHOLD: int = 5
+
+    # BACKGROUND JOBS
+    JOB_WORKER_IN_PROCESS: bool = False  # Run a worker in the app (development only)
+    JOB_CONCURRENCY: int = 10  # Jobs run at once by each worker
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_TIMEOUT_SECONDS: float = 60.0
+    JOB_LOCK_TIMEOUT_SECONDS: float = 300.0  # A running job is reclaimed after this
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: float = 10.0
+    JOB_RETRY_MAX_SECONDS: float = 3600.0
+    JOB_CLEANUP_INTERVAL_SECONDS: int = 3600
+    JOB_DEAD_RETENTION_DAYS: int = 7
+
+    # REALTIME OUTBOX (drained by the job worker process)
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 0.2
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETRY_BASE_SECONDS: float = 1.0
+    OUTBOX_RETRY_MAX_SECONDS: float = 300.0
+    OUTBOX_LOCK_TIMEOUT_SECONDS: float = 60.0  # A claimed event is reclaimed after this
+
+    # DEADLINES
+    REQUEST_DEADLINE_SECONDS: Optional[float] = (
+        10.0  # Handlers override it with opt={"deadline": seconds}
+    )
+
+    # LOAD SHEDDING (requests in flight per route class, per worker)
+    LOAD_SHEDDING_ENABLED: bool = True
+    CONCURRENCY_CRITICAL: int = 50
+    CONCURRENCY_DEFAULT: int = 100
+    CONCURRENCY_HEAVY: int = 20
+    QUEUE_TIMEOUT_CRITICAL_MS: int = 2000
+    QUEUE_TIMEOUT_DEFAULT_MS: int = 500
+    QUEUE_TIMEOUT_HEAVY_MS: int = 100
+    MAX_QUEUED_REQUESTS: int = 200  # Per route class, the rest are shed right away
+    LOAD_SHEDDING_RETRY_AFTER: int = 1
+
+    # RATE LIMITING
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: str = "database"  # "database" (shared by workers) or "memory"
+    RATE_LIMIT_READ: str = "600/minute"
+    RATE_LIMIT_WRITE: str = "120/minute"
+    RATE_LIMIT_AUTH: str = "10/minute"
+    RATE_LIMIT_PRUNE_SECONDS: int = 3600
+    # Addresses or networks of the proxies whose X-Forwarded-For/X-Real-IP are believed
+    TRUSTED_PROXIES: Union[List, str] = []
+
+    # EVENT LOOP LAG MONITOR
+    LOOP_LAG_MONITOR_ENABLED: bool = True
+    LOOP_LAG_INTERVAL_MS: int = 100
+    LOOP_LAG_THRESHOLD_MS: int = 100
+
+    # PROFILING
+    PROFILES_DIR: str = f"{PROJECT_DIR}/profiles"
+
+    # TRACING
+    TRACING_EXPORTER: Optional[str] = None  # "memory" or "jsonl", disabled when unset
+    TRACING_FILE: str = f"{PROJECT_DIR}/traces/spans.jsonl"
+    TRACING_MAX_SQL_LENGTH: int = 500
+
+    # METRICS
+    METRICS_AUTH_TOKEN: Optional[str] = (
+        None  # When set, /metrics needs it as a Bearer token
+    )
+
+    @validator("CORS_ALLOWED_ORIGINS", "ALLOWED_HOSTS", "TRUSTED_PROXIES", pre=True)
     def assemble_cors_origins(cls, v):
-        return v.split()
+        return v.split() if isinstance(v, str) else v
 
     @validator("TORTOISE_DATABASE_URL", pre=True)
     def assemble_postgres_connection(
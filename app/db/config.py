@@ -2,8 +2,11 @@ from litestar import Litestar
 from contextlib import asynccontextmanager
 from app.core.config import settings
 from tortoise import Tortoise
+from tortoise.backends.base.config_generator import expand_db_url
 from tortoise.connection import connections
-import logging, os
+from app.common.deadlines import DeadlineConnection
+from app.db.search import create_search_indexes
+import asyncio, logging, os, time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,8 +20,35 @@ MODELS = [
     "app.db.models.chat",
 ]
 
+
+def database_config(url: str):
+    # Postgres gets the pool settings, other databases keep the plain url
+    if not url.startswith(("postgres://", "asyncpg://")):
+        return url
+    config = expand_db_url(url)
+    config["credentials"].update(
+        {
+            "minsize": settings.DB_POOL_MIN_SIZE,
+            "maxsize": settings.DB_POOL_MAX_SIZE,
+            "max_queries": settings.DB_POOL_MAX_QUERIES,
+            "max_inactive_connection_lifetime": settings.DB_POOL_MAX_INACTIVE_LIFETIME,
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "command_timeout": settings.DB_COMMAND_TIMEOUT,
+            "timeout": settings.DB_CONNECT_TIMEOUT,
+            # Statements get the time left of the request's deadline as their timeout
+            "connection_class": DeadlineConnection,
+        }
+    )
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        # Backstop for statements whose client never cancels them, e.g. after a crash
+        config["credentials"]["server_settings"] = {
+            "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)
+        }
+    return config
+
+
 TORTOISE_ORM = {
-    "connections": {"default": settings.TORTOISE_DATABASE_URL},
+    "connections": {"default": database_config(settings.TORTOISE_DATABASE_URL)},
     "apps": {
         "models": {
             "models": MODELS
@@ -29,6 +59,11 @@ TORTOISE_ORM = {
         },
     },
 }
+if settings.REPLICA_DATABASE_URL:
+    TORTOISE_ORM["connections"]["replica"] = database_config(
+        settings.REPLICA_DATABASE_URL
+    )
+    TORTOISE_ORM["routers"] = ["app.db.routers.ReplicaRouter"]
 
 
 @asynccontextmanager
@@ -36,8 +71,27 @@ async def lifespan(app: Litestar):
     await Tortoise.init(config=TORTOISE_ORM)
     if os.environ.get("ENVIRONMENT") == "testing":
         # Testing env
-        await Tortoise.generate_schemas()
+        await generate_schemas()
     logger.info("Initialized Tortoise ORM")
+    if settings.DB_POOL_WARMUP:
+        await warm_up_connections()
     yield
     await connections.close_all()
     logger.info("Closed Tortoise ORM connections")
+
+
+async def generate_schemas():
+    # Models only. The SQLite search indexes are created alongside, see app.db.search
+    await Tortoise.generate_schemas()
+    await create_search_indexes(connections.get("default"))
+
+
+async def warm_up_connections():
+    # Open the pool's connections now rather than on the first requests after a deploy.
+    # Concurrent queries make the pool hand out (and open) distinct connections.
+    start = time.perf_counter()
+    for name in connections.db_config:
+        conn = connections.get(name)
+        count = settings.DB_POOL_MIN_SIZE if hasattr(conn, "pool_minsize") else 1
+        await asyncio.gather(*(conn.execute_query("SELECT 1") for _ in range(count)))
+    logger.info(f"Warmed up database connections in {time.perf_counter() - start:.2f}s")
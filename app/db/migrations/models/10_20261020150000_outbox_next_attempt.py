@@ -0,0 +1,14 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # Events already waiting are due right away
+    return """
+        ALTER TABLE "outbox_event" ADD "next_attempt_at" DOUBLE PRECISION NOT NULL DEFAULT 0;
+        ALTER TABLE "outbox_event" ALTER COLUMN "next_attempt_at" DROP DEFAULT;
+        CREATE INDEX "idx_outbox_even_next_at_5d1c2e" ON "outbox_event" ("next_attempt_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "outbox_event" DROP COLUMN "next_attempt_at";"""
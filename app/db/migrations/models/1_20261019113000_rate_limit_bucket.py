@@ -0,0 +1,16 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE UNLOGGED TABLE IF NOT EXISTS "rate_limit_bucket" (
+    "key" VARCHAR(255) NOT NULL  PRIMARY KEY,
+    "tokens" DOUBLE PRECISION NOT NULL,
+    "updated_at" DOUBLE PRECISION NOT NULL,
+    "allowed" BOOL NOT NULL  DEFAULT True
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "rate_limit_bucket";"""
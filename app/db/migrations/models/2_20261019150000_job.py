@@ -0,0 +1,26 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "job" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(100) NOT NULL,
+    "payload" JSONB NOT NULL,
+    "status" VARCHAR(10) NOT NULL  DEFAULT 'pending',
+    "attempts" INT NOT NULL  DEFAULT 0,
+    "max_attempts" INT NOT NULL  DEFAULT 5,
+    "run_at" DOUBLE PRECISION NOT NULL,
+    "locked_at" DOUBLE PRECISION,
+    "locked_by" VARCHAR(255),
+    "last_error" TEXT,
+    "key" VARCHAR(255)  UNIQUE,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS "idx_job_status_920a13" ON "job" ("status", "run_at");
+COMMENT ON COLUMN "job"."status" IS 'PENDING: pending\\nRUNNING: running\\nDEAD: dead';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "job";"""
@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "outbox_event" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "topic" VARCHAR(50) NOT NULL,
+    "payload" JSONB NOT NULL,
+    "attempts" INT NOT NULL  DEFAULT 0,
+    "created_at" DOUBLE PRECISION NOT NULL
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "outbox_event";"""
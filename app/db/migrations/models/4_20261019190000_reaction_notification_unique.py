@@ -0,0 +1,27 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # Duplicates that slipped through the missing constraints are removed first, keeping
+    # the most recent row of each group.
+    return """
+        DELETE FROM "reaction" AS r USING "reaction" AS newer
+    WHERE r."user_id" = newer."user_id" AND r."reply_id" = newer."reply_id"
+        AND (r."created_at", r."id") < (newer."created_at", newer."id");
+        ALTER TABLE "reaction" ADD CONSTRAINT "uid_reaction_user_id_c84681" UNIQUE ("user_id", "reply_id");
+        DELETE FROM "notification" AS n USING "notification" AS newer
+    WHERE n."sender_id" = newer."sender_id" AND n."ntype" = newer."ntype"
+        AND (n."post_id" = newer."post_id" OR n."comment_id" = newer."comment_id"
+            OR n."reply_id" = newer."reply_id")
+        AND (n."created_at", n."id") < (newer."created_at", newer."id");
+        ALTER TABLE "notification" ADD CONSTRAINT "uid_notificatio_sender__39c6a0" UNIQUE ("sender_id", "ntype", "post_id");
+        ALTER TABLE "notification" ADD CONSTRAINT "uid_notificatio_sender__fd695f" UNIQUE ("sender_id", "ntype", "comment_id");
+        ALTER TABLE "notification" ADD CONSTRAINT "uid_notificatio_sender__cf05cc" UNIQUE ("sender_id", "ntype", "reply_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "notification" DROP CONSTRAINT "uid_notificatio_sender__cf05cc";
+        ALTER TABLE "notification" DROP CONSTRAINT "uid_notificatio_sender__fd695f";
+        ALTER TABLE "notification" DROP CONSTRAINT "uid_notificatio_sender__39c6a0";
+        ALTER TABLE "reaction" DROP CONSTRAINT "uid_reaction_user_id_c84681";"""
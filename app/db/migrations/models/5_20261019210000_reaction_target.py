@@ -0,0 +1,47 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # The post, comment and reply columns are folded into (target_type, target_id) and the
+    # type names into small integers. Reactions whose target was deleted (all three columns
+    # set to null) are dropped. Dropping the columns drops their constraints with them.
+    return """
+        ALTER TABLE "reaction" ADD "target_type" SMALLINT;
+        ALTER TABLE "reaction" ADD "target_id" UUID;
+        UPDATE "reaction" SET
+            "target_type" = CASE WHEN "post_id" IS NOT NULL THEN 1
+                WHEN "comment_id" IS NOT NULL THEN 2 ELSE 3 END,
+            "target_id" = COALESCE("post_id", "comment_id", "reply_id");
+        DELETE FROM "reaction" WHERE "target_id" IS NULL;
+        ALTER TABLE "reaction" ALTER COLUMN "target_type" SET NOT NULL;
+        ALTER TABLE "reaction" ALTER COLUMN "target_id" SET NOT NULL;
+        ALTER TABLE "reaction" ALTER COLUMN "rtype" TYPE SMALLINT USING CASE "rtype"
+            WHEN 'LIKE' THEN 1 WHEN 'LOVE' THEN 2 WHEN 'HAHA' THEN 3
+            WHEN 'WOW' THEN 4 WHEN 'SAD' THEN 5 ELSE 6 END;
+        ALTER TABLE "reaction" DROP COLUMN "post_id";
+        ALTER TABLE "reaction" DROP COLUMN "comment_id";
+        ALTER TABLE "reaction" DROP COLUMN "reply_id";
+        ALTER TABLE "reaction" ADD CONSTRAINT "uid_reaction_user_id_2bc29a" UNIQUE ("user_id", "target_type", "target_id");
+        CREATE INDEX "idx_reaction_target__99a0ed" ON "reaction" ("target_type", "target_id", "rtype", "created_at");
+        COMMENT ON COLUMN "reaction"."rtype" IS 'LIKE: 1\nLOVE: 2\nHAHA: 3\nWOW: 4\nSAD: 5\nANGRY: 6';
+        COMMENT ON COLUMN "reaction"."target_type" IS 'POST: 1\nCOMMENT: 2\nREPLY: 3';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "reaction" ADD "post_id" UUID REFERENCES "post" ("id") ON DELETE SET NULL;
+        ALTER TABLE "reaction" ADD "comment_id" UUID REFERENCES "comment" ("id") ON DELETE SET NULL;
+        ALTER TABLE "reaction" ADD "reply_id" UUID REFERENCES "reply" ("id") ON DELETE SET NULL;
+        UPDATE "reaction" SET
+            "post_id" = CASE WHEN "target_type" = 1 THEN "target_id" END,
+            "comment_id" = CASE WHEN "target_type" = 2 THEN "target_id" END,
+            "reply_id" = CASE WHEN "target_type" = 3 THEN "target_id" END;
+        ALTER TABLE "reaction" ALTER COLUMN "rtype" TYPE VARCHAR(20) USING CASE "rtype"
+            WHEN 1 THEN 'LIKE' WHEN 2 THEN 'LOVE' WHEN 3 THEN 'HAHA'
+            WHEN 4 THEN 'WOW' WHEN 5 THEN 'SAD' ELSE 'ANGRY' END;
+        DROP INDEX "idx_reaction_target__99a0ed";
+        ALTER TABLE "reaction" DROP COLUMN "target_type";
+        ALTER TABLE "reaction" DROP COLUMN "target_id";
+        ALTER TABLE "reaction" ADD CONSTRAINT "uid_reaction_user_id_7ee1a2" UNIQUE ("user_id", "post_id");
+        ALTER TABLE "reaction" ADD CONSTRAINT "uid_reaction_user_id_74f245" UNIQUE ("user_id", "comment_id");
+        ALTER TABLE "reaction" ADD CONSTRAINT "uid_reaction_user_id_c84681" UNIQUE ("user_id", "reply_id");"""
@@ -0,0 +1,70 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # Counters start from the reactions already stored
+    return """
+        ALTER TABLE "post" ADD "like_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "post" ADD "love_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "post" ADD "haha_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "post" ADD "wow_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "post" ADD "sad_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "post" ADD "angry_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "comment" ADD "like_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "comment" ADD "love_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "comment" ADD "haha_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "comment" ADD "wow_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "comment" ADD "sad_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "comment" ADD "angry_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "reply" ADD "like_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "reply" ADD "love_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "reply" ADD "haha_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "reply" ADD "wow_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "reply" ADD "sad_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "reply" ADD "angry_count" INT NOT NULL  DEFAULT 0;
+        UPDATE "post" SET
+            "like_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 1 AND "target_id" = "post"."id" AND "rtype" = 1),
+            "love_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 1 AND "target_id" = "post"."id" AND "rtype" = 2),
+            "haha_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 1 AND "target_id" = "post"."id" AND "rtype" = 3),
+            "wow_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 1 AND "target_id" = "post"."id" AND "rtype" = 4),
+            "sad_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 1 AND "target_id" = "post"."id" AND "rtype" = 5),
+            "angry_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 1 AND "target_id" = "post"."id" AND "rtype" = 6)
+        WHERE EXISTS (SELECT 1 FROM "reaction" WHERE "target_type" = 1 AND "target_id" = "post"."id");
+        UPDATE "comment" SET
+            "like_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 2 AND "target_id" = "comment"."id" AND "rtype" = 1),
+            "love_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 2 AND "target_id" = "comment"."id" AND "rtype" = 2),
+            "haha_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 2 AND "target_id" = "comment"."id" AND "rtype" = 3),
+            "wow_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 2 AND "target_id" = "comment"."id" AND "rtype" = 4),
+            "sad_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 2 AND "target_id" = "comment"."id" AND "rtype" = 5),
+            "angry_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 2 AND "target_id" = "comment"."id" AND "rtype" = 6)
+        WHERE EXISTS (SELECT 1 FROM "reaction" WHERE "target_type" = 2 AND "target_id" = "comment"."id");
+        UPDATE "reply" SET
+            "like_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 3 AND "target_id" = "reply"."id" AND "rtype" = 1),
+            "love_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 3 AND "target_id" = "reply"."id" AND "rtype" = 2),
+            "haha_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 3 AND "target_id" = "reply"."id" AND "rtype" = 3),
+            "wow_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 3 AND "target_id" = "reply"."id" AND "rtype" = 4),
+            "sad_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 3 AND "target_id" = "reply"."id" AND "rtype" = 5),
+            "angry_count" = (SELECT COUNT(*) FROM "reaction" WHERE "target_type" = 3 AND "target_id" = "reply"."id" AND "rtype" = 6)
+        WHERE EXISTS (SELECT 1 FROM "reaction" WHERE "target_type" = 3 AND "target_id" = "reply"."id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "reply" DROP COLUMN "angry_count";
+        ALTER TABLE "reply" DROP COLUMN "sad_count";
+        ALTER TABLE "reply" DROP COLUMN "wow_count";
+        ALTER TABLE "reply" DROP COLUMN "haha_count";
+        ALTER TABLE "reply" DROP COLUMN "love_count";
+        ALTER TABLE "reply" DROP COLUMN "like_count";
+        ALTER TABLE "comment" DROP COLUMN "angry_count";
+        ALTER TABLE "comment" DROP COLUMN "sad_count";
+        ALTER TABLE "comment" DROP COLUMN "wow_count";
+        ALTER TABLE "comment" DROP COLUMN "haha_count";
+        ALTER TABLE "comment" DROP COLUMN "love_count";
+        ALTER TABLE "comment" DROP COLUMN "like_count";
+        ALTER TABLE "post" DROP COLUMN "angry_count";
+        ALTER TABLE "post" DROP COLUMN "sad_count";
+        ALTER TABLE "post" DROP COLUMN "wow_count";
+        ALTER TABLE "post" DROP COLUMN "haha_count";
+        ALTER TABLE "post" DROP COLUMN "love_count";
+        ALTER TABLE "post" DROP COLUMN "like_count";"""
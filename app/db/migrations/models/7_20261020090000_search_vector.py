@@ -0,0 +1,22 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # Not model fields: Postgres fills the columns itself, see app.db.search
+    return """
+        ALTER TABLE "post" ADD "search_vector" TSVECTOR
+            GENERATED ALWAYS AS (to_tsvector('english', "text")) STORED;
+        CREATE INDEX "idx_post_search_vector" ON "post" USING GIN ("search_vector");
+        ALTER TABLE "comment" ADD "search_vector" TSVECTOR
+            GENERATED ALWAYS AS (to_tsvector('english', "text")) STORED;
+        CREATE INDEX "idx_comment_search_vector" ON "comment" USING GIN ("search_vector");
+        ALTER TABLE "reply" ADD "search_vector" TSVECTOR
+            GENERATED ALWAYS AS (to_tsvector('english', "text")) STORED;
+        CREATE INDEX "idx_reply_search_vector" ON "reply" USING GIN ("search_vector");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "reply" DROP COLUMN "search_vector";
+        ALTER TABLE "comment" DROP COLUMN "search_vector";
+        ALTER TABLE "post" DROP COLUMN "search_vector";"""
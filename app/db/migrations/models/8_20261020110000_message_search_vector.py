@@ -0,0 +1,16 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # btree_gin lets chat_id share the GIN index, so a chat's matches are found without
+    # scanning every chat's. Not a model field, see app.db.search
+    return """
+        CREATE EXTENSION IF NOT EXISTS btree_gin;
+        ALTER TABLE "message" ADD "search_vector" TSVECTOR
+            GENERATED ALWAYS AS (to_tsvector('english', COALESCE("text", ''))) STORED;
+        CREATE INDEX "idx_message_search_vector" ON "message" USING GIN ("chat_id", "search_vector");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "message" DROP COLUMN "search_vector";"""
@@ -0,0 +1,16 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # The trigram index answers both the prefix LIKEs and the fuzzy <% matches of user
+    # search. Not a model field, see app.db.search
+    return """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        ALTER TABLE "user" ADD "search_name" TEXT
+            GENERATED ALWAYS AS (lower("first_name" || ' ' || "last_name" || ' ' || "username")) STORED;
+        CREATE INDEX "idx_user_search_name" ON "user" USING GIN ("search_name" gin_trgm_ops);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "user" DROP COLUMN "search_name";"""
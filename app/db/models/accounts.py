@@ -3,7 +3,9 @@ from app.api.utils.tools import generate_random_alphanumeric_string
 from app.core.config import settings
 from app.core.security import get_password_hash
 from tortoise import fields
+from tortoise.signals import post_delete, post_save
 from app.db.models.base import BaseModel
+from app.db.search import user_search_index, user_search_name
 from datetime import datetime
 from slugify import slugify
 import random
@@ -117,6 +119,20 @@ class User(BaseModel):
         return city.name if city else None
 
 
+@post_save(User)
+async def index_user(sender, instance, created, using_db, update_fields):
+    # Keeps the in-memory search index of SQLite current, see app.db.search
+    user_search_index.update(
+        str(instance.id),
+        user_search_name(instance.first_name, instance.last_name, instance.username),
+    )
+
+
+@post_delete(User)
+async def unindex_user(sender, instance, using_db):
+    user_search_index.delete(str(instance.id))
+
+
 class Otp(BaseModel):
     user = fields.ForeignKeyField("models.User", unique=True)
     code = fields.IntField()
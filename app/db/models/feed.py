@@ -1,4 +1,4 @@
-from enum import Enum
+from enum import Enum, IntEnum
 from slugify import slugify
 from app.api.utils.file_processors import FileProcessor
 from app.db.models.base import BaseModel
@@ -14,10 +14,37 @@ class ReactionChoices(Enum):
     ANGRY = "ANGRY"
 
 
+class ReactionType(IntEnum):
+    # Stored form of ReactionChoices, which the API keeps using
+    LIKE = 1
+    LOVE = 2
+    HAHA = 3
+    WOW = 4
+    SAD = 5
+    ANGRY = 6
+
+
+class ReactionTarget(IntEnum):
+    POST = 1
+    COMMENT = 2
+    REPLY = 3
+
+
+# Counter column on posts, comments and replies for each reaction type
+REACTION_COUNT_FIELDS = {rtype: f"{rtype.name.lower()}_count" for rtype in ReactionType}
+
+
 class FeedAbstract(BaseModel):
     author = fields.ForeignKeyField("models.User")
     text = fields.TextField()
     slug = fields.CharField(max_length=1000, unique=True)
+    # Kept up to date by ReactionsView, so reaction totals never need an aggregate query
+    like_count = fields.IntField(default=0)
+    love_count = fields.IntField(default=0)
+    haha_count = fields.IntField(default=0)
+    wow_count = fields.IntField(default=0)
+    sad_count = fields.IntField(default=0)
+    angry_count = fields.IntField(default=0)
 
     class Meta:
         abstract = True
@@ -29,6 +56,17 @@ class FeedAbstract(BaseModel):
     def __str__(self):
         return f"{self.author.full_name} ------ {self.text[:10]}..."
 
+    @property
+    def reactions_breakdown(self):
+        return {
+            rtype.name: getattr(self, field)
+            for rtype, field in REACTION_COUNT_FIELDS.items()
+        }
+
+    @property
+    def reactions_count(self):
+        return sum(getattr(self, field) for field in REACTION_COUNT_FIELDS.values())
+
 
 class Post(FeedAbstract):
     image = fields.ForeignKeyField("models.File", on_delete=fields.SET_NULL, null=True)
@@ -55,29 +93,17 @@ class Reply(FeedAbstract):
 
 class Reaction(BaseModel):
     user = fields.ForeignKeyField("models.User")
-    rtype = fields.CharField(max_length=20, choices=ReactionChoices)
-    post = fields.ForeignKeyField(
-        "models.Post",
-        on_delete=fields.SET_NULL,
-        null=True,
-        blank=True,
-        related_name="reactions",
-    )
-    comment = fields.ForeignKeyField(
-        "models.Comment", on_delete=fields.SET_NULL, null=True, blank=True
-    )
-    reply = fields.ForeignKeyField(
-        "models.Reply", on_delete=fields.SET_NULL, null=True, blank=True
-    )
+    rtype = fields.IntEnumField(ReactionType)
+    # The post, comment or reply reacted to. Not a foreign key, so one index serves all three
+    target_type = fields.IntEnumField(ReactionTarget)
+    target_id = fields.UUIDField()
 
     class Meta:
         ordering = ["-created_at"]
-        unique_together = (("user", "post"), ("user", "comment"), ("user", "comment"))
+        # Upserts in ReactionsView.create_reaction conflict on the unique constraint. The
+        # index covers listing (optionally by type, newest first) and counting.
+        unique_together = (("user", "target_type", "target_id"),)
+        indexes = (("target_type", "target_id", "rtype", "created_at"),)
 
     def __str__(self):
-        return f"{self.user.full_name} ------ {self.rtype}"
-
-    @property
-    def targeted_obj(self):
-        # Return object the reaction object is targeted to (post, comment, or reply)
-        return self.post or self.comment or self.reply
+        return f"{self.user.full_name} ------ {self.rtype.name}"
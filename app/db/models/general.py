@@ -1,4 +1,5 @@
-from tortoise import fields
+from enum import Enum
+from tortoise import Model, fields
 from .base import BaseModel
 
 
@@ -17,3 +18,65 @@ class SiteDetail(BaseModel):
 
     def __str__(self):
         return self.name
+
+
+class RateLimitBucket(Model):
+    # Token buckets shared by every worker (see app.common.ratelimit)
+    key = fields.CharField(max_length=255, pk=True)
+    tokens = fields.FloatField()
+    updated_at = fields.FloatField()  # Unix time of the last take
+    allowed = fields.BooleanField(default=True)  # Outcome of the last take
+
+    class Meta:
+        table = "rate_limit_bucket"
+
+    def __str__(self):
+        return self.key
+
+
+class JobStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DEAD = "dead"  # Out of attempts, kept for inspection
+
+
+class Job(Model):
+    # Background jobs claimed by the workers (see app.common.jobs)
+    id = fields.BigIntField(pk=True)
+    name = fields.CharField(max_length=100)
+    payload = fields.JSONField(default=dict)
+    status = fields.CharEnumField(
+        enum_type=JobStatus, max_length=10, default=JobStatus.PENDING
+    )
+    attempts = fields.IntField(default=0)
+    max_attempts = fields.IntField(default=5)
+    run_at = fields.FloatField()  # Unix time, the job is due from then on
+    locked_at = fields.FloatField(null=True)
+    locked_by = fields.CharField(max_length=255, null=True)
+    last_error = fields.TextField(null=True)
+    key = fields.CharField(max_length=255, unique=True, null=True)  # Periodic jobs
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "job"
+        indexes = (("status", "run_at"),)
+
+    def __str__(self):
+        return f"{self.name} ({self.id})"
+
+
+class OutboxEvent(Model):
+    # Realtime events written with the change they announce (see app.common.outbox)
+    id = fields.BigIntField(pk=True)
+    topic = fields.CharField(max_length=50)
+    payload = fields.JSONField()
+    attempts = fields.IntField(default=0)
+    created_at = fields.FloatField()  # Unix time
+    # Unix time the event is due, pushed back by retries and while a dispatcher has it
+    next_attempt_at = fields.FloatField(index=True)
+
+    class Meta:
+        table = "outbox_event"
+
+    def __str__(self):
+        return f"{self.topic} ({self.id})"
@@ -57,6 +57,14 @@ class Notification(BaseModel):
         through="notification_read_by",
     )
 
+    class Meta:
+        # One notification per sender, type and target: reaction notifications are upserted
+        unique_together = (
+            ("sender", "ntype", "post"),
+            ("sender", "ntype", "comment"),
+            ("sender", "ntype", "reply"),
+        )
+
     def __str__(self):
         return str(self.id)
 
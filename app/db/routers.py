@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import Optional
+import hashlib, hmac, time
+
+from litestar.middleware import AbstractMiddleware
+from litestar.types import Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+REPLICA = "replica"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Holds "<unix time>.<signature>": until when the client's reads stay on the primary
+PRIMARY_COOKIE = "primary_until"
+
+_read_from_replica: ContextVar[bool] = ContextVar("read_from_replica", default=False)
+
+
+class ReplicaRouter:
+    """
+    Tortoise router: reads go to the replica only while a handler that opted in with
+    opt={"read_replica": True} is running. Everything else, and every write, uses default.
+    """
+
+    def db_for_read(self, model):
+        return REPLICA if _read_from_replica.get() else None
+
+    def db_for_write(self, model):
+        return None
+
+
+@contextmanager
+def use_primary():
+    # For reads that must see the latest writes, e.g. looking up a freshly rotated token
+    token = _read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def sign(value: str) -> str:
+    return hmac.new(
+        settings.SECRET_KEY.encode(), value.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def primary_cookie(until: float) -> str:
+    value = f"{until:.3f}"
+    return (
+        f"{PRIMARY_COOKIE}={value}.{sign(value)}; Max-Age={settings.REPLICA_STICKY_SECONDS}; "
+        "Path=/; HttpOnly; SameSite=Lax"
+    )
+
+
+def primary_until(scope: Scope) -> Optional[float]:
+    # The cookie is signed so that clients can't pin themselves to the primary
+    for name, value in scope["headers"]:
+        if name != b"cookie":
+            continue
+        morsel = SimpleCookie(value.decode("latin-1")).get(PRIMARY_COOKIE)
+        if not morsel:
+            continue
+        value, _, signature = morsel.value.rpartition(".")
+        if hmac.compare_digest(signature, sign(value)):
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+class ReplicaRoutingMiddleware(AbstractMiddleware):
+    """
+    Sends the reads of opted-in GET handlers to the replica. A client that just wrote
+    something keeps reading from the primary for REPLICA_STICKY_SECONDS, so it sees its own
+    writes despite replication lag. That window travels with the client as a signed cookie,
+    so it holds whichever worker its next request lands on.
+    """
+
+    scopes = {"http"}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not settings.REPLICA_DATABASE_URL:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] not in SAFE_METHODS:
+            await self.app(scope, receive, self.remember_writer(send))
+            return
+
+        wrote_recently = (primary_until(scope) or 0) > time.time()
+        if scope["route_handler"].opt.get("read_replica") and not wrote_recently:
+            token = _read_from_replica.set(True)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _read_from_replica.reset(token)
+            return
+        await self.app(scope, receive, send)
+
+    def remember_writer(self, send: Send) -> Send:
+        # Wall clock time, the only one the workers share
+        cookie = primary_cookie(time.time() + settings.REPLICA_STICKY_SECONDS)
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", cookie.encode("latin-1")),
+                ]
+            await send(message)
+
+        return send_with_cookie
@@ -0,0 +1,363 @@
+"""
+Full-text search over posts, comments, replies and chat messages, and user search by name.
+
+On Postgres each table has a generated `search_vector` tsvector column with a GIN index
+(see the search_vector migration), so the index follows every insert, update and delete
+without application code. SQLite, used for tests and local runs, has no tsvector: each
+table gets an FTS5 table instead, kept in sync by triggers created with
+create_search_indexes().
+
+Users are matched by prefix and by trigram similarity on their names and username. On
+Postgres that's the pg_trgm GIN index of the generated `search_name` column. SQLite has no
+trigram index, so the process keeps one in memory (UserSearchIndex).
+"""
+
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import asyncio, heapq, html, re
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+SEARCH_CONFIG = "english"  # Text search configuration of the search_vector columns
+SEARCH_TABLES = ("post", "comment", "reply")
+# Snippet highlight markers, swapped for <mark> tags once the text is escaped
+HIGHLIGHT_START, HIGHLIGHT_STOP = "\ue000", "\ue001"
+# pg_trgm's default word_similarity_threshold, the cut-off of fuzzy user matches
+USER_SIMILARITY_THRESHOLD = 0.6
+
+# (kind, id, rank), best first
+SearchHit = Tuple[str, str, float]
+# (id, created_at, snippet), newest first
+MessageHit = Tuple[str, datetime, str]
+
+
+def sqlite_search_schema(table: str, filters: Sequence[str] = ()) -> str:
+    # Keyed by id rather than rowid, which VACUUM may renumber. `filters` are columns
+    # copied over to narrow searches down, e.g. to a chat.
+    columns = ", ".join(f'"{column}"' for column in ("id", *filters))
+    new_values = ", ".join(f'new."{column}"' for column in ("id", *filters))
+    unindexed = ", ".join(f'"{column}" UNINDEXED' for column in ("id", *filters))
+    return f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS "{table}_search"
+        USING fts5({unindexed}, "text", tokenize = 'porter unicode61');
+    CREATE TRIGGER IF NOT EXISTS "{table}_search_insert" AFTER INSERT ON "{table}" BEGIN
+        INSERT INTO "{table}_search" ({columns}, "text") VALUES ({new_values}, new."text");
+    END;
+    CREATE TRIGGER IF NOT EXISTS "{table}_search_update" AFTER UPDATE OF "text" ON "{table}"
+    BEGIN
+        UPDATE "{table}_search" SET "text" = new."text" WHERE "id" = new."id";
+    END;
+    CREATE TRIGGER IF NOT EXISTS "{table}_search_delete" AFTER DELETE ON "{table}" BEGIN
+        DELETE FROM "{table}_search" WHERE "id" = old."id";
+    END;
+    """
+
+
+async def create_search_indexes(conn: BaseDBAsyncClient) -> None:
+    # Postgres gets its indexes from the migrations
+    if conn.capabilities.dialect != "sqlite":
+        return
+    # A new database, the users index is loaded again from it on the next search
+    user_search_index.reset()
+    await conn.execute_script(
+        "".join(sqlite_search_schema(table) for table in SEARCH_TABLES)
+        + sqlite_search_schema("message", filters=["chat_id"])
+    )
+
+
+def query_params(conn: BaseDBAsyncClient):
+    # The values of a query, and a function adding one and returning its placeholder
+    postgres = conn.capabilities.dialect == "postgres"
+    values = []
+
+    def param(value) -> str:
+        values.append(value)
+        return f"${len(values)}" if postgres else f"?{len(values)}"
+
+    return values, param
+
+
+def highlight(snippet: str) -> str:
+    # Message text is user input, so everything but the markers is escaped
+    return (
+        html.escape(snippet)
+        .replace(HIGHLIGHT_START, "<mark>")
+        .replace(HIGHLIGHT_STOP, "</mark>")
+    )
+
+
+def fts5_query(text: str) -> Optional[str]:
+    # Every word must match, like websearch_to_tsquery() without operators. Words are
+    # quoted so user input can't be read as FTS5 syntax.
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+
+async def search_feed(
+    conn: BaseDBAsyncClient,
+    text: str,
+    tables: Sequence[str],
+    limit: int,
+    after: Optional[Tuple[float, str]] = None,
+) -> List[SearchHit]:
+    """
+    Ranked matches for `text` in `tables`, best first and then by id. `after` is the
+    (rank, id) of the last hit of the previous page, for keyset pagination.
+    """
+    values, param = query_params(conn)
+    if conn.capabilities.dialect == "postgres":
+        query = f"websearch_to_tsquery('{SEARCH_CONFIG}', {param(text)})"
+        selects = [
+            f"""SELECT '{table.upper()}' AS "kind", "{table}"."id"::text AS "id",
+                ts_rank_cd("{table}"."search_vector", {query}) AS "rank"
+            FROM "{table}" WHERE "{table}"."search_vector" @@ {query}"""
+            for table in tables
+        ]
+    else:
+        query = fts5_query(text)
+        if not query:
+            return []
+        query_p = param(query)
+        # bm25() is lower for better matches
+        selects = [
+            f"""SELECT '{table.upper()}' AS "kind", "id", -bm25("{table}_search") AS "rank"
+            FROM "{table}_search" WHERE "{table}_search" MATCH {query_p}"""
+            for table in tables
+        ]
+
+    keyset = ""
+    if after:
+        rank_p, id_p = param(after[0]), param(after[1])
+        keyset = f'WHERE "rank" < {rank_p} OR ("rank" = {rank_p} AND "id" > {id_p})'
+    rows = await conn.execute_query_dict(
+        f"""
+        SELECT "kind", "id", "rank" FROM ({" UNION ALL ".join(selects)}) AS "hits"
+        {keyset}
+        ORDER BY "rank" DESC, "id" LIMIT {param(limit)}
+        """,
+        values,
+    )
+    return [(row["kind"], str(row["id"]), row["rank"]) for row in rows]
+
+
+async def search_messages(
+    conn: BaseDBAsyncClient,
+    chat_id,
+    text: str,
+    limit: int,
+    after: Optional[Tuple[datetime, str]] = None,
+) -> List[MessageHit]:
+    """
+    Messages of a chat matching `text`, newest first, each with a highlighted snippet.
+    `after` is the (created_at, id) of the last hit of the previous page.
+    """
+    values, param = query_params(conn)
+    if conn.capabilities.dialect == "postgres":
+        query = f"websearch_to_tsquery('{SEARCH_CONFIG}', {param(text)})"
+        options = (
+            f'StartSel="{HIGHLIGHT_START}", StopSel="{HIGHLIGHT_STOP}", '
+            'MaxFragments=2, MaxWords=20, MinWords=5, FragmentDelimiter=" … "'
+        )
+        snippet = f"""ts_headline('{SEARCH_CONFIG}', "message"."text", {query}, {param(options)})"""
+        source = f"""FROM "message"
+            WHERE "message"."chat_id" = {param(chat_id)} AND "message"."search_vector" @@ {query}"""
+    else:
+        query = fts5_query(text)
+        if not query:
+            return []
+        snippet = (
+            f'snippet("message_search", 2, {param(HIGHLIGHT_START)}, '
+            f"{param(HIGHLIGHT_STOP)}, ' … ', 20)"
+        )
+        source = f"""FROM "message_search" JOIN "message" ON "message"."id" = "message_search"."id"
+            WHERE "message_search" MATCH {param(query)}
+                AND "message_search"."chat_id" = {param(str(chat_id))}"""
+
+    keyset = ""
+    if after:
+        created_p, id_p = param(after[0]), param(after[1])
+        keyset = f"""AND ("message"."created_at" < {created_p}
+            OR ("message"."created_at" = {created_p} AND "message"."id" < {id_p}))"""
+    rows = await conn.execute_query_dict(
+        f"""
+        SELECT "message"."id", "message"."created_at", {snippet} AS "snippet"
+        {source} {keyset}
+        ORDER BY "message"."created_at" DESC, "message"."id" DESC LIMIT {param(limit)}
+        """,
+        values,
+    )
+    return [
+        (
+            str(row["id"]),
+            (
+                datetime.fromisoformat(row["created_at"])
+                if isinstance(row["created_at"], str)
+                else row["created_at"]
+            ),
+            highlight(row["snippet"]),
+        )
+        for row in rows
+    ]
+
+
+def user_search_name(first_name: str, last_name: str, username: str) -> str:
+    # Same as the search_name column on Postgres
+    return f"{first_name} {last_name} {username}".lower()
+
+
+def trigrams(text: str) -> Set[str]:
+    # Like pg_trgm: each word is padded with two spaces before and one after
+    result = set()
+    for word in re.findall(r"[^\W_]+", text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class UserSearchIndex:
+    """
+    In-memory stand-in for the pg_trgm index of users, for SQLite. It's loaded from the
+    database on the first search and then kept up to date by the User signals, so users
+    written with queryset updates or bulk_create() after that aren't indexed until the
+    database is recreated.
+
+    `prefixes` holds every part of a search name starting at a word, sorted, so prefix
+    matches are a bisect away. `postings` maps each trigram to the users having it.
+    Similarity is the share of the query's trigrams found in the name, which is what
+    pg_trgm's word_similarity() computes when the matching words are next to each other.
+    """
+
+    def __init__(self) -> None:
+        self.names: Dict[str, str] = {}
+        self.prefixes: List[Tuple[str, str]] = []
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+        self.loaded = False
+        self.lock = asyncio.Lock()
+
+    def reset(self) -> None:
+        self.names.clear()
+        self.prefixes.clear()
+        self.postings.clear()
+        self.loaded = False
+
+    async def load(self, conn: BaseDBAsyncClient) -> None:
+        async with self.lock:
+            if self.loaded:
+                return
+            rows = await conn.execute_query_dict(
+                'SELECT "id", "first_name", "last_name", "username" FROM "user"'
+            )
+            for row in rows:
+                self.insert(
+                    str(row["id"]),
+                    user_search_name(
+                        row["first_name"], row["last_name"], row["username"]
+                    ),
+                    sort=False,
+                )
+            # Sorted once rather than on every insert
+            self.prefixes.sort()
+            self.loaded = True
+
+    def word_starts(self, name: str) -> List[str]:
+        return [name] + [name[i + 1 :] for i, char in enumerate(name) if char == " "]
+
+    def insert(self, id: str, name: str, sort: bool = True) -> None:
+        self.names[id] = name
+        for part in self.word_starts(name):
+            if sort:
+                insort(self.prefixes, (part, id))
+            else:
+                self.prefixes.append((part, id))
+        for trigram in trigrams(name):
+            self.postings[trigram].add(id)
+
+    def remove(self, id: str) -> None:
+        name = self.names.pop(id, None)
+        if name is None:
+            return
+        for part in self.word_starts(name):
+            i = bisect_left(self.prefixes, (part, id))
+            if i < len(self.prefixes) and self.prefixes[i] == (part, id):
+                del self.prefixes[i]
+        for trigram in trigrams(name):
+            self.postings[trigram].discard(id)
+
+    def update(self, id: str, name: str) -> None:
+        # Called for every saved user, the index is only kept once loaded
+        if not self.loaded or self.names.get(id) == name:
+            return
+        self.remove(id)
+        self.insert(id, name)
+
+    def delete(self, id: str) -> None:
+        if self.loaded:
+            self.remove(id)
+
+    def search(self, text: str, limit: int, exclude: Optional[str] = None) -> List[str]:
+        # Ids of the best matches: prefix matches first, then by similarity and id
+        prefix_ids = set()
+        i = bisect_left(self.prefixes, (text,))
+        while i < len(self.prefixes) and self.prefixes[i][0].startswith(text):
+            prefix_ids.add(self.prefixes[i][1])
+            i += 1
+
+        query_trigrams = trigrams(text)
+        shared = defaultdict(int)
+        for trigram in query_trigrams:
+            for id in self.postings.get(trigram, ()):
+                shared[id] += 1
+
+        def similarity(id):
+            return shared[id] / len(query_trigrams) if query_trigrams else 0
+
+        matches = prefix_ids.union(
+            id for id in shared if similarity(id) >= USER_SIMILARITY_THRESHOLD
+        )
+        matches.discard(exclude)
+        return heapq.nsmallest(
+            limit,
+            matches,
+            key=lambda id: (id not in prefix_ids, -similarity(id), id),
+        )
+
+
+user_search_index = UserSearchIndex()
+
+
+async def search_users(
+    conn: BaseDBAsyncClient, text: str, limit: int, exclude=None
+) -> List[str]:
+    """
+    Ids of the users whose first name, last name or username starts with `text`, or is
+    close to it, best matches first. `exclude` is a user to leave out, like the searcher.
+    """
+    text = " ".join(text.lower().split())
+    if not text:
+        return []
+    exclude = str(exclude) if exclude else None
+    if conn.capabilities.dialect != "postgres":
+        await user_search_index.load(conn)
+        return user_search_index.search(text, limit, exclude)
+
+    values, param = query_params(conn)
+    # Both LIKE patterns and <% are answered by the trigram index
+    escaped = re.sub(r"([\\%_])", r"\\\1", text)
+    text_p, start_p, word_p = param(text), param(f"{escaped}%"), param(f"% {escaped}%")
+    prefix = f'("search_name" LIKE {start_p} OR "search_name" LIKE {word_p})'
+    where = f'({prefix} OR {text_p} <% "search_name")'
+    if exclude:
+        where += f' AND "id" != {param(exclude)}'
+    rows = await conn.execute_query_dict(
+        f"""
+        SELECT "id" FROM "user" WHERE {where}
+        ORDER BY {prefix} DESC, word_similarity({text_p}, "search_name") DESC, "id"
+        LIMIT {param(limit)}
+        """,
+        values,
+    )
+    return [str(row["id"]) for row in rows]
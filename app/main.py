@@ -3,12 +3,26 @@ from litestar import (
 )
 from litestar.openapi import OpenAPIConfig, OpenAPIController
 from litestar.config.cors import CORSConfig
-from litestar.middleware.rate_limit import RateLimitConfig
 from litestar.openapi.spec import Components, SecurityScheme
 from app.core.config import settings
 from app.common.exception_handlers import exc_handlers
+from app.common.loop_monitor import loop_monitor_lifespan, loop_offenders_handler
+from app.common.metrics import (
+    MetricsMiddleware,
+    install_pool_metrics,
+    metrics_handler,
+)
+from app.common.deadlines import DeadlineMiddleware
+from app.common.jobs import job_worker_lifespan
+from app.common.outbox import outbox_dispatcher_lifespan
+from app.common.profiling import ProfilingMiddleware
+from app.common.shedding import LoadSheddingMiddleware, load_shedding_lifespan
+from app.common.tracing import TracingMiddleware, tracing_lifespan
+from app.common.ratelimit import RateLimitMiddleware, rate_limit_lifespan
+from app.common.queries import QueryCounterMiddleware, install_query_hooks
 from app.api.routers import base_router
 from app.db.config import lifespan
+from app.db.routers import ReplicaRoutingMiddleware
 
 
 class MyOpenAPIController(OpenAPIController):
@@ -49,16 +63,34 @@ openapi_config = OpenAPIConfig(
     root_schema_site="swagger",
 )
 
-rate_limit_config = RateLimitConfig(rate_limit=("minute", 1000))
+install_query_hooks()
+install_pool_metrics()
 cors_config = CORSConfig(
     allow_origins=settings.CORS_ALLOWED_ORIGINS, allow_credentials=True
 )
 
 app = Litestar(
-    route_handlers=[base_router],
+    route_handlers=[base_router, metrics_handler, loop_offenders_handler],
     openapi_config=openapi_config,
-    middleware=[rate_limit_config.middleware],
+    middleware=[
+        MetricsMiddleware,
+        TracingMiddleware,
+        RateLimitMiddleware,
+        LoadSheddingMiddleware,
+        ProfilingMiddleware,
+        QueryCounterMiddleware,
+        ReplicaRoutingMiddleware,
+        DeadlineMiddleware,
+    ],
     exception_handlers=exc_handlers,
     cors_config=cors_config,
-    lifespan=[lifespan],
+    lifespan=[
+        lifespan,
+        rate_limit_lifespan,
+        load_shedding_lifespan,
+        loop_monitor_lifespan,
+        tracing_lifespan,
+        job_worker_lifespan,
+        outbox_dispatcher_lifespan,
+    ],
 )
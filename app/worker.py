@@ -0,0 +1,48 @@
+"""
+Background job worker, run next to the API processes:
+
+    python -m app.worker
+
+Claims jobs from the job table (see app.common.jobs) and drains the realtime outbox (see
+app.common.outbox) until it gets SIGINT or SIGTERM, then finishes what it is running and
+exits.
+"""
+
+import asyncio, logging, signal
+
+from tortoise import Tortoise
+from tortoise.connection import connections
+
+from app.core.config import settings
+from app.common.jobs import JobWorker, load_job_modules
+from app.common.outbox import OutboxDispatcher, load_outbox_modules
+from app.db.config import TORTOISE_ORM
+
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    load_job_modules()
+    load_outbox_modules()
+    await Tortoise.init(config=TORTOISE_ORM)
+    worker = JobWorker(settings.JOB_CONCURRENCY, settings.JOB_POLL_INTERVAL)
+    dispatcher = OutboxDispatcher(
+        settings.OUTBOX_BATCH_SIZE, settings.OUTBOX_POLL_INTERVAL
+    )
+
+    def stop():
+        worker.stop()
+        dispatcher.stop()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop)
+    try:
+        await asyncio.gather(worker.run(), dispatcher.run())
+    finally:
+        await connections.close_all()
+        logger.info("Job worker stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,331 @@
+"""
+Websocket fan-out benchmark.
+
+Starts the app with uvicorn on localhost against a fresh SQLite database, opens many
+simulated clients on /api/v5/ws/chats/{id} and /api/v5/ws/notifications, then fires chat
+messages and notifications through the REST routes. Every event is sent one at a time and
+the run waits until all clients received it, so each round measures one complete fan-out.
+
+Reports end-to-end delivery latency percentiles (from the REST call to the client), the
+delivery rate and the server's resident memory per open connection.
+
+    python -m benchmarks.fanout --clients 2000 --messages 50 --notifications 50
+"""
+
+import argparse, asyncio, json, os, socket, statistics, subprocess, sys, time
+
+sys.path.append(os.path.abspath("./"))  # To single-handedly execute the benchmarks
+
+import httpx
+import psutil
+import websockets
+
+from benchmarks.load import percentile
+
+DEFAULT_DATABASE_URL = "sqlite:///tmp/socialnet-fanout.sqlite3"
+
+
+async def seed(args):
+    from tortoise import Tortoise
+    from tortoise.connection import connections
+
+    from app.api.utils.auth import Authentication
+    from app.db.config import TORTOISE_ORM, generate_schemas
+    from app.db.models.accounts import User
+    from app.db.models.chat import Chat
+    from app.db.models.feed import Post
+    from initials.data_script import CreateData
+
+    await Tortoise.init(config=TORTOISE_ORM)
+    await generate_schemas()
+    data = await CreateData().create_fake_data(
+        users=args.members + 3,
+        posts=0,
+        comments=0,
+        replies=0,
+        reactions=0,
+        chats=0,
+        messages=0,
+        notifications=0,
+    )
+    users = data["users"]
+    for user in users:
+        user.access_token = await Authentication.create_access_token(
+            {"user_id": str(user.id), "username": user.username}
+        )
+    await User.bulk_update(users, fields=["access_token"])
+
+    # The owner sends chat messages and the members listen. The author receives the
+    # notifications for comments left by the commenter.
+    owner, author, commenter = users[0], users[1], users[2]
+    chat = await Chat.create(owner=owner, ctype="GROUP", name="Fan-out benchmark")
+    await chat.users.add(*users[3 : args.members + 3])
+    post = await Post.create(author=author, text="Fan-out benchmark post")
+    fixtures = {
+        "chat_id": str(chat.id),
+        "owner_token": owner.access_token,
+        "member_tokens": [user.access_token for user in users[3 : args.members + 3]],
+        "author_token": author.access_token,
+        "commenter_token": commenter.access_token,
+        "post_slug": post.slug,
+    }
+    await connections.close_all()
+    return fixtures
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--ws-max-queue",
+            "1024",
+        ],
+        # Notifications and chat events are pushed by the outbox dispatcher, which
+        # runs in the app only with the in-process worker
+        env={**os.environ, "JOB_WORKER_IN_PROCESS": "true"},
+    )
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                await client.get(f"http://127.0.0.1:{port}/api/v5/general/site-detail")
+                return server
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Server did not start")
+
+
+class Listener:
+    # One simulated client. Records when each event id arrives.
+
+    def __init__(self, uri: str, token: str, received: dict) -> None:
+        self.uri = uri
+        self.token = token
+        self.received = received
+        self.websocket = None
+        self.task = None
+
+    async def connect(self) -> None:
+        self.websocket = await websockets.connect(
+            self.uri,
+            extra_headers=[("Authorization", f"Bearer {self.token}")],
+            max_queue=None,
+        )
+        self.task = asyncio.create_task(self.listen())
+
+    async def listen(self) -> None:
+        try:
+            async for data in self.websocket:
+                arrived = time.perf_counter()
+                try:
+                    event = json.loads(data)
+                except ValueError:
+                    continue
+                if not isinstance(event, dict):
+                    continue  # e.g. the "Sent" acknowledgement sent back to the sender
+                if event.get("status") == "error":
+                    print(f"Socket error: {event.get('message')}")
+                    continue
+                self.received.setdefault(event["id"], []).append(arrived)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def close(self) -> None:
+        await self.websocket.close()
+        await self.task
+
+
+async def open_listeners(uri, tokens, count, received, batch: int = 200):
+    listeners = [Listener(uri, tokens[i % len(tokens)], received) for i in range(count)]
+    for i in range(0, count, batch):
+        await asyncio.gather(*(l.connect() for l in listeners[i : i + batch]))
+    return listeners
+
+
+async def wait_for_deliveries(received, event_id, expected, timeout):
+    deadline = time.perf_counter() + timeout
+    while len(received.get(event_id, [])) < expected:
+        if time.perf_counter() > deadline:
+            break
+        await asyncio.sleep(0.001)
+    return received.get(event_id, [])
+
+
+def summarize(name, latencies, deliveries, elapsed, expected):
+    result = {
+        "name": name,
+        "deliveries": deliveries,
+        "expected_deliveries": expected,
+        "deliveries_per_second": deliveries / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+    print(
+        f"{name:<14} {deliveries:>7}/{expected:<7} {result['deliveries_per_second']:>10.0f}/s "
+        f"p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+        f"p99 {result['p99_ms']:>8.2f}ms"
+    )
+    return result
+
+
+async def bench_chat(args, fixtures, base, client):
+    received = {}
+    uri = f"ws://{base}/api/v5/ws/chats/{fixtures['chat_id']}"
+    listeners = await open_listeners(
+        uri, fixtures["member_tokens"], args.clients, received
+    )
+    # The sender notifies its own chat socket after creating the message over REST
+    sender = Listener(uri, fixtures["owner_token"], received)
+    await sender.connect()
+    headers = {"Authorization": f"Bearer {fixtures['owner_token']}"}
+    expected = args.clients + 1  # the sender's socket is in the group as well
+
+    latencies, deliveries = [], 0
+    start = time.perf_counter()
+    for n in range(args.messages):
+        sent = time.perf_counter()
+        response = await client.post(
+            "/api/v5/chats",
+            json={"chat_id": fixtures["chat_id"], "text": f"Fan-out {n}"},
+            headers=headers,
+        )
+        message_id = response.json()["data"]["id"]
+        await sender.websocket.send(json.dumps({"status": "CREATED", "id": message_id}))
+        arrivals = await wait_for_deliveries(
+            received, message_id, expected, args.timeout
+        )
+        latencies.extend(arrived - sent for arrived in arrivals)
+        deliveries += len(arrivals)
+    elapsed = time.perf_counter() - start
+
+    for listener in listeners + [sender]:
+        await listener.close()
+    return summarize("chat", latencies, deliveries, elapsed, expected * args.messages)
+
+
+async def bench_notifications(args, fixtures, base, client):
+    received = {}
+    uri = f"ws://{base}/api/v5/ws/notifications"
+    listeners = await open_listeners(
+        uri, [fixtures["author_token"]], args.clients, received
+    )
+    headers = {"Authorization": f"Bearer {fixtures['commenter_token']}"}
+
+    latencies, deliveries = [], 0
+    start = time.perf_counter()
+    for n in range(args.notifications):
+        before = set(received)
+        sent = time.perf_counter()
+        # Commenting on someone else's post creates and pushes a notification
+        await client.post(
+            f"/api/v5/feed/posts/{fixtures['post_slug']}/comments",
+            json={"text": f"Fan-out {n}"},
+            headers=headers,
+        )
+        deadline = time.perf_counter() + args.timeout
+        while not set(received) - before and time.perf_counter() < deadline:
+            await asyncio.sleep(0.001)
+        new_ids = set(received) - before
+        if not new_ids:
+            continue
+        arrivals = await wait_for_deliveries(
+            received, new_ids.pop(), args.clients, args.timeout
+        )
+        latencies.extend(arrived - sent for arrived in arrivals)
+        deliveries += len(arrivals)
+    elapsed = time.perf_counter() - start
+
+    for listener in listeners:
+        await listener.close()
+    return summarize(
+        "notifications",
+        latencies,
+        deliveries,
+        elapsed,
+        args.clients * args.notifications,
+    )
+
+
+async def measure_memory(args, fixtures, base, server_process):
+    # Resident memory of the server with and without open connections
+    process = psutil.Process(server_process.pid)
+    idle_rss = process.memory_info().rss
+    uri = f"ws://{base}/api/v5/ws/chats/{fixtures['chat_id']}"
+    listeners = await open_listeners(uri, fixtures["member_tokens"], args.clients, {})
+    await asyncio.sleep(0.5)
+    connected_rss = process.memory_info().rss
+    for listener in listeners:
+        await listener.close()
+    per_connection = (connected_rss - idle_rss) / args.clients
+    print(
+        f"memory         idle {idle_rss / 2**20:.1f} MiB, with {args.clients} clients "
+        f"{connected_rss / 2**20:.1f} MiB ({per_connection / 1024:.1f} KiB/connection)"
+    )
+    return {
+        "idle_rss_bytes": idle_rss,
+        "connected_rss_bytes": connected_rss,
+        "bytes_per_connection": per_connection,
+    }
+
+
+async def main(args) -> None:
+    os.environ["TORTOISE_DATABASE_URL"] = args.database_url
+    sqlite_path = args.database_url.removeprefix("sqlite://")
+    if sqlite_path != args.database_url and os.path.exists(sqlite_path):
+        os.remove(sqlite_path)  # Start every run from a fresh database
+    fixtures = await seed(args)
+
+    port = args.port or free_port()
+    base = f"127.0.0.1:{port}"
+    server = await start_server(port)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://{base}", timeout=60) as client:
+            results = {"config": vars(args)}
+            results["memory"] = await measure_memory(args, fixtures, base, server)
+            results["chat"] = await bench_chat(args, fixtures, base, client)
+            results["notifications"] = await bench_notifications(
+                args, fixtures, base, client
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Websocket fan-out benchmark")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--port", type=int, help="Defaults to a free port")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument(
+        "--members", type=int, default=20, help="Distinct chat members (max 99)"
+    )
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--notifications", type=int, default=20)
+    parser.add_argument(
+        "--timeout", type=float, default=10, help="Seconds to wait for each fan-out"
+    )
+    parser.add_argument("--output", help="Where to write the JSON results")
+    asyncio.run(main(parser.parse_args()))
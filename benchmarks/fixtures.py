@@ -0,0 +1,144 @@
+import os, sys, uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath("./"))  # To single-handedly execute the benchmarks
+
+from faker import Faker
+from tortoise import Tortoise
+
+from app.db.config import TORTOISE_ORM
+from app.db.models.accounts import City, Country, Region, User
+from app.db.models.base import File
+from app.db.models.chat import Chat, ChatChoices, Message
+from app.db.models.feed import Post
+from app.db.models.profiles import Notification, NotificationTypeChoices
+
+fake = Faker()
+Faker.seed(0)
+
+
+async def init_models() -> None:
+    # Models only need to be registered, nothing is written to this database
+    config = TORTOISE_ORM | {"connections": {"default": "sqlite://:memory:"}}
+    await Tortoise.init(config=config)
+
+
+def now(offset: int = 0) -> datetime:
+    return datetime(2024, 3, 13, tzinfo=timezone.utc) + timedelta(seconds=offset)
+
+
+def loaded(obj):
+    # Pretend the object came from the database so it can be used as a relation
+    obj._saved_in_db = True
+    return obj
+
+
+def make_file(resource_type: str = "image/jpeg") -> File:
+    return loaded(File(id=uuid.uuid4(), resource_type=resource_type))
+
+
+def make_city() -> City:
+    country = loaded(
+        Country(id=uuid.uuid4(), name=fake.country(), code=fake.country_code())
+    )
+    region = loaded(Region(id=uuid.uuid4(), name=fake.state(), country=country))
+    return loaded(
+        City(id=uuid.uuid4(), name=fake.city(), region=region, country=country)
+    )
+
+
+def make_user(i: int, with_avatar: bool = True) -> User:
+    first_name, last_name = fake.first_name(), fake.last_name()
+    user = User(
+        id=uuid.uuid4(),
+        first_name=first_name,
+        last_name=last_name,
+        username=f"{first_name.lower()}-{last_name.lower()}-{i}",
+        email=f"user{i}@{fake.free_email_domain()}",
+        avatar=make_file() if with_avatar else None,
+        bio=fake.sentence(nb_words=8),
+        city=make_city(),
+        dob=now(-i * 86400),
+        created_at=now(i),
+        updated_at=now(i),
+    )
+    return loaded(user)
+
+
+def make_posts(count: int):
+    posts = []
+    for i in range(count):
+        post = Post(
+            id=uuid.uuid4(),
+            author=make_user(i, with_avatar=i % 2 == 0),
+            text=fake.paragraph(nb_sentences=4),
+            image=make_file() if i % 3 == 0 else None,
+            created_at=now(i),
+            updated_at=now(i),
+        )
+        post.slug = f"{post.author.username}-{post.id}"
+        loaded(post)
+        post.like_count, post.love_count = i % 17, i % 3
+        post.comments_count = i % 5
+        posts.append(post)
+    return posts
+
+
+def make_messages(chat: Chat, count: int):
+    messages = []
+    for i in range(count):
+        message = Message(
+            id=uuid.uuid4(),
+            chat=chat,
+            sender=make_user(i, with_avatar=i % 2 == 0),
+            text=fake.sentence(nb_words=12),
+            file=make_file("application/pdf") if i % 10 == 0 else None,
+            created_at=now(i),
+            updated_at=now(i),
+        )
+        messages.append(message)
+    return messages
+
+
+def make_chats(count: int):
+    chats = []
+    for i in range(count):
+        is_group = i % 4 == 0
+        chat = Chat(
+            id=uuid.uuid4(),
+            name=fake.catch_phrase() if is_group else None,
+            owner=make_user(i),
+            ctype=ChatChoices.GROUP if is_group else ChatChoices.DM,
+            description=fake.sentence() if is_group else None,
+            image=make_file() if is_group else None,
+            created_at=now(i),
+            updated_at=now(i),
+        )
+        loaded(chat)
+        chat.latest_message = make_messages(chat, 1)
+        chats.append(chat)
+    return chats
+
+
+def make_notifications(count: int):
+    ntypes = list(NotificationTypeChoices)
+    notifications = []
+    for i in range(count):
+        ntype = ntypes[i % len(ntypes)]
+        is_admin = ntype == NotificationTypeChoices.ADMIN
+        post = make_posts(1)[0]
+        notification = Notification(
+            id=uuid.uuid4(),
+            sender=None if is_admin else make_user(i),
+            ntype=ntype,
+            post=post if ntype == NotificationTypeChoices.REACTION else None,
+            text=fake.sentence() if is_admin else None,
+            created_at=now(i),
+            updated_at=now(i),
+        )
+        notifications.append(notification)
+    return notifications
+
+
+def make_profiles(count: int):
+    return [make_user(i, with_avatar=i % 2 == 0) for i in range(count)]
@@ -0,0 +1,303 @@
+"""
+End-to-end HTTP load benchmark.
+
+Seeds a database with synthetic data (CreateData.create_fake_data), then drives the real
+Litestar app with concurrent clients and reports p50/p95/p99 latency and throughput for
+every route. The app runs in-process through AsyncTestClient unless --url points at a
+running server (e.g. `uvicorn app.main:app --workers 4`) sharing the same database.
+
+    python -m benchmarks.load --users 200 --posts 2000 --concurrency 20 --requests 500
+"""
+
+import argparse, asyncio, json, os, statistics, sys, time
+
+sys.path.append(os.path.abspath("./"))  # To single-handedly execute the benchmarks
+
+DEFAULT_DATABASE_URL = "sqlite:///tmp/socialnet-bench.sqlite3"
+
+
+def configure_environment(args) -> None:
+    # Must run before the app (and its settings) are imported
+    os.environ["TORTOISE_DATABASE_URL"] = args.database_url
+    # Skips emails and websocket pushes, and makes the lifespan generate the schemas
+    os.environ["ENVIRONMENT"] = "testing"
+    # Every simulated user logs in from the same address
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    sqlite_path = args.database_url.removeprefix("sqlite://")
+    if sqlite_path != args.database_url and os.path.exists(sqlite_path):
+        os.remove(sqlite_path)  # Start every sqlite run from a fresh database
+
+
+async def seed(args):
+    from tortoise import Tortoise
+    from tortoise.connection import connections
+
+    from app.api.utils.auth import Authentication
+    from app.db.config import TORTOISE_ORM, generate_schemas
+    from app.db.models.accounts import User
+    from initials.data_script import CreateData
+
+    await Tortoise.init(config=TORTOISE_ORM)
+    await generate_schemas()
+    start = time.perf_counter()
+    data = await CreateData().create_fake_data(
+        users=args.users,
+        posts=args.posts,
+        comments=args.comments,
+        replies=args.replies,
+        reactions=args.reactions,
+        chats=args.chats,
+        messages=args.messages,
+        notifications=args.notifications,
+        seed=args.seed,
+    )
+    print(f"Seeded database in {time.perf_counter() - start:.2f}s")
+
+    # Half of the users browse with tokens, the other half are reserved for the login route
+    # (logging in rotates the access token, which would invalidate a browsing client).
+    users = data["users"]
+    browsers, logins = users[: len(users) // 2], users[len(users) // 2 :]
+    tokens = {}
+    for user in browsers:
+        user.access_token = await Authentication.create_access_token(
+            {"user_id": str(user.id), "username": user.username}
+        )
+        tokens[user.id] = user.access_token
+    await User.bulk_update(browsers, fields=["access_token"], batch_size=1000)
+
+    chat_ids_by_user = {}
+    for chat in data["chats"]:
+        chat_ids_by_user.setdefault(chat.owner_id, []).append(chat.id)
+
+    fixtures = {
+        "browsers": [
+            {
+                "token": tokens[user.id],
+                "username": user.username,
+                "chat_ids": chat_ids_by_user.get(user.id, []),
+            }
+            for user in browsers
+        ],
+        "logins": [user.email for user in logins],
+        "password": "testpassword",
+        "post_slugs": [post.slug for post in data["posts"]],
+        "comment_slugs": [comment.slug for comment in data["comments"]],
+        "reply_slugs": [reply.slug for reply in data["replies"]],
+    }
+    await connections.close_all()
+    return fixtures
+
+
+def build_routes(fixtures):
+    # Each route returns (method, path, json body, needs auth) for the n-th request
+    def pick(items, n):
+        return items[n % len(items)] if items else None
+
+    def browser(n):
+        return pick(fixtures["browsers"], n)
+
+    def owned_chat(n):
+        with_chats = [b for b in fixtures["browsers"] if b["chat_ids"]]
+        b = pick(with_chats, n)
+        return b, pick(b["chat_ids"], n) if b else None
+
+    routes = {
+        # FEED
+        "GET /feed/posts": lambda n: ("GET", "/feed/posts", None, None),
+        "GET /feed/posts/{slug}": lambda n: (
+            "GET",
+            f"/feed/posts/{pick(fixtures['post_slugs'], n)}",
+            None,
+            None,
+        ),
+        "GET /feed/posts/{slug}/comments": lambda n: (
+            "GET",
+            f"/feed/posts/{pick(fixtures['post_slugs'], n)}/comments",
+            None,
+            None,
+        ),
+        "GET /feed/comments/{slug}": lambda n: (
+            "GET",
+            f"/feed/comments/{pick(fixtures['comment_slugs'], n)}",
+            None,
+            None,
+        ),
+        "GET /feed/replies/{slug}": lambda n: (
+            "GET",
+            f"/feed/replies/{pick(fixtures['reply_slugs'], n)}",
+            None,
+            None,
+        ),
+        "GET /feed/reactions/POST/{slug}": lambda n: (
+            "GET",
+            f"/feed/reactions/POST/{pick(fixtures['post_slugs'], n)}",
+            None,
+            None,
+        ),
+        "POST /feed/posts": lambda n: (
+            "POST",
+            "/feed/posts",
+            {"text": f"Benchmark post {n}"},
+            browser(n),
+        ),
+        "POST /feed/reactions/POST/{slug}": lambda n: (
+            "POST",
+            f"/feed/reactions/POST/{pick(fixtures['post_slugs'], n)}",
+            {"rtype": "LIKE"},
+            browser(n),
+        ),
+        "POST /feed/posts/{slug}/comments": lambda n: (
+            "POST",
+            f"/feed/posts/{pick(fixtures['post_slugs'], n)}/comments",
+            {"text": f"Benchmark comment {n}"},
+            browser(n),
+        ),
+        # CHATS
+        "GET /chats": lambda n: ("GET", "/chats", None, browser(n)),
+        "GET /chats/{id}": lambda n: (
+            lambda b, chat_id: ("GET", f"/chats/{chat_id}", None, b)
+        )(*owned_chat(n)),
+        "POST /chats": lambda n: (
+            lambda b, chat_id: (
+                "POST",
+                "/chats",
+                {"chat_id": str(chat_id), "text": f"Benchmark message {n}"},
+                b,
+            )
+        )(*owned_chat(n)),
+        # PROFILES
+        "GET /profiles": lambda n: ("GET", "/profiles", None, None),
+        "GET /profiles/cities": lambda n: (
+            "GET",
+            "/profiles/cities?name=Lek",
+            None,
+            None,
+        ),
+        "GET /profiles/profile/{username}": lambda n: (
+            "GET",
+            f"/profiles/profile/{browser(n)['username']}",
+            None,
+            None,
+        ),
+        "GET /profiles/friends": lambda n: (
+            "GET",
+            "/profiles/friends",
+            None,
+            browser(n),
+        ),
+        "GET /profiles/notifications": lambda n: (
+            "GET",
+            "/profiles/notifications",
+            None,
+            browser(n),
+        ),
+        # AUTH
+        "POST /auth/login": lambda n: (
+            "POST",
+            "/auth/login",
+            {"email": pick(fixtures["logins"], n), "password": fixtures["password"]},
+            None,
+        ),
+    }
+    return routes
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+async def run_route(client, name, route, total, concurrency):
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for n in counter:
+            method, path, body, browser = route(n)
+            headers = {}
+            if browser:
+                headers["Authorization"] = f"Bearer {browser['token']}"
+            start = time.perf_counter()
+            response = await client.request(
+                method, f"/api/v5{path}", json=body, headers=headers
+            )
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "route": name,
+        "requests": total,
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+async def main(args) -> None:
+    configure_environment(args)
+    fixtures = await seed(args)
+    routes = build_routes(fixtures)
+    if args.route:
+        routes = {name: route for name, route in routes.items() if name in args.route}
+
+    if args.url:
+        import httpx
+
+        client_context = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        from litestar.testing import AsyncTestClient
+        from app.main import app
+
+        client_context = AsyncTestClient(app=app, timeout=60)
+
+    results = []
+    async with client_context as client:
+        print(
+            f"{'route':<36} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+        )
+        for name, route in routes.items():
+            result = await run_route(
+                client, name, route, args.requests, args.concurrency
+            )
+            results.append(result)
+            print(
+                f"{name:<36} {result['throughput']:>9.1f} {result['p50_ms']:>9.2f} "
+                f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"config": vars(args), "results": results}, file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end HTTP load benchmark")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--url", help="Benchmark a running server instead")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--comments", type=int, default=2000)
+    parser.add_argument("--replies", type=int, default=2000)
+    parser.add_argument("--reactions", type=int, default=5000)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--notifications", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route")
+    parser.add_argument("--route", nargs="+", help="Only run these routes")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,197 @@
+"""
+Serialization micro-benchmarks for the response schemas.
+
+Builds in-memory model fixtures (nothing touches a database) and measures validate + dump
+throughput and allocations per item for every schema at several page sizes.
+
+    python -m benchmarks.schemas
+    python -m benchmarks.schemas --output baseline.json
+    python -m benchmarks.schemas --compare baseline.json
+"""
+
+import argparse, asyncio, gc, json, os, platform, sys, time, tracemalloc
+from datetime import datetime
+
+import msgspec
+import pydantic
+
+from benchmarks import fixtures
+from app.api.schemas.chat import ChatSchema, MessageSchema
+from app.api.schemas.feed import PostSchema
+from app.api.schemas.profiles import NotificationSchema, ProfileSchema
+from app.api.schemas.structs import (
+    ChatStruct,
+    MessageStruct,
+    NotificationStruct,
+    PostStruct,
+)
+
+PAGE_SIZES = [20, 50, 200, 400]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def pydantic_case(schema):
+    def run(items):
+        return msgspec.json.encode(
+            [schema.model_validate(item).model_dump(mode="json") for item in items]
+        )
+
+    return run
+
+
+def struct_case(builder):
+    def run(items):
+        return msgspec.json.encode([builder(item) for item in items])
+
+    return run
+
+
+def message_items(size):
+    chat = fixtures.make_chats(1)[0]
+    return fixtures.make_messages(chat, size)
+
+
+# (schema name, implementation, fixture factory, callable)
+CASES = [
+    ("PostSchema", "pydantic", fixtures.make_posts, pydantic_case(PostSchema)),
+    ("PostSchema", "msgspec", fixtures.make_posts, struct_case(PostStruct.from_post)),
+    ("ChatSchema", "pydantic", fixtures.make_chats, pydantic_case(ChatSchema)),
+    ("ChatSchema", "msgspec", fixtures.make_chats, struct_case(ChatStruct.from_chat)),
+    ("MessageSchema", "pydantic", message_items, pydantic_case(MessageSchema)),
+    (
+        "MessageSchema",
+        "msgspec",
+        message_items,
+        struct_case(MessageStruct.from_message),
+    ),
+    (
+        "NotificationSchema",
+        "pydantic",
+        fixtures.make_notifications,
+        pydantic_case(NotificationSchema),
+    ),
+    (
+        "NotificationSchema",
+        "msgspec",
+        fixtures.make_notifications,
+        struct_case(NotificationStruct.from_notification),
+    ),
+    ("ProfileSchema", "pydantic", fixtures.make_profiles, pydantic_case(ProfileSchema)),
+]
+
+
+def measure_time(func, items, min_time):
+    # Repeat until at least min_time has elapsed and keep the best round
+    func(items)  # warm up
+    rounds, best, total = 0, float("inf"), 0.0
+    while total < min_time or rounds < 3:
+        start = time.perf_counter()
+        func(items)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        rounds += 1
+    return best, rounds
+
+
+def measure_allocations(func, items):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = func(items)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    del result
+    return peak, blocks
+
+
+def run_benchmarks(page_sizes, min_time, only=None):
+    results = []
+    for schema, impl, factory, func in CASES:
+        if only and schema not in only:
+            continue
+        for size in page_sizes:
+            items = factory(size)
+            best, rounds = measure_time(func, items, min_time)
+            peak, blocks = measure_allocations(func, items)
+            result = {
+                "schema": schema,
+                "impl": impl,
+                "page_size": size,
+                "rounds": rounds,
+                "seconds_per_page": best,
+                "us_per_item": best / size * 1e6,
+                "items_per_second": size / best,
+                "peak_bytes_per_item": peak / size,
+                "alloc_blocks_per_item": blocks / size,
+            }
+            results.append(result)
+            print(
+                f"{schema:<20} {impl:<9} {size:>4} items  "
+                f"{result['us_per_item']:>8.2f} us/item  "
+                f"{result['items_per_second']:>10.0f} items/s  "
+                f"{result['peak_bytes_per_item']:>8.0f} B/item"
+            )
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    previous = {
+        (r["schema"], r["impl"], r["page_size"]): r for r in baseline["results"]
+    }
+    print(f"\nCompared with {baseline_path} (negative is faster/smaller):")
+    for result in results:
+        old = previous.get((result["schema"], result["impl"], result["page_size"]))
+        if not old:
+            continue
+        time_diff = (result["us_per_item"] / old["us_per_item"] - 1) * 100
+        mem_diff = (
+            result["peak_bytes_per_item"] / old["peak_bytes_per_item"] - 1
+        ) * 100
+        print(
+            f"{result['schema']:<20} {result['impl']:<9} {result['page_size']:>4} items  "
+            f"time {time_diff:+7.1f}%  memory {mem_diff:+7.1f}%"
+        )
+
+
+async def main(args) -> None:
+    await fixtures.init_models()
+    page_sizes = args.page_sizes or PAGE_SIZES
+    results = run_benchmarks(page_sizes, args.min_time, args.schema)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"schemas-{stamp}.json")
+    with open(output, "w") as file:
+        json.dump(
+            {
+                "created_at": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "pydantic": pydantic.VERSION,
+                "msgspec": msgspec.__version__,
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Response schema micro-benchmarks")
+    parser.add_argument("--page-sizes", type=int, nargs="+")
+    parser.add_argument("--schema", nargs="+", help="Only run these schemas")
+    parser.add_argument("--min-time", type=float, default=0.5)
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    asyncio.run(main(parser.parse_args()))
+    sys.exit(0)
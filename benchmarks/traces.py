@@ -0,0 +1,93 @@
+"""
+Offline trace inspection.
+
+Reads the spans written by the JSONL exporter (TRACING_EXPORTER=jsonl) and prints the
+slowest traces with their time split by span kind (queries, serialization, fan-out and
+the handler's own time), followed by the span tree of the slowest one.
+
+    python -m benchmarks.traces traces/spans.jsonl --top 10
+    python -m benchmarks.traces traces/spans.jsonl --route "GET /api/v5/chats"
+"""
+
+import argparse, json
+from collections import defaultdict
+
+
+def load_traces(path):
+    traces = defaultdict(list)
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def kind(span):
+    # "GET /api/v5/feed/posts" and other root spans are the handler itself
+    return span["name"] if span["parent_id"] else "handler"
+
+
+def breakdown(spans):
+    # Time per span kind, where the root only keeps what its children don't cover
+    children = defaultdict(float)
+    for span in spans:
+        if span["parent_id"]:
+            children[span["parent_id"]] += span["duration_ms"]
+    totals, counts = defaultdict(float), defaultdict(int)
+    for span in spans:
+        own_time = span["duration_ms"] - children.get(span["span_id"], 0.0)
+        totals[kind(span)] += max(own_time, 0.0)
+        counts[kind(span)] += 1
+    return totals, counts
+
+
+def print_tree(spans):
+    by_parent = defaultdict(list)
+    for span in spans:
+        by_parent[span["parent_id"]].append(span)
+
+    def walk(parent_id, depth):
+        for span in sorted(by_parent.get(parent_id, []), key=lambda s: s["start"]):
+            label = span["name"]
+            if "statement" in span["attributes"]:
+                label = f"{label}: {span['attributes']['statement'][:80]}"
+            print(f"{'  ' * depth}{span['duration_ms']:>9.2f}ms  {label}")
+            walk(span["span_id"], depth + 1)
+
+    walk(None, 0)
+
+
+def main(args) -> None:
+    traces = load_traces(args.path)
+    roots = []
+    for trace_id, spans in traces.items():
+        root = next((span for span in spans if not span["parent_id"]), None)
+        if root and (not args.route or root["name"] == args.route):
+            roots.append((root, spans))
+    roots.sort(key=lambda item: item[0]["duration_ms"], reverse=True)
+    if not roots:
+        print("No traces found")
+        return
+
+    print(f"{'trace':<36} {'total ms':>9}  breakdown")
+    for root, spans in roots[: args.top]:
+        totals, counts = breakdown(spans)
+        parts = ", ".join(
+            f"{name} {ms:.1f}ms" + (f" x{counts[name]}" if counts[name] > 1 else "")
+            for name, ms in sorted(totals.items(), key=lambda item: -item[1])
+        )
+        print(f"{root['name'][:36]:<36} {root['duration_ms']:>9.2f}  {parts}")
+
+    print(f"\nSlowest trace ({roots[0][0]['trace_id']}):")
+    print_tree(roots[0][1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize exported trace spans")
+    parser.add_argument("path", help="JSONL file written by the tracing exporter")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--route", help='Only root spans named e.g. "GET /api/v5/chats"'
+    )
+    main(parser.parse_args())
@@ -1,7 +1,24 @@
+import random, uuid
+
+from faker import Faker
+from slugify import slugify
+from tortoise.connection import connections
+
 from app.core.config import settings
+from app.core.security import get_password_hash
 from app.db.models.accounts import City, Country, Region, User
-from app.db.models.feed import Post
+from app.db.models.chat import Chat, ChatChoices, Message
+from app.db.models.feed import (
+    Comment,
+    Post,
+    REACTION_COUNT_FIELDS,
+    Reaction,
+    ReactionTarget,
+    ReactionType,
+    Reply,
+)
 from app.db.models.general import SiteDetail
+from app.db.models.profiles import Notification, NotificationTypeChoices
 
 
 class CreateData(object):
@@ -59,3 +76,163 @@ class CreateData(object):
             author=client_user, text="This is the first post"
         )
         return post
+
+    # SYNTHETIC DATA (for benchmarks and local load testing)
+    async def create_fake_data(
+        self,
+        users: int = 100,
+        posts: int = 500,
+        comments: int = 2000,
+        replies: int = 2000,
+        reactions: int = 5000,
+        chats: int = 200,
+        messages: int = 5000,
+        notifications: int = 2000,
+        password: str = "testpassword",
+        batch_size: int = 1000,
+        seed: int = 0,
+    ) -> dict:
+        # Everything is inserted with bulk_create, so model save hooks (usernames, slugs) are
+        # replicated here instead of being run row by row.
+        fake = Faker()
+        Faker.seed(seed)
+        rand = random.Random(seed)
+        city = await self.create_city()
+        hashed_password = get_password_hash(password)  # bcrypt is slow, hash only once
+
+        user_objs = []
+        for i in range(users):
+            first_name, last_name = fake.first_name(), fake.last_name()
+            user_objs.append(
+                User(
+                    id=uuid.uuid4(),
+                    first_name=first_name,
+                    last_name=last_name,
+                    username=f"{slugify(f'{first_name} {last_name}')}-{i}",
+                    email=f"fake-user-{i}-{seed}@example.com",
+                    password=hashed_password,
+                    is_email_verified=True,
+                    bio=fake.sentence(nb_words=8),
+                    city_id=city.id,
+                )
+            )
+        await self.bulk_create(User, user_objs, batch_size=batch_size)
+
+        def feed_obj(model, **kwargs):
+            author = rand.choice(user_objs)
+            id = uuid.uuid4()
+            return model(
+                id=id,
+                author_id=author.id,
+                text=fake.paragraph(nb_sentences=3),
+                slug=slugify(f"{author.full_name} {id}"),
+                **kwargs,
+            )
+
+        post_objs = [feed_obj(Post) for _ in range(posts)]
+        # A user can only react once to a post. The posts' reaction counters are filled in
+        # before they are inserted.
+        reaction_pairs = set()
+        max_reactions = min(reactions, len(user_objs) * len(post_objs))
+        while len(reaction_pairs) < max_reactions:
+            reaction_pairs.add((rand.choice(user_objs).id, rand.choice(post_objs)))
+        rtypes = list(ReactionType)
+        reaction_objs = []
+        for user_id, post in reaction_pairs:
+            rtype = rand.choice(rtypes)
+            field = REACTION_COUNT_FIELDS[rtype]
+            setattr(post, field, getattr(post, field) + 1)
+            reaction_objs.append(
+                Reaction(
+                    id=uuid.uuid4(),
+                    user_id=user_id,
+                    rtype=rtype,
+                    target_type=ReactionTarget.POST,
+                    target_id=post.id,
+                )
+            )
+        await self.bulk_create(Post, post_objs, batch_size=batch_size)
+        await self.bulk_create(Reaction, reaction_objs, batch_size=batch_size)
+        comment_objs = [
+            feed_obj(Comment, post_id=rand.choice(post_objs).id)
+            for _ in range(comments if post_objs else 0)
+        ]
+        await self.bulk_create(Comment, comment_objs, batch_size=batch_size)
+        reply_objs = [
+            feed_obj(Reply, comment_id=rand.choice(comment_objs).id)
+            for _ in range(replies if comment_objs else 0)
+        ]
+        await self.bulk_create(Reply, reply_objs, batch_size=batch_size)
+
+        chat_objs, chat_members = [], []
+        for i in range(chats if len(user_objs) > 1 else 0):
+            is_group = i % 5 == 0
+            members = rand.sample(user_objs, min(len(user_objs), 5 if is_group else 2))
+            chat = Chat(
+                id=uuid.uuid4(),
+                owner_id=members[0].id,
+                ctype=ChatChoices.GROUP if is_group else ChatChoices.DM,
+                name=fake.catch_phrase() if is_group else None,
+            )
+            chat_objs.append(chat)
+            chat_members.extend((chat.id, member.id) for member in members[1:])
+        await self.bulk_create(Chat, chat_objs, batch_size=batch_size)
+        await self.bulk_add_m2m("chat_user", "chat_id", "user_id", chat_members)
+
+        message_objs = []
+        for _ in range(messages if chat_objs else 0):
+            chat = rand.choice(chat_objs)
+            message_objs.append(
+                Message(
+                    id=uuid.uuid4(),
+                    chat_id=chat.id,
+                    sender_id=chat.owner_id,
+                    text=fake.sentence(nb_words=12),
+                )
+            )
+        await self.bulk_create(Message, message_objs, batch_size=batch_size)
+
+        notification_objs, notification_receivers = [], []
+        # One notification per comment, as the (sender, ntype, comment) constraint requires
+        for comment in rand.sample(comment_objs, min(notifications, len(comment_objs))):
+            notification = Notification(
+                id=uuid.uuid4(),
+                sender_id=comment.author_id,
+                ntype=NotificationTypeChoices.COMMENT,
+                comment_id=comment.id,
+            )
+            notification_objs.append(notification)
+            notification_receivers.append((notification.id, rand.choice(user_objs).id))
+        await self.bulk_create(Notification, notification_objs, batch_size=batch_size)
+        await self.bulk_add_m2m(
+            "notification_user", "notification_id", "user_id", notification_receivers
+        )
+
+        return {
+            "users": user_objs,
+            "posts": post_objs,
+            "comments": comment_objs,
+            "replies": reply_objs,
+            "chats": chat_objs,
+            "messages": message_objs,
+            "notifications": notification_objs,
+        }
+
+    async def bulk_create(self, model, objs, batch_size: int = 1000) -> None:
+        await model.bulk_create(objs, batch_size=batch_size)
+        for obj in objs:
+            obj._saved_in_db = True  # So they can be used as relations afterwards
+
+    async def bulk_add_m2m(self, table, left_column, right_column, rows) -> None:
+        if not rows:
+            return
+        conn = connections.get("default")
+        if conn.capabilities.dialect == "postgres":
+            placeholders = "$1, $2"
+        else:
+            placeholders = "?, ?"
+            rows = [(str(left), str(right)) for left, right in rows]
+        await conn.execute_many(
+            f'INSERT INTO "{table}" ("{left_column}", "{right_column}") VALUES ({placeholders})',
+            rows,
+        )
@@ -0,0 +1,177 @@
+import argparse, asyncio, csv, os, sys, logging, time, uuid
+
+sys.path.append(os.path.abspath("./"))  # To single-handedly execute this script
+
+from tortoise import Tortoise
+from tortoise.connection import connections
+
+from app.db.config import TORTOISE_ORM
+from app.db.models.accounts import City, Country, Region
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CityImporter(object):
+    """
+    Streams a cities CSV into the Country, Region and City tables.
+
+    Foreign keys are resolved with in-memory maps that are loaded once before the import,
+    so no lookup queries are issued per row. Rows whose city already exists are skipped,
+    which makes re-running the same file a no-op.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 5000,
+        city_column: str = "city",
+        region_column: str = "region",
+        country_column: str = "country",
+        code_column: str = "country_code",
+    ) -> None:
+        self.batch_size = batch_size
+        self.city_column = city_column
+        self.region_column = region_column
+        self.country_column = country_column
+        self.code_column = code_column
+        self.countries = {}  # name -> id
+        self.regions = {}  # (country_id, name) -> id
+        self.cities = set()  # (country_id, region_id, name)
+        self.inserted = 0
+        self.skipped = 0
+
+    async def load_maps(self) -> None:
+        for id, name in await Country.all().values_list("id", "name"):
+            self.countries[name] = id
+        for id, name, country_id in await Region.all().values_list(
+            "id", "name", "country_id"
+        ):
+            self.regions[(country_id, name)] = id
+        for name, region_id, country_id in await City.all().values_list(
+            "name", "region_id", "country_id"
+        ):
+            self.cities.add((country_id, region_id, name))
+
+    async def resolve_countries(self, rows) -> None:
+        # Create every unknown country in the batch with a single insert
+        new_countries = {}
+        for row in rows:
+            name = row[self.country_column]
+            if name not in self.countries and name not in new_countries:
+                code = row.get(self.code_column) or name[:2].upper()
+                new_countries[name] = Country(id=uuid.uuid4(), name=name, code=code)
+        if new_countries:
+            await Country.bulk_create(list(new_countries.values()))
+            for name, country in new_countries.items():
+                self.countries[name] = country.id
+
+    async def resolve_regions(self, rows) -> None:
+        new_regions = {}
+        for row in rows:
+            name = row.get(self.region_column)
+            if not name:
+                continue
+            key = (self.countries[row[self.country_column]], name)
+            if key not in self.regions and key not in new_regions:
+                new_regions[key] = Region(id=uuid.uuid4(), name=name, country_id=key[0])
+        if new_regions:
+            await Region.bulk_create(list(new_regions.values()))
+            for key, region in new_regions.items():
+                self.regions[key] = region.id
+
+    async def insert_cities(self, records) -> None:
+        conn = connections.get("default")
+        if conn.capabilities.dialect == "postgres":
+            # COPY is several times faster than multi-row INSERT on postgres
+            async with conn.acquire_connection() as connection:
+                await connection.copy_records_to_table(
+                    City._meta.db_table,
+                    records=records,
+                    columns=["id", "name", "region_id", "country_id"],
+                )
+        else:
+            cities = [
+                City(id=id, name=name, region_id=region_id, country_id=country_id)
+                for id, name, region_id, country_id in records
+            ]
+            await City.bulk_create(cities, batch_size=self.batch_size)
+
+    async def import_batch(self, rows) -> None:
+        await self.resolve_countries(rows)
+        await self.resolve_regions(rows)
+
+        records = []
+        for row in rows:
+            name = row[self.city_column]
+            country_id = self.countries[row[self.country_column]]
+            region_id = self.regions.get((country_id, row.get(self.region_column)))
+            key = (country_id, region_id, name)
+            if key in self.cities:
+                self.skipped += 1
+                continue
+            self.cities.add(key)
+            records.append((uuid.uuid4(), name, region_id, country_id))
+
+        if records:
+            await self.insert_cities(records)
+        self.inserted += len(records)
+
+    async def run(self, path: str) -> None:
+        start = time.perf_counter()
+        await self.load_maps()
+        logger.info(
+            f"Loaded {len(self.countries)} countries, {len(self.regions)} regions "
+            f"and {len(self.cities)} cities in {time.perf_counter() - start:.2f}s"
+        )
+
+        processed = 0
+        with open(path, newline="", encoding="utf-8") as file:
+            batch = []
+            for row in csv.DictReader(file):
+                if not row.get(self.city_column) or not row.get(self.country_column):
+                    self.skipped += 1
+                    continue
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    await self.import_batch(batch)
+                    processed += len(batch)
+                    batch = []
+                    elapsed = time.perf_counter() - start
+                    logger.info(
+                        f"Processed {processed} rows ({processed / elapsed:.0f} rows/s)"
+                    )
+            if batch:
+                await self.import_batch(batch)
+                processed += len(batch)
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Imported {self.inserted} cities, skipped {self.skipped} rows "
+            f"in {elapsed:.2f}s ({processed / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+
+
+async def main(args) -> None:
+    # Initialize DB
+    await Tortoise.init(config=TORTOISE_ORM)
+    importer = CityImporter(
+        batch_size=args.batch_size,
+        city_column=args.city_column,
+        region_column=args.region_column,
+        country_column=args.country_column,
+        code_column=args.code_column,
+    )
+    await importer.run(args.path)
+    # Close connections
+    await connections.close_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import cities from a CSV file")
+    parser.add_argument("path", help="Path to the cities CSV file")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--city-column", default="city")
+    parser.add_argument("--region-column", default="region")
+    parser.add_argument("--country-column", default="country")
+    parser.add_argument("--code-column", default="country_code")
+    asyncio.run(main(parser.parse_args()))